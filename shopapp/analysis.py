@@ -1,73 +1,46 @@
 """
 Модуль для анализа и визуализации данных.
 Использует pandas, matplotlib, seaborn, networkx для различных анализов.
+Параметр include_archive включает в отчет заказы из архива (см. archive.py).
+Отчеты разделены на получение данных (*_data) и отрисовку на осях matplotlib (draw_*),
+чтобы графики можно было строить без pyplot и кэшировать: показ и экспорт — в charts.py.
 """
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
 import networkx as nx
-from db import get_all_orders, get_all_clients, get_all_products
-from typing import List
+import db
+from db import get_all_orders, get_all_clients, get_all_products, get_daily_sales, get_client_totals
+from typing import List, Optional
 from models import Order, Client, Product
 
-def top_clients_by_orders():
-    """Получить топ 5 клиентов по количеству заказов с использованием pandas."""
-    orders = [o for o in get_all_orders() if o.client is not None]
+def top_clients_data(include_archive: bool = False) -> pd.DataFrame:
+    """Топ 5 клиентов по количеству заказов из сводной таблицы sales_by_client."""
+    rows = get_client_totals(limit=5, include_archive=include_archive)
+    return pd.DataFrame(rows, columns=['client_id', 'client_name', 'count', 'items', 'revenue'])
+
+def draw_top_clients(ax, top_df: pd.DataFrame):
+    """Нарисовать топ клиентов на осях ax."""
+    draw_bar(ax, top_df, 'client_name', 'count', "Топ 5 клиентов по количеству заказов", "Клиент", "Количество заказов")
+
+def order_dynamics_data(include_archive: bool = False) -> pd.DataFrame:
+    """Число заказов по датам из сводной таблицы sales_daily."""
+    rows = get_daily_sales(include_archive=include_archive)
+    df_grouped = pd.DataFrame(rows, columns=['date', 'count', 'items', 'revenue'])
+    df_grouped['date'] = pd.to_datetime(df_grouped['date'])
+    return df_grouped
+
+def draw_order_dynamics(ax, df_grouped: pd.DataFrame):
+    """Нарисовать динамику заказов на осях ax."""
+    sns.lineplot(data=df_grouped, x='date', y='count', marker='o', color='green', ax=ax)
+    ax.set_title("Динамика заказов")
+
+def client_graph_data(include_archive: bool = False):
+    """Построить граф связей клиентов с товарами; None, если заказов нет."""
+    orders = [o for o in get_all_orders(include_archive) if o.client is not None]
     if not orders:
-        print("Нет заказов")  # Оставляем, если нужно уведомление об ошибке
-        return
-
-    try:
-        df = pd.DataFrame([{'client_id': o.client.id, 'client_name': o.client.name} for o in orders if o.client])
-        if df.empty:
-            print("Нет данных о клиентах")  # Оставляем, если нужно
-            return
-
-        top = df['client_id'].value_counts().head(5)
-        top_df = top.reset_index()
-        top_df.columns = ['client_id', 'count']
-        top_df = top_df.merge(df[['client_id', 'client_name']].drop_duplicates(), on='client_id', how='left')
-
-        # Убрали print-ы отсюда
-        # print("Топ 5 клиентов по заказам:")
-        # print(top_df)
-
-        if not top_df.empty:
-            plt.figure(figsize=(10, 6))
-            sns.barplot(data=top_df, x='client_name', y='count', hue='client_name', palette='viridis', legend=False)
-            plt.title("Топ 5 клиентов по количеству заказов")
-            plt.xlabel("Клиент")
-            plt.ylabel("Количество заказов")
-            plt.xticks(rotation=45)
-            plt.show()
-        else:
-            print("Нет данных для графика")  # Оставляем, если нужно
-    except Exception as e:
-        print(f"Ошибка в top_clients_by_orders: {str(e)}")
-
-def plot_order_dynamics():
-    """Построить динамику заказов по датам."""
-    orders = get_all_orders()
-    if not orders:
-        print("Нет заказов")
-        return
-
-    df = pd.DataFrame([{'date': o.date} for o in orders])
-    df['date'] = pd.to_datetime(df['date'])
-    df_grouped = df.groupby('date').size().reset_index(name='count')
-
-    plt.figure()
-    sns.lineplot(data=df_grouped, x='date', y='count', marker='o', color='green')
-    plt.title("Динамика заказов")
-    plt.show()
-
-def plot_client_graph():
-    """Построить граф связей клиентов с товарами."""
-    orders = [o for o in get_all_orders() if o.client is not None]
-    if not orders:
-        print("Нет заказов")
-        return
+        return None
 
     G = nx.Graph()
 
@@ -88,14 +61,170 @@ def plot_client_graph():
             if item.product:
                 product_name = item.product.name
                 G.add_edge(client_name, product_name)
-
-    if G.number_of_nodes() > 0:
-        # Bipartite layout
-        client_nodes = [n for n, d in G.nodes(data=True) if d['bipartite'] == 0]
-        pos = nx.bipartite_layout(G, client_nodes)
-        plt.figure(figsize=(12, 8))
-        nx.draw(G, pos, with_labels=True, node_color=['lightblue' if d['bipartite']==0 else 'lightgreen' for n, d in G.nodes(data=True)], edge_color='gray')
-        plt.title("Граф связей клиентов и товаров")
-        plt.show()
-    else:
-        print("Нет данных для графа")
\ No newline at end of file
+    return G
+
+def draw_client_graph(ax, G):
+    """Нарисовать двудольный граф клиентов и товаров на осях ax."""
+    client_nodes = [n for n, d in G.nodes(data=True) if d['bipartite'] == 0]
+    pos = nx.bipartite_layout(G, client_nodes)
+    nx.draw(G, pos, ax=ax, with_labels=True, node_color=['lightblue' if d['bipartite']==0 else 'lightgreen' for n, d in G.nodes(data=True)], edge_color='gray')
+    ax.set_title("Граф связей клиентов и товаров")
+
+# Размер порции при чтении позиций заказов
+LINE_ITEMS_CHUNK = 500_000
+
+_LINE_DTYPES = {'order_id': 'int64', 'client_id': 'int64', 'product_id': 'int64', 'quantity': 'int32'}
+
+def iter_line_items(include_archive: bool = False, chunk_size: Optional[int] = None):
+    """
+    Позиции заказов порциями примерно по chunk_size (по умолчанию LINE_ITEMS_CHUNK) строк,
+    с ценой и категорией товара.
+
+    Позиции с датой и клиентом заказа читаются с компактными типами, а цена и категория
+    подставляются векторно по индексу товара, без построения объектов Order.
+    Позиции удаленных товаров получают нулевую цену, как в Order.calculate_total.
+    Позиции одного заказа всегда попадают в одну порцию, поэтому число заказов по порциям
+    можно складывать; в памяти одновременно только порция и справочник товаров.
+    Выдается хотя бы одна порция (пустая, если позиций нет).
+
+    Порции — DataFrame: order_id, client_id, date, product_id, quantity, price, category, revenue.
+    """
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        archived = db._attach_archive(cursor, include_archive)
+        orders_source = db._union_source('orders', 'id, client_id, date', archived)
+        lines_source = db._union_source('order_products', 'order_id, product_id, quantity', archived)
+        products = pd.read_sql_query('SELECT id, price, category FROM products', conn, index_col='id')
+        # Последний слот цен и кодов (len) отведен под неизвестные товары
+        prices = np.append(products['price'].to_numpy(dtype='float64'), 0.0)
+        categories = pd.Categorical(products['category'].fillna(''))
+        codes = np.append(categories.codes, -1)
+
+        def enrich(lines: pd.DataFrame) -> pd.DataFrame:
+            lines = lines.reset_index(drop=True)
+            lines['date'] = pd.to_datetime(lines['date'])
+            position = products.index.get_indexer(lines['product_id'])
+            position[position < 0] = len(products)
+            lines['price'] = prices[position]
+            lines['category'] = pd.Categorical.from_codes(codes[position], categories=categories.categories)
+            lines['revenue'] = lines['quantity'] * lines['price']
+            return lines
+
+        query = f'''
+            SELECT op.order_id, o.client_id, o.date, op.product_id, op.quantity
+            FROM {lines_source} op JOIN {orders_source} o ON o.id = op.order_id
+            ORDER BY op.order_id'''
+        tail = pd.DataFrame({name: pd.Series(dtype=_LINE_DTYPES.get(name, 'object'))
+                             for name in ('order_id', 'client_id', 'date', 'product_id', 'quantity')})
+        emitted = False
+        for chunk in pd.read_sql_query(query, conn, chunksize=chunk_size or LINE_ITEMS_CHUNK):
+            if chunk.empty:
+                continue
+            chunk = chunk.astype(_LINE_DTYPES)
+            if len(tail):
+                chunk = pd.concat([tail, chunk], ignore_index=True)
+            # Последний заказ порции может продолжиться в следующей: он переносится туда целиком
+            last = chunk['order_id'].to_numpy() == chunk['order_id'].iat[-1]
+            tail = chunk[last]
+            if not last.all():
+                emitted = True
+                yield enrich(chunk[~last])
+        if len(tail) or not emitted:
+            yield enrich(tail)
+    finally:
+        conn.close()
+
+def load_line_items(include_archive: bool = False) -> pd.DataFrame:
+    """
+    Загрузить все позиции заказов одним DataFrame (столбцы как в iter_line_items).
+
+    Результат целиком в памяти; отчеты ниже агрегируют iter_line_items по порциям.
+    """
+    return pd.concat(iter_line_items(include_archive), ignore_index=True)
+
+def draw_bar(ax, data: pd.DataFrame, x: str, y: str, title: str, xlabel: str, ylabel: str):
+    """Столбчатая диаграмма в стиле остальных отчетов на осях ax."""
+    sns.barplot(data=data, x=x, y=y, hue=x, palette='viridis', legend=False, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+
+def draw_revenue_by_period(ax, result: pd.DataFrame):
+    """Нарисовать выручку по периодам на осях ax."""
+    sns.lineplot(data=result, x='period', y='revenue', marker='o', color='green', ax=ax)
+    ax.set_title("Выручка по периодам")
+    ax.tick_params(axis='x', labelrotation=45)
+
+def revenue_by_product(include_archive: bool = False) -> pd.DataFrame:
+    """Выручка по товарам: product_id, name, category, orders, quantity, revenue (по убыванию выручки)."""
+    parts = [lines.groupby('product_id').agg(orders=('order_id', 'size'), quantity=('quantity', 'sum'),
+                                             revenue=('revenue', 'sum'))
+             for lines in iter_line_items(include_archive)]
+    grouped = pd.concat(parts).groupby(level=0).sum()
+    names = pd.DataFrame([(p.id, p.name, p.category) for p in get_all_products()],
+                         columns=['product_id', 'name', 'category']).set_index('product_id')
+    result = grouped.join(names, how='left').reset_index()
+    result = result[['product_id', 'name', 'category', 'orders', 'quantity', 'revenue']]
+    result = result.sort_values('revenue', ascending=False, ignore_index=True)
+    return result
+
+def revenue_by_category(include_archive: bool = False) -> pd.DataFrame:
+    """Выручка по категориям: category, orders, quantity, revenue, share (доля выручки)."""
+    # Заказ целиком в одной порции, поэтому число заказов по порциям складывается
+    parts = [lines.groupby('category', observed=True).agg(orders=('order_id', 'nunique'),
+                                                          quantity=('quantity', 'sum'),
+                                                          revenue=('revenue', 'sum'))
+             for lines in iter_line_items(include_archive)]
+    result = pd.concat(parts).groupby(level=0, observed=True).sum().reset_index()
+    result['category'] = result['category'].astype(str)
+    total = result['revenue'].sum()
+    result['share'] = result['revenue'] / total if total else 0.0
+    result = result.sort_values('revenue', ascending=False, ignore_index=True)
+    return result
+
+def revenue_by_period(freq: str = 'M', include_archive: bool = False) -> pd.DataFrame:
+    """
+    Выручка по периодам.
+
+    Параметры
+    ----------
+    freq : str
+        Период pandas: 'D' (день), 'W' (неделя), 'M' (месяц), 'Q' (квартал), 'Y' (год).
+
+    Возвращает DataFrame: period, orders, quantity, revenue.
+    """
+    parts = [lines.groupby(lines['date'].dt.to_period(freq).rename('period')).agg(orders=('order_id', 'nunique'),
+                                                                                  quantity=('quantity', 'sum'),
+                                                                                  revenue=('revenue', 'sum'))
+             for lines in iter_line_items(include_archive)]
+    result = pd.concat(parts).groupby(level=0).sum().sort_index().reset_index()
+    result['period'] = result['period'].astype(str)
+    return result
+
+def average_basket_size(freq: str = None, include_archive: bool = False) -> pd.DataFrame:
+    """
+    Средняя корзина: число позиций, единиц товара и выручка на заказ.
+
+    При freq=None считается одна строка по всем заказам, иначе по периодам (как в revenue_by_period).
+    Учитываются заказы, в которых есть хотя бы одна позиция.
+
+    Возвращает DataFrame: period, orders, lines_per_order, items_per_order, revenue_per_order.
+    """
+    parts = []
+    for lines in iter_line_items(include_archive):
+        per_order = lines.groupby('order_id').agg(date=('date', 'first'), lines=('product_id', 'size'),
+                                                  items=('quantity', 'sum'), revenue=('revenue', 'sum'))
+        if freq is None:
+            keys = pd.Series('Всего', index=per_order.index, name='period')
+        else:
+            keys = per_order['date'].dt.to_period(freq).astype(str).rename('period')
+        # Суммы по периоду складываются по порциям, средние считаются в конце
+        parts.append(per_order.groupby(keys).agg(orders=('lines', 'size'), lines=('lines', 'sum'),
+                                                 items=('items', 'sum'), revenue=('revenue', 'sum')))
+    totals = pd.concat(parts).groupby(level=0).sum()
+    result = pd.DataFrame({'orders': totals['orders'], 'lines_per_order': totals['lines'] / totals['orders'],
+                           'items_per_order': totals['items'] / totals['orders'],
+                           'revenue_per_order': totals['revenue'] / totals['orders']}).reset_index()
+    return result
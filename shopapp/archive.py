@@ -0,0 +1,175 @@
+"""
+Модуль архивации старых заказов в отдельную базу SQLite (холодное хранилище).
+Рабочая база остается маленькой; архив подключается через ATTACH только
+запросами, которым он нужен (см. db.get_all_orders и сводки с include_archive).
+"""
+
+import datetime
+import os
+import time
+from typing import Optional
+import db
+from events import publish
+
+# Схема архива. Сводки архива хранят агрегаты перенесенных заказов;
+# выручка фиксируется по ценам на момент архивации.
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive.orders (
+        id INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL,
+        date TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS archive.order_products (
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (order_id, product_id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_archive_orders_date ON orders(date)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_archive_order_products_product ON order_products(product_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS archive.sales_daily (
+        date TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS archive.sales_by_client (
+        client_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS archive.sales_by_product (
+        product_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        quantity INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+]
+
+# Позиции переносимых заказов, сгруппированные по заказу
+_MOVED_LINES = '''
+    SELECT op.order_id, SUM(op.quantity) AS items, SUM(op.quantity * COALESCE(p.price, 0)) AS revenue
+    FROM main.order_products op JOIN temp.archive_moved m ON m.id = op.order_id
+    LEFT JOIN main.products p ON p.id = op.product_id
+    GROUP BY op.order_id'''
+
+def default_archive_path() -> str:
+    """Путь архива по умолчанию: рядом с рабочей базой, с суффиксом _archive."""
+    path = db.database().path
+    if path is None:
+        raise ValueError("У базы в памяти нет пути по умолчанию для архива, укажите archive_path")
+    root, ext = os.path.splitext(path)
+    return f'{root}_archive{ext or ".db"}'
+
+def _merge_order_summary(cursor, table: str, key: str):
+    """Добавить агрегаты переносимых заказов в сводку архива по ключу key."""
+    cursor.execute(f'''
+        INSERT INTO archive.{table} ({key}, orders, items, revenue)
+        SELECT o.{key}, COUNT(*), COALESCE(SUM(l.items), 0), COALESCE(SUM(l.revenue), 0)
+        FROM main.orders o JOIN temp.archive_moved m ON m.id = o.id
+        LEFT JOIN ({_MOVED_LINES}) l ON l.order_id = o.id
+        WHERE true
+        GROUP BY o.{key}
+        ON CONFLICT ({key}) DO UPDATE SET orders = orders + excluded.orders,
+            items = items + excluded.items, revenue = revenue + excluded.revenue''')
+
+def _set_state(cursor, key: str, value: str):
+    cursor.execute('INSERT INTO main.archive_meta (key, value) VALUES (?, ?) '
+                   'ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, value))
+
+@db.retry_on_busy
+def archive_orders(cutoff: datetime.date, archive_path: Optional[str] = None) -> dict:
+    """
+    Перенести заказы с датой раньше cutoff в архивную базу.
+
+    Перенос выполняется массово одной транзакцией по обеим базам. Сводки рабочей базы
+    пересчитываются по оставшимся (свежим) заказам, сводки архива дополняются перенесенными.
+
+    Параметры
+    ----------
+    cutoff : datetime.date
+        Граница: архивируются заказы строго раньше этой даты.
+    archive_path : str, optional
+        Файл архива. По умолчанию уже используемый архив или default_archive_path().
+
+    Возвращает словарь: orders, items (перенесено строк), seconds (время переноса).
+    """
+    start = time.perf_counter()
+    conn = db.connect(isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        state = db._archive_state(cursor) or {}
+        path = os.path.abspath(archive_path) if archive_path else state.get('path') or default_archive_path()
+        if state.get('path', path) != path:
+            raise ValueError(f"База уже архивируется в {state['path']}")
+        cursor.execute('ATTACH DATABASE ? AS archive', (db.database().attach_target(path),))
+        for statement in ARCHIVE_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('DROP TABLE IF EXISTS temp.archive_moved')
+            cursor.execute('CREATE TEMP TABLE archive_moved (id INTEGER PRIMARY KEY)')
+            cursor.execute('INSERT INTO temp.archive_moved SELECT id FROM main.orders WHERE date < ?',
+                           (cutoff.isoformat(),))
+            moved = cursor.execute('SELECT COUNT(*), MAX(id) FROM temp.archive_moved').fetchone()
+            cursor.execute('''INSERT INTO archive.orders (id, client_id, date)
+                              SELECT o.id, o.client_id, o.date FROM main.orders o
+                              JOIN temp.archive_moved m ON m.id = o.id''')
+            cursor.execute('''INSERT INTO archive.order_products (order_id, product_id, quantity)
+                              SELECT op.order_id, op.product_id, op.quantity FROM main.order_products op
+                              JOIN temp.archive_moved m ON m.id = op.order_id''')
+            items = cursor.rowcount
+            _merge_order_summary(cursor, 'sales_daily', 'date')
+            _merge_order_summary(cursor, 'sales_by_client', 'client_id')
+            cursor.execute('''
+                INSERT INTO archive.sales_by_product (product_id, orders, quantity)
+                SELECT op.product_id, COUNT(*), SUM(op.quantity)
+                FROM main.order_products op JOIN temp.archive_moved m ON m.id = op.order_id
+                WHERE true
+                GROUP BY op.product_id
+                ON CONFLICT (product_id) DO UPDATE SET orders = orders + excluded.orders,
+                    quantity = quantity + excluded.quantity''')
+            # Удаление без построчных триггеров сводок: рабочие сводки пересчитываются один раз
+            db._drop_summary_triggers(cursor)
+            cursor.execute('DELETE FROM main.order_products WHERE order_id IN (SELECT id FROM temp.archive_moved)')
+            cursor.execute('DELETE FROM main.orders WHERE id IN (SELECT id FROM temp.archive_moved)')
+            db._restore_summaries(cursor)
+            _set_state(cursor, 'path', path)
+            _set_state(cursor, 'archived_before', max(state.get('archived_before', ''), cutoff.isoformat()))
+            _set_state(cursor, 'max_order_id', str(max(int(state.get('max_order_id', 0)), moved[1] or 0)))
+            cursor.execute('DROP TABLE temp.archive_moved')
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('DETACH DATABASE archive')
+    finally:
+        conn.close()
+    if moved[0]:
+        publish('orders', 'import')
+    return {'orders': moved[0], 'items': items, 'seconds': time.perf_counter() - start}
+
+def get_archive_info() -> Optional[dict]:
+    """Сведения об архиве: path, archived_before, orders (число заказов в архиве); None, если архива нет."""
+    conn = db.connect()
+    cursor = conn.cursor()
+    try:
+        state = db._archive_state(cursor)
+        if state is None:
+            return None
+        info = {'path': state['path'], 'archived_before': state['archived_before'], 'orders': 0}
+        if db._attach_archive(cursor, include_archive=True):
+            info['orders'] = cursor.execute('SELECT COUNT(*) FROM archive.orders').fetchone()[0]
+        return info
+    finally:
+        conn.close()
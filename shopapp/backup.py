@@ -0,0 +1,166 @@
+"""
+Модуль горячего резервного копирования базы через SQLite backup API.
+Копия снимается порциями страниц с паузами между ними, поэтому запись
+в рабочую базу не останавливается; готовая копия проверяется integrity_check,
+старые копии удаляются по ротации.
+"""
+
+import datetime
+import glob
+import os
+import sqlite3
+import time
+from typing import Callable, List, Optional
+import db
+from events import ENTITIES, publish
+
+BACKUP_PAGES = 256   # Страниц за один шаг копирования
+BACKUP_SLEEP = 0.01  # Пауза между шагами, с: в это время писатели работают без помех
+BACKUP_KEEP = 7      # Сколько последних копий хранить
+
+def default_backup_dir() -> str:
+    """Каталог копий по умолчанию: рядом с рабочей базой, с суффиксом _backups."""
+    path = db.database().path
+    if path is None:
+        raise ValueError("У базы в памяти нет каталога копий по умолчанию, укажите directory")
+    return os.path.splitext(path)[0] + '_backups'
+
+def _backup_prefix() -> str:
+    path = db.database().path
+    return (os.path.splitext(os.path.basename(path))[0] if path else 'memory') + '_'
+
+def verify_backup(path: str) -> List[str]:
+    """Проверить файл базы PRAGMA integrity_check; ['ok'] означает целостность."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Файл {path} не найден")
+    conn = db.connect(path)
+    try:
+        return [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    except sqlite3.DatabaseError as e:
+        return [str(e)]  # Файл не является базой SQLite
+    finally:
+        conn.close()
+
+def list_backups(directory: Optional[str] = None) -> List[dict]:
+    """Копии рабочей базы в каталоге, новые первыми: path, size (байт), created (datetime)."""
+    directory = directory or default_backup_dir()
+    backups = []
+    for path in glob.glob(os.path.join(glob.escape(directory), _backup_prefix() + '*.db')):
+        backups.append({'path': path, 'size': os.path.getsize(path),
+                        'created': datetime.datetime.fromtimestamp(os.path.getmtime(path))})
+    # Имена содержат метку времени, поэтому порядок имен — порядок создания
+    return sorted(backups, key=lambda backup: backup['path'], reverse=True)
+
+def rotate_backups(directory: Optional[str] = None, keep: int = BACKUP_KEEP) -> List[str]:
+    """Удалить копии сверх keep последних. Возвращает пути удаленных."""
+    removed = [backup['path'] for backup in list_backups(directory)[keep:]]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def create_backup(directory: Optional[str] = None, keep: Optional[int] = BACKUP_KEEP, pages: int = BACKUP_PAGES,
+                  sleep: float = BACKUP_SLEEP, progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Снять горячую копию рабочей базы.
+
+    Параметры
+    ----------
+    directory : str, optional
+        Каталог копий; по умолчанию default_backup_dir().
+    keep : int, optional
+        Сколько последних копий оставить после создания новой; None — без ротации.
+    pages : int
+        Страниц за шаг копирования (-1 — все сразу).
+    sleep : float
+        Пауза между шагами, с.
+    progress : callable, optional
+        Функция progress(скопировано_страниц, всего_страниц), вызывается после каждого шага.
+
+    Копия пишется во временный файл и получает итоговое имя только после успешной проверки
+    integrity_check. Если другое соединение меняет базу во время копирования, SQLite
+    начинает копирование заново, поэтому копия всегда соответствует одному состоянию базы.
+    Архив заказов (archive.py) хранится в отдельном файле и в копию не входит.
+
+    Возвращает словарь: path, pages, size, seconds, removed (удаленные ротацией копии).
+    """
+    start = time.perf_counter()
+    directory = directory or default_backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    path = os.path.join(directory, f'{_backup_prefix()}{stamp}.db')
+    partial = path + '.part'
+    copied = [0]
+
+    def step(status, remaining, total):
+        copied[0] = total - remaining
+        if progress is not None:
+            progress(total - remaining, total)
+
+    source = db.connect()
+    target = db.connect(partial)
+    try:
+        source.backup(target, pages=pages, progress=step, sleep=sleep)
+        target.execute('PRAGMA journal_mode = DELETE')  # Копия — один самодостаточный файл, без -wal
+    finally:
+        target.close()
+        source.close()
+    try:
+        result = verify_backup(partial)
+        if result != ['ok']:
+            raise RuntimeError(f"Копия повреждена: {'; '.join(result[:5])}")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    removed = rotate_backups(directory, keep) if keep is not None else []
+    return {'path': path, 'pages': copied[0], 'size': os.path.getsize(path),
+            'seconds': time.perf_counter() - start, 'removed': removed}
+
+@db.retry_on_busy
+def _copy_into_database(path: str):
+    """Заменить содержимое рабочей базы копией одним шагом backup API."""
+    conn = db.connect()
+    source = db.connect(path)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+        conn.close()
+
+@db.retry_on_busy
+def _raise_versions(before: dict):
+    """Поднять версии данных выше прежних: версии копии могли уже встречаться в кэшах с другими данными."""
+    conn = db.connect(write=True)
+    conn.executemany('UPDATE data_versions SET version = MAX(version, ?) + 1 WHERE entity = ?',
+                     [(version, entity) for entity, version in before.items()])
+    conn.commit()
+    conn.close()
+
+def restore_backup(path: str, safety_backup: bool = True, directory: Optional[str] = None) -> Optional[str]:
+    """
+    Восстановить рабочую базу из копии.
+
+    Параметры
+    ----------
+    path : str
+        Файл копии; перед восстановлением проверяется integrity_check.
+    safety_backup : bool
+        Сначала снять копию текущего состояния (ее путь возвращается), чтобы восстановление можно было отменить.
+    directory : str, optional
+        Каталог для этой копии; по умолчанию default_backup_dir().
+
+    Копия переносится одним шагом backup API: другие соединения не увидят базу наполовину
+    восстановленной. После восстановления публикуются события 'import' для всех сущностей.
+    """
+    result = verify_backup(path)
+    if result != ['ok']:
+        raise RuntimeError(f"Копия повреждена, восстановление отменено: {'; '.join(result[:5])}")
+    # Без ротации: иначе она могла бы удалить восстанавливаемую копию
+    safety = create_backup(directory, keep=None)['path'] if safety_backup else None
+    before = dict(zip(ENTITIES, db.get_data_version(*ENTITIES)))
+    _copy_into_database(path)
+    db.init_db()  # Копия могла быть снята до появления новых таблиц
+    _raise_versions(before)
+    for entity in ENTITIES:
+        publish(entity, 'import')
+    return safety
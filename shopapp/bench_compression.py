@@ -0,0 +1,49 @@
+"""
+Сравнение экспорта заказов без сжатия и со сжатием (gzip в один и несколько потоков, bz2, xz):
+время записи, время потокового чтения и размер файла.
+
+Работает на временной базе, рабочая база не затрагивается.
+Пример: `python bench_compression.py --orders 20000`.
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+import db
+from compression import open_file
+from bench_snapshot import use_fresh_database, fill_database
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер сжатого экспорта заказов")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'source.db')
+        fill_database(args.clients, args.products, args.orders)
+        orders = db.get_all_orders()
+        rows = [[o.id, o.client.id, o.date.isoformat(), ';'.join(f"{i.product.id}:{i.quantity}" for i in o.items)]
+                for o in orders]
+        for name, workers in (('orders.csv', None), ('orders.csv.gz', 1), ('orders.csv.gz', None),
+                              ('orders.csv.bz2', None), ('orders.csv.xz', None)):
+            filename = os.path.join(tmp, name)
+            start = time.perf_counter()
+            with open_file(filename, 'w', newline='', workers=workers) as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'client_id', 'date', 'items'])
+                writer.writerows(rows)
+            written = time.perf_counter() - start
+            start = time.perf_counter()
+            with open_file(filename, newline='') as f:
+                count = sum(1 for _ in csv.reader(f)) - 1
+            read = time.perf_counter() - start
+            label = name + (' (1 поток)' if workers == 1 else '')
+            print(f"{label:<26}запись {written:6.2f} с, чтение {read:6.2f} с, "
+                  f"{os.path.getsize(filename) / 1e6:8.2f} МБ, строк {count}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Нагрузочная проверка совместной записи несколькими процессами в одну базу.
+
+Каждый процесс добавляет заказы через db.add_order и периодически читает отчет;
+замеряется общая пропускная способность, затем проверяется, что ни одна запись
+не потеряна и сводные таблицы согласованы. Сравниваются режимы журнала WAL и DELETE.
+
+Работает на временной базе, рабочая база не затрагивается.
+Пример: `python bench_concurrency.py --processes 8 --writes 200`.
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import tempfile
+import time
+import db
+from models import Client, Product, Order, OrderItem
+from bench_snapshot import use_fresh_database
+
+def worker(db_name: str, writes: int, offset: int) -> int:
+    """Добавить writes заказов клиенту 1 на товар 1; вернуть число неудачных записей."""
+    db.DB_NAME = db_name
+    db.configure_concurrency(busy_timeout=1.0, retries=10)
+    client, product = db.get_client_by_id(1), db.get_product_by_id(1)
+    failed = 0
+    for i in range(writes):
+        date = datetime.date(2024, 1, 1) + datetime.timedelta(days=(offset + i) % 365)
+        try:
+            db.add_order(Order(client, [OrderItem(product, 1)], date))
+        except Exception:
+            failed += 1
+        if i % 10 == 0:
+            db.get_daily_sales()  # Читатели не должны мешать писателям
+    return failed
+
+def run(db_name: str, journal_mode: str, processes: int, writes: int) -> dict:
+    """Запустить processes процессов-писателей; вернуть пропускную способность и результат проверки."""
+    db.DB_NAME = db_name
+    db.configure_concurrency(journal_mode=journal_mode)
+    db.add_client(Client("Клиент", "client@example.com", "+79000000000"))
+    db.add_product(Product("Товар", 10.0, "Категория", 0))
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        failed = sum(pool.starmap(worker, [(db_name, writes, n * writes) for n in range(processes)]))
+    seconds = time.perf_counter() - start
+    stored = len(db.get_all_orders())
+    return {'rate': (stored / seconds), 'expected': processes * writes - failed, 'stored': stored,
+            'failed': failed, 'drift': db.verify_summaries()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка записи из нескольких процессов")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+
+    lost = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for journal_mode in ('delete', 'wal'):
+            use_fresh_database(tmp, f'{journal_mode}.db')
+            result = run(db.DB_NAME, journal_mode, args.processes, args.writes)
+            print(f"{journal_mode.upper():<8}{result['rate']:10.0f} записей/с, записано {result['stored']} "
+                  f"из {result['expected']}, ошибок {result['failed']}, расхождения сводок: {result['drift'] or 'нет'}")
+            lost = lost or result['stored'] != result['expected'] or bool(result['drift'])
+    if lost:
+        raise SystemExit("Потеряны записи или сводки не согласованы")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Замер прогноза запасов (forecasting.py) на большом каталоге.
+
+Работает на временной базе со сгенерированными данными, рабочая база не затрагивается.
+Пример: `python bench_forecast.py --products 50000 --orders 100000`.
+"""
+
+import argparse
+import datetime
+import tempfile
+from bench_snapshot import fill_database, timed, use_fresh_database
+from forecasting import forecast_stockouts
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер прогноза запасов")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'forecast.db')
+        fill_database(args.clients, args.products, args.orders)
+        end = datetime.date(2025, 12, 28)
+        for method in ('mean', 'ewm'):
+            result = []
+            timed(f"Прогноз ({method})", lambda: result.append(forecast_stockouts(args.days, method, end=end)))
+            print(f"  товаров: {len(result[0])}, к дозаказу: {int(result[0]['needs_reorder'].sum())}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Замер запуска интерфейса: время до первого окна и первого открытия каждой вкладки.
+
+Данные вкладки загружаются при ее первом показе, поэтому первое окно не ждет
+списка заказов. Сумма строк — сколько стоил бы запуск с загрузкой всех вкладок сразу.
+Работает на временной базе со сгенерированными данными; нужен дисплей.
+Пример: `python bench_gui.py --orders 20000`.
+"""
+
+import argparse
+import tempfile
+import time
+import tkinter as tk
+from gui import OrderManagementApp
+from bench_snapshot import fill_database, timed, use_fresh_database
+
+def main():
+    parser = argparse.ArgumentParser(description="Время до первого окна и открытия вкладок")
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'gui.db')
+        fill_database(args.clients, args.products, args.orders)
+        start = time.perf_counter()
+        root = tk.Tk()
+        app = OrderManagementApp(root)
+        root.update()  # Первая отрисовка окна
+        first_window = time.perf_counter() - start
+        print(f"{'Первое окно':<28}{first_window:8.3f} с")
+        tabs = [("Товары", app.notebook, app.products_tab),
+                ("Заказы: создание", app.notebook, app.orders_tab),
+                ("Заказы: просмотр", app.orders_notebook, app.view_orders_frame),
+                ("Анализ", app.notebook, app.analysis_tab)]
+        total = first_window + sum(timed(f"Вкладка {title}", lambda: (notebook.select(frame), root.update()))
+                                   for title, notebook, frame in tabs)
+        print(f"{'Все вкладки сразу':<28}{total:8.3f} с")
+        root.destroy()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Сравнение отчетов по рабочей базе и по снимку report_snapshot.py при одновременной записи.
+
+Процесс-писатель все время добавляет заказы, а в это время повторяется отчет
+(сводка заказов и строки заказов для анализа): сначала по рабочей базе, затем
+внутри reading_snapshot(). Замеряются время отчета и число записей писателя.
+Работает на временной базе со сгенерированными данными.
+Пример: `python bench_report_snapshot.py --orders 20000 --journal-mode delete`.
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import tempfile
+import time
+import analysis
+import db
+from models import Order, OrderItem
+from report_snapshot import create_snapshot, reading_snapshot
+from bench_snapshot import fill_database, use_fresh_database
+
+def writer(db_name: str, stop, written):
+    """Добавлять заказы, пока не установлен stop; счетчик written — число записей."""
+    db.use_database(db_name, initialize=False)
+    client, product = db.get_client_by_id(1), db.get_product_by_id(1)
+    while not stop.is_set():
+        try:
+            db.add_order(Order(client, [OrderItem(product, 1)], datetime.date(2025, 6, 1)))
+        except Exception:
+            continue
+        with written.get_lock():
+            written.value += 1
+
+def report():
+    db.get_order_summaries()
+    analysis.load_line_items()
+
+def measure(label: str, db_name: str, repeats: int, context):
+    stop, written = multiprocessing.Event(), multiprocessing.Value('i', 0)
+    process = multiprocessing.Process(target=writer, args=(db_name, stop, written))
+    process.start()
+    time.sleep(0.5)  # Писатель подключился и пишет
+    with context:
+        start, before = time.perf_counter(), written.value
+        for _ in range(repeats):
+            report()
+        seconds, writes = time.perf_counter() - start, written.value - before
+    stop.set()
+    process.join()
+    print(f"{label:<16}отчет {seconds / repeats * 1000:8.1f} мс, записей писателя {writes / seconds:8.1f} в с")
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчеты по рабочей базе и по снимку при одновременной записи")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--journal-mode', default='wal')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'report.db')
+        db.configure_concurrency(journal_mode=args.journal_mode)
+        fill_database(args.clients, args.products, args.orders)
+        db_name = db.database().target
+        measure("Рабочая база", db_name, args.repeats, db.reading_from(db_name))
+        start = time.perf_counter()
+        create_snapshot()
+        print(f"{'Снимок создан':<16}за {(time.perf_counter() - start) * 1000:.1f} мс")
+        measure("Снимок", db_name, args.repeats, reading_snapshot())
+
+if __name__ == '__main__':
+    main()
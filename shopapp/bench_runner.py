@@ -0,0 +1,53 @@
+"""
+Сравнение расчета всех отчетов «Анализа»: подряд в главном потоке против runner.py.
+
+Для runner замеряется общее время и самая долгая блокировка главного потока
+(один вызов poll: прием результата); остальное время интерфейс свободен.
+Работает на временной базе со сгенерированными данными.
+Пример: `python bench_runner.py --orders 5000 --workers 4`.
+"""
+
+import argparse
+import tempfile
+import time
+import charts
+from runner import AnalysisRunner
+from bench_snapshot import fill_database, use_fresh_database
+
+def main():
+    parser = argparse.ArgumentParser(description="Расчет отчетов в главном потоке и в рабочих процессах")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'runner.db')
+        fill_database(args.clients, args.products, args.orders)
+
+        start = time.perf_counter()
+        for name in charts.CHARTS:
+            charts.chart_data(name)
+        inline = time.perf_counter() - start
+        print(f"{'Подряд в главном потоке':<28}{inline:8.3f} с (интерфейс заблокирован все время)")
+
+        runner = AnalysisRunner(workers=args.workers)
+        runner.submit(time.sleep, 0)  # Запуск forkserver и предзагрузка модулей
+        runner.wait()
+        start = time.perf_counter()
+        for name in charts.CHARTS:
+            runner.submit(charts.chart_data, name)
+        longest = 0.0
+        while True:
+            poll_start = time.perf_counter()
+            remaining = runner.poll()
+            longest = max(longest, time.perf_counter() - poll_start)
+            if not remaining:
+                break
+            time.sleep(0.01)
+        print(f"{'Через runner, ' + str(runner.workers) + ' проц.':<28}{time.perf_counter() - start:8.3f} с "
+              f"(самая долгая блокировка {longest * 1000:.1f} мс)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Сравнение поиска по префиксу: индекс search_index.PrefixIndex против просмотра всех записей.
+
+Индекс строится по сгенерированным клиентам в памяти, база не используется.
+Пример: `python bench_search_index.py --records 200000 --searches 100`.
+"""
+
+import argparse
+import time
+from models import Client
+from search_index import PrefixIndex, text_keys
+
+def make_clients(count: int) -> list:
+    clients = []
+    for i in range(count):
+        client = Client(f"Клиент {i}", f"client{i}@example.com", "+79000000000")
+        client.id = i
+        clients.append(client)
+    return clients
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск по префиксу: индекс и полный просмотр")
+    parser.add_argument('--records', type=int, default=200_000)
+    parser.add_argument('--searches', type=int, default=100)
+    parser.add_argument('--prefix', default='client12345@')
+    args = parser.parse_args()
+
+    clients = make_clients(args.records)
+    start = time.perf_counter()
+    index = PrefixIndex(lambda c: text_keys(c.name, c.email))
+    index.rebuild(clients)
+    print(f"{'Построение индекса':<24}{time.perf_counter() - start:10.3f} с")
+
+    prefix = args.prefix.lower()
+    start = time.perf_counter()
+    for _ in range(args.searches):
+        index.search(prefix)
+    print(f"{'Поиск по индексу':<24}{(time.perf_counter() - start) / args.searches * 1000:10.3f} мс")
+
+    start = time.perf_counter()
+    for _ in range(args.searches):
+        [c for c in clients if any(key.startswith(prefix) for key in text_keys(c.name, c.email))]
+    print(f"{'Просмотр всех записей':<24}{(time.perf_counter() - start) / args.searches * 1000:10.3f} мс")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Нагрузочный тест HTTP-сервиса (server.py): измеряет число запросов в секунду.
+
+Без --url поднимает сервер на свободном локальном порту поверх текущей базы.
+Пример: `python bench_server.py --threads 8 --duration 10 --path /products?limit=50 --etag`.
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+from server import create_server
+
+
+def run_client(host: str, port: int, path: str, use_etag: bool, deadline: float, results: list):
+    """Один поток нагрузки: запросы подряд до истечения времени."""
+    latencies, errors, etag = [], 0, None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        try:
+            headers = {'If-None-Match': etag} if use_etag and etag else {}
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status not in (200, 304):
+                errors += 1
+            etag = response.getheader('ETag') or etag
+        except OSError:
+            errors += 1
+        finally:
+            conn.close()
+        latencies.append(time.perf_counter() - start)
+    results.append((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест JSON API")
+    parser.add_argument('--url', help="Адрес уже запущенного сервера, например http://127.0.0.1:8080")
+    parser.add_argument('--path', default='/products?limit=50')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=8, help="Рабочие потоки локального сервера")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--etag', action='store_true', help="Отправлять If-None-Match")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        server = create_server(port=0, workers=args.workers)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+
+    results = []
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=run_client, args=(host, port, args.path, args.etag, deadline, results))
+               for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    latencies = sorted(lat for lats, _ in results for lat in lats)
+    errors = sum(err for _, err in results)
+    if not latencies:
+        print("Нет выполненных запросов")
+        return
+    print(f"Запросов: {len(latencies)}, ошибок: {errors}, время: {elapsed:.2f} с")
+    print(f"Запросов в секунду: {len(latencies) / elapsed:.1f}")
+    print(f"Задержка p50: {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+          f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
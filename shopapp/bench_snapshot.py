@@ -0,0 +1,78 @@
+"""
+Сравнение скорости и размера: JSON-экспорт/импорт против колоночного снимка (columnar.py).
+
+Работает на временной базе со сгенерированными данными, рабочая база не затрагивается.
+Пример: `python bench_snapshot.py --orders 5000`.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Optional
+import db
+from columnar import export_snapshot, import_snapshot
+
+def fill_database(clients: int, products: int, orders: int):
+    """Заполнить текущую базу случайными данными одной транзакцией."""
+    rnd = random.Random(42)
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)',
+                       [(f"Клиент {i}", f"client{i}@example.com", f"+7900{i:07d}", f"Город {i % 50}")
+                        for i in range(clients)])
+    cursor.executemany('INSERT INTO products (name, price, category, quantity) VALUES (?, ?, ?, ?)',
+                       [(f"Товар {i}", round(rnd.uniform(10, 1000), 2), f"Категория {i % 20}", rnd.randint(0, 500))
+                        for i in range(products)])
+    for order_id in range(1, orders + 1):
+        cursor.execute('INSERT INTO orders (id, client_id, date) VALUES (?, ?, ?)',
+                       (order_id, rnd.randint(1, clients), f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"))
+        cursor.executemany('INSERT INTO order_products (order_id, product_id, quantity) VALUES (?, ?, ?)',
+                           [(order_id, pid, rnd.randint(1, 5)) for pid in rnd.sample(range(1, products + 1), 3)])
+    conn.commit()
+    conn.close()
+
+def timed(label: str, func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed:8.3f} с")
+    return elapsed
+
+def use_fresh_database(directory: Optional[str], name: str):
+    """Переключиться на новую пустую базу: файл name в directory или база в памяти при directory=None."""
+    db.use_database(os.path.join(directory, name) if directory else ':memory:')
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение JSON и колоночного снимка")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'source.db')
+        fill_database(args.clients, args.products, args.orders)
+        json_files = [os.path.join(tmp, f'{name}.json') for name in ('clients', 'products', 'orders')]
+        snapshot_file = os.path.join(tmp, 'snapshot.npz')
+
+        json_export = timed("Экспорт JSON", lambda: (db.export_clients_to_json(json_files[0]),
+                                                     db.export_products_to_json(json_files[1]),
+                                                     db.export_orders_to_json(json_files[2])))
+        snap_export = timed("Экспорт снимка", export_snapshot, snapshot_file)
+
+        use_fresh_database(tmp, 'json.db')
+        json_import = timed("Импорт JSON", lambda: (db.import_clients_from_json(json_files[0]),
+                                                    db.import_products_from_json(json_files[1]),
+                                                    db.import_orders_from_json(json_files[2])))
+        use_fresh_database(tmp, 'snapshot.db')
+        snap_import = timed("Импорт снимка", import_snapshot, snapshot_file)
+
+        json_size = sum(os.path.getsize(f) for f in json_files)
+        snap_size = os.path.getsize(snapshot_file)
+        print(f"Размер JSON: {json_size / 1024:.1f} КБ, снимка: {snap_size / 1024:.1f} КБ")
+        print(f"Ускорение экспорта: x{json_export / snap_export:.1f}, импорта: x{json_import / snap_import:.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Сравнение пропускной способности записи: коммит на каждый вызов против очереди
+с групповым коммитом (writequeue.py) при разных уровнях надежности.
+
+Работает на временной базе, рабочая база не затрагивается. С --memory добавляется
+замер той же записи в базу в памяти — нижняя граница стоимости без диска.
+Пример: `python bench_writequeue.py --writes 2000 --threads 4 --memory`.
+"""
+
+import argparse
+import threading
+import tempfile
+import time
+import db
+from models import Client
+from bench_snapshot import use_fresh_database
+
+def run_writers(writes: int, threads: int) -> float:
+    """Добавить writes клиентов из threads потоков; вернуть число записей в секунду."""
+    per_thread = writes // threads
+    futures = []
+    lock = threading.Lock()
+
+    def produce(offset: int):
+        for i in range(offset, offset + per_thread):
+            future = db.add_client(Client(f"Клиент {i}", f"client{i}@example.com", "+79000000000"))
+            with lock:
+                futures.append(future)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=produce, args=(n * per_thread,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    for future in futures:
+        future.result()
+    return per_thread * threads / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер очереди записи с групповым коммитом")
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--memory', action='store_true', help="Замерить также базу в памяти")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_fresh_database(tmp, 'direct.db')
+        print(f"{'Коммит на вызов':<28}{run_writers(args.writes, args.threads):10.0f} записей/с")
+        for durability in ('full', 'normal', 'off'):
+            use_fresh_database(tmp, f'queue_{durability}.db')
+            queue = db.enable_write_queue(durability=durability)
+            rate = run_writers(args.writes, args.threads)
+            print(f"{'Очередь, ' + durability:<28}{rate:10.0f} записей/с, транзакций: {queue.batches}")
+            db.disable_write_queue()
+    if args.memory:
+        use_fresh_database(None, 'memory')
+        print(f"{'Коммит на вызов, в памяти':<28}{run_writers(args.writes, args.threads):10.0f} записей/с")
+        db.close_database()
+
+if __name__ == '__main__':
+    main()
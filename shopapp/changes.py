@@ -0,0 +1,198 @@
+"""
+Модуль дельта-экспорта для синхронизации внешних систем.
+Триггеры db.CHANGELOG_TRIGGERS записывают каждое изменение клиентов, товаров и заказов
+в таблицу changelog с растущим номером seq. Выгрузка берет только записи журнала после
+водяного знака потребителя, поэтому ее стоимость пропорциональна объему изменений,
+а не размеру таблиц.
+"""
+
+import csv
+import datetime
+import json
+from typing import Optional
+import db
+from compression import compression_of, open_file
+
+# Сущность -> столбцы выгрузки (для заказов items — позиции заказа)
+ENTITY_COLUMNS = {
+    'clients': ('id', 'name', 'email', 'phone', 'address'),
+    'products': ('id', 'name', 'price', 'category', 'quantity', 'reorder_threshold'),
+    'orders': ('id', 'client_id', 'date', 'items'),
+}
+DEFAULT_CONSUMER = 'default'
+OPERATION_STATS = {'insert': 'inserted', 'update': 'updated', 'delete': 'deleted'}
+
+def _check_entity(entity: str):
+    if entity not in ENTITY_COLUMNS:
+        raise ValueError(f"Неизвестная сущность: {entity}")
+
+def get_watermark(entity: str, consumer: str = DEFAULT_CONSUMER) -> Optional[int]:
+    """Водяной знак потребителя: seq последней выгруженной записи журнала; None, если выгрузок не было."""
+    _check_entity(entity)
+    conn = db.connect()
+    row = conn.execute('SELECT seq FROM sync_watermarks WHERE consumer = ? AND entity = ?',
+                       (consumer, entity)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+@db.retry_on_busy
+def _set_watermark(entity: str, consumer: str, seq: int):
+    conn = db.connect(write=True)
+    conn.execute('INSERT INTO sync_watermarks (consumer, entity, seq, exported_at) VALUES (?, ?, ?, ?) '
+                 'ON CONFLICT (consumer, entity) DO UPDATE SET seq = excluded.seq, exported_at = excluded.exported_at',
+                 (consumer, entity, seq, datetime.datetime.now().isoformat(timespec='seconds')))
+    conn.commit()
+    conn.close()
+
+def _changed_ids(cursor, entity: str, since: int, until: int) -> dict:
+    """Итоговая операция по каждой измененной строке: {ID: 'insert' | 'update' | 'delete'}."""
+    cursor.execute('SELECT row_id, operation FROM changelog WHERE entity = ? AND seq > ? AND seq <= ? ORDER BY seq',
+                   (entity, since, until))
+    first = {}
+    for row_id, operation in cursor:
+        first.setdefault(row_id, operation)
+    cursor.execute(f'SELECT id FROM {entity} WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(list(first)),))
+    existing = {row[0] for row in cursor.fetchall()}
+    changes = {}
+    for row_id, operation in first.items():
+        if row_id not in existing:
+            if operation != 'insert':  # Вставленная и удаленная в одном окне строка потребителю не нужна
+                changes[row_id] = 'delete'
+        else:
+            changes[row_id] = 'insert' if operation == 'insert' else 'update'
+    return changes
+
+def _fetch_rows(cursor, entity: str, ids: Optional[list]) -> dict:
+    """Текущие строки сущности по ID (все строки, если ids=None): {ID: кортеж значений ENTITY_COLUMNS}."""
+    where, params = ('', ()) if ids is None else ('WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),))
+    if entity != 'orders':
+        cursor.execute(f'SELECT {", ".join(ENTITY_COLUMNS[entity])} FROM {entity} {where}', params)
+        return {row[0]: row for row in cursor.fetchall()}
+    cursor.execute(f'SELECT id, client_id, date FROM orders {where}', params)
+    rows = {row[0]: row + ([],) for row in cursor.fetchall()}
+    line_where = where.replace('WHERE id', 'WHERE order_id')
+    cursor.execute(f'SELECT order_id, product_id, quantity FROM order_products {line_where} '
+                   f'ORDER BY order_id, product_id', params)
+    for order_id, product_id, quantity in cursor:
+        if order_id in rows:
+            rows[order_id][3].append((product_id, quantity))
+    return rows
+
+def read_changes(entity: str, since: Optional[int] = 0) -> tuple:
+    """
+    Прочитать изменения сущности после водяного знака since.
+
+    Параметры
+    ----------
+    entity : str
+        'clients', 'products' или 'orders'.
+    since : int or None
+        seq последней уже полученной записи журнала; None — полная выгрузка всех строк как вставок
+        (начальная синхронизация: строки, созданные до появления журнала, в нем не записаны).
+
+    Возвращает (изменения, новый водяной знак). Изменение — (операция, значения ENTITY_COLUMNS);
+    у удаленных строк известен только ID, остальные значения None. Журнал и строки читаются
+    в одной транзакции, поэтому изменения, зафиксированные позже, попадут в следующую выгрузку.
+    """
+    _check_entity(entity)
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')  # Согласованный снимок журнала и таблиц
+    try:
+        # Счетчик AUTOINCREMENT не убывает и после очистки журнала (prune_changelog)
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changelog'")
+        watermark = (cursor.fetchone() or (0,))[0]
+        if since is None:
+            rows = _fetch_rows(cursor, entity, None)
+            changes = [('insert', rows[row_id]) for row_id in sorted(rows)]
+        else:
+            operations = _changed_ids(cursor, entity, since, watermark)
+            rows = _fetch_rows(cursor, entity, [i for i, op in operations.items() if op != 'delete'])
+            blank = (None,) * (len(ENTITY_COLUMNS[entity]) - 1)
+            changes = [(operations[row_id], rows.get(row_id, (row_id,) + blank)) for row_id in sorted(operations)]
+    finally:
+        conn.close()
+    return changes, watermark
+
+def _write_csv(f, entity: str, changes: list):
+    writer = csv.writer(f)
+    writer.writerow(('operation',) + ENTITY_COLUMNS[entity])
+    for operation, values in changes:
+        if entity == 'orders' and values[3] is not None:
+            values = values[:3] + (';'.join(f"{product_id}:{quantity}" for product_id, quantity in values[3]),)
+        writer.writerow((operation,) + values)
+
+def _write_json(f, entity: str, changes: list):
+    data = []
+    for operation, values in changes:
+        if operation == 'delete':
+            data.append({'operation': operation, 'id': values[0]})
+            continue
+        item = dict(zip(ENTITY_COLUMNS[entity], values))
+        if entity == 'orders':
+            item['items'] = [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in values[3]]
+        data.append({'operation': operation, **item})
+    json.dump(data, f, ensure_ascii=False, indent=4)
+
+def export_changes(entity: str, filename: str, consumer: str = DEFAULT_CONSUMER, since: Optional[int] = None) -> dict:
+    """
+    Выгрузить изменения сущности после водяного знака потребителя и записать новый знак.
+
+    Параметры
+    ----------
+    entity : str
+        'clients', 'products' или 'orders'.
+    filename : str
+        Файл .csv или .json, можно сжатый (.csv.gz, .json.xz ...).
+    consumer : str
+        Имя потребителя: у каждой внешней системы свой водяной знак.
+    since : int, optional
+        Явный водяной знак вместо сохраненного. Если не задан и потребитель выгружает
+        впервые, выгружаются все строки.
+
+    Возвращает словарь: inserted, updated, deleted (число строк) и watermark.
+    Водяной знак сохраняется только после успешной записи файла.
+    Заказы, перенесенные в архив, выгружаются как удаленные.
+    """
+    _check_entity(entity)
+    compression = compression_of(filename)
+    base = filename[:-len(compression)] if compression else filename
+    if not base.lower().endswith(('.csv', '.json')):
+        raise ValueError(f"Поддерживаются файлы .csv и .json: {filename}")
+    if since is None:
+        since = get_watermark(entity, consumer)
+    changes, watermark = read_changes(entity, since)
+    if base.lower().endswith('.csv'):
+        with open_file(filename, 'w', newline='') as f:
+            _write_csv(f, entity, changes)
+    else:
+        with open_file(filename, 'w') as f:
+            _write_json(f, entity, changes)
+    _set_watermark(entity, consumer, watermark)
+    stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'watermark': watermark}
+    for operation, _ in changes:
+        stats[OPERATION_STATS[operation]] += 1
+    return stats
+
+@db.retry_on_busy
+def prune_changelog() -> int:
+    """
+    Удалить записи журнала, уже выгруженные всеми потребителями сущности.
+
+    Журнал сущности без потребителей очищается полностью: новый потребитель все равно
+    начинает с полной выгрузки. Возвращает число удаленных записей.
+    """
+    conn = db.connect(write=True)
+    cursor = conn.cursor()
+    deleted = 0
+    for entity in ENTITY_COLUMNS:
+        cursor.execute('SELECT MIN(seq) FROM sync_watermarks WHERE entity = ?', (entity,))
+        low = cursor.fetchone()[0]
+        if low is None:
+            cursor.execute('DELETE FROM changelog WHERE entity = ?', (entity,))
+        else:
+            cursor.execute('DELETE FROM changelog WHERE entity = ? AND seq <= ?', (entity, low))
+        deleted += cursor.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
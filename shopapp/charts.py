@@ -0,0 +1,168 @@
+"""
+Модуль построения графиков отчетов без pyplot.
+Графики рисуются на matplotlib.figure.Figure (растеризация Agg), встраиваются
+во вкладку «Анализ» через FigureCanvasTkAgg и кэшируются по отчету, параметрам
+и версии данных; экспорт в PNG/SVG берет изображение из того же кэша.
+Получение данных (chart_data) отделено от отрисовки (chart_from_data), чтобы
+тяжелую часть можно было выполнить в другом процессе (см. runner.py).
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import db
+import analysis
+
+CHART_CACHE_SIZE = 16  # Сколько построенных графиков держать в памяти
+EXPORT_FORMATS = ('png', 'svg')
+
+def _revenue_by_product(include_archive: bool, top: int = 10):
+    """Топ товаров по выручке."""
+    return analysis.revenue_by_product(include_archive).head(top)
+
+# Отчет -> (заголовок, функция данных(include_archive, **params), функция отрисовки(ax, данные), размер дюймы)
+CHARTS = {
+    'top_clients': ("Топ 5 клиентов", analysis.top_clients_data, analysis.draw_top_clients, (10, 6)),
+    'order_dynamics': ("Динамика заказов", analysis.order_dynamics_data, analysis.draw_order_dynamics, (8, 5)),
+    'client_graph': ("Граф клиентов", analysis.client_graph_data, analysis.draw_client_graph, (12, 8)),
+    'revenue_by_product': (
+        "Выручка по товарам", _revenue_by_product,
+        lambda ax, data: analysis.draw_bar(ax, data, 'name', 'revenue', "Топ товаров по выручке", "Товар", "Выручка"),
+        (10, 6)),
+    'revenue_by_category': (
+        "Выручка по категориям", analysis.revenue_by_category,
+        lambda ax, data: analysis.draw_bar(ax, data, 'category', 'revenue', "Выручка по категориям",
+                                           "Категория", "Выручка"),
+        (10, 6)),
+    'revenue_by_period': (
+        "Выручка по периодам", lambda include_archive, freq='M': analysis.revenue_by_period(freq, include_archive),
+        analysis.draw_revenue_by_period, (10, 6)),
+    'average_basket': (
+        "Средний чек", lambda include_archive, freq='M': analysis.average_basket_size(freq, include_archive),
+        lambda ax, data: analysis.draw_bar(ax, data, 'period', 'revenue_per_order', "Средний чек",
+                                           "Период", "Выручка на заказ"),
+        (10, 6)),
+}
+
+class RenderedChart:
+    """Построенный график: фигура и лениво сохраненные изображения по форматам."""
+
+    def __init__(self, figure: Figure):
+        self.figure = figure
+        self._images = {}
+        self._lock = threading.Lock()
+
+    def image(self, fmt: str = 'png') -> bytes:
+        """Изображение графика в формате fmt ('png' или 'svg'); строится один раз."""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат: {fmt}")
+        with self._lock:
+            if fmt not in self._images:
+                buffer = io.BytesIO()
+                self.figure.savefig(buffer, format=fmt)
+                self._images[fmt] = buffer.getvalue()
+            return self._images[fmt]
+
+_cache = OrderedDict()  # (база, отчет, include_archive, параметры, версия данных) -> RenderedChart
+_cache_lock = threading.Lock()
+
+def _is_empty(data) -> bool:
+    """Нет данных для графика: None, пустой DataFrame или пустой граф."""
+    if data is None:
+        return True
+    if hasattr(data, 'number_of_nodes'):
+        return data.number_of_nodes() == 0
+    return data.empty
+
+def _check_name(name: str):
+    if name not in CHARTS:
+        raise ValueError(f"Неизвестный отчет: {name}")
+
+def _cache_key(name: str, include_archive: bool, params: dict, version: tuple) -> tuple:
+    return (db.database().target, name, include_archive, tuple(sorted(params.items())), version)
+
+def _data_version() -> tuple:
+    return db.get_data_version('clients', 'products', 'orders')
+
+def chart_data(name: str, include_archive: bool = False, **params) -> tuple:
+    """
+    Получить данные отчета без отрисовки: (версия данных, данные).
+
+    Данные — DataFrame или граф networkx; кортеж сериализуется, поэтому функцию
+    можно выполнить в рабочем процессе и передать результат в chart_from_data.
+    """
+    _check_name(name)
+    version = _data_version()  # Версия до чтения: если данные успеют измениться, ключ кэша устареет
+    _, data_func, _, _ = CHARTS[name]
+    return version, data_func(include_archive, **params)
+
+def cached_chart(name: str, include_archive: bool = False, **params) -> Optional[RenderedChart]:
+    """График из кэша для текущей версии данных или None."""
+    _check_name(name)
+    key = _cache_key(name, include_archive, params, _data_version())
+    with _cache_lock:
+        chart = _cache.get(key)
+        if chart is not None:
+            _cache.move_to_end(key)
+        return chart
+
+def chart_from_data(name: str, result: tuple, include_archive: bool = False, **params) -> RenderedChart:
+    """Нарисовать график по результату chart_data и положить его в кэш."""
+    _check_name(name)
+    version, data = result
+    chart = RenderedChart(_draw_figure(name, data))
+    with _cache_lock:
+        _cache[_cache_key(name, include_archive, params, version)] = chart
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return chart
+
+def _draw_figure(name: str, data) -> Figure:
+    """Нарисовать данные отчета на новой фигуре."""
+    _, _, draw_func, size = CHARTS[name]
+    figure = Figure(figsize=size)
+    FigureCanvasAgg(figure)  # Растеризация без pyplot и без окна
+    ax = figure.add_subplot()
+    if _is_empty(data):
+        ax.text(0.5, 0.5, "Нет данных", ha='center', va='center', fontsize=14)
+        ax.set_axis_off()
+    else:
+        draw_func(ax, data)
+    figure.tight_layout()
+    return figure
+
+def render_chart(name: str, include_archive: bool = False, **params) -> RenderedChart:
+    """
+    Построить график отчета или взять его из кэша.
+
+    Параметры
+    ----------
+    name : str
+        Ключ отчета в CHARTS.
+    include_archive : bool
+        Учитывать заказы из архива.
+    **params
+        Параметры отчета (например, freq для выручки по периодам).
+
+    Кэш сбрасывается для отчета автоматически, когда меняются клиенты, товары или заказы.
+    """
+    chart = cached_chart(name, include_archive, **params)
+    if chart is None:
+        chart = chart_from_data(name, chart_data(name, include_archive, **params), include_archive, **params)
+    return chart
+
+def export_chart(name: str, filename: str, include_archive: bool = False, **params):
+    """Сохранить график отчета в PNG или SVG (по расширению файла), используя кэш."""
+    fmt = os.path.splitext(filename)[1].lstrip('.').lower() or 'png'
+    data = render_chart(name, include_archive, **params).image(fmt)
+    with open(filename, 'wb') as f:
+        f.write(data)
+
+def clear_cache():
+    """Очистить кэш графиков."""
+    with _cache_lock:
+        _cache.clear()
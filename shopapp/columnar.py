@@ -0,0 +1,108 @@
+"""
+Модуль колоночного бинарного снимка базы данных в формате NumPy .npz.
+Один архив содержит клиентов, товары, заказы и позиции заказов,
+каждый столбец хранится отдельным массивом.
+"""
+
+import numpy as np
+import pandas as pd
+import db
+from events import publish
+
+SNAPSHOT_VERSION = 2  # Версия формата снимка
+READABLE_VERSIONS = (1, 2)  # В снимках версии 1 нет порога дозаказа товаров
+
+# Таблица -> [(столбец, dtype массива)]. Строки хранятся как юникодные массивы,
+# даты заказов как datetime64[D], NULL в текстовых столбцах становится пустой строкой.
+# Столбцы, которых нет в снимке старой версии, при импорте получают значения по умолчанию.
+SNAPSHOT_TABLES = {
+    'clients': [('id', np.int64), ('name', str), ('email', str), ('phone', str), ('address', str)],
+    'products': [('id', np.int64), ('name', str), ('price', np.float64), ('category', str), ('quantity', np.int64),
+                 ('reorder_threshold', np.int64)],
+    'orders': [('id', np.int64), ('client_id', np.int64), ('date', 'datetime64[D]')],
+    'order_products': [('order_id', np.int64), ('product_id', np.int64), ('quantity', np.int64)],
+}
+
+def _column_array(values, dtype) -> np.ndarray:
+    """Собрать массив столбца нужного типа."""
+    if dtype is str:
+        return np.array(['' if v is None else v for v in values], dtype=str)
+    return np.array(values, dtype=dtype)
+
+def export_snapshot(filename: str = 'snapshot.npz', compress: bool = True):
+    """
+    Экспортировать всю базу в колоночный снимок.
+
+    Параметры
+    ----------
+    filename : str
+        Имя файла .npz.
+    compress : bool
+        Сжимать массивы (меньше файл, чуть медленнее запись).
+    """
+    conn = db.connect()
+    cursor = conn.cursor()
+    arrays = {'version': np.array(SNAPSHOT_VERSION)}
+    for table, columns in SNAPSHOT_TABLES.items():
+        names = ', '.join(name for name, _ in columns)
+        cursor.execute(f'SELECT {names} FROM {table} ORDER BY 1')
+        rows = cursor.fetchall()
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        for (name, dtype), column in zip(columns, values):
+            arrays[f'{table}.{name}'] = _column_array(column, dtype)
+    conn.close()
+    (np.savez_compressed if compress else np.savez)(filename, **arrays)
+
+def _read_arrays(filename: str) -> dict:
+    """Прочитать массивы снимка с проверкой версии формата."""
+    with np.load(filename, allow_pickle=False) as data:
+        version = int(data['version']) if 'version' in data else None
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Неподдерживаемая версия снимка: {version}")
+        return {key: data[key] for key in data.files}
+
+@db.retry_on_busy
+def import_snapshot(filename: str = 'snapshot.npz'):
+    """
+    Импортировать снимок, заменив текущие данные.
+
+    Идентификаторы сохраняются, поэтому связи заказов с клиентами и товарами не теряются.
+    Загрузка идет одной транзакцией через executemany; сводные таблицы
+    пересчитываются один раз в конце, а не триггерами на каждую строку.
+    Таблица рекомендаций очищается (пересчет — recommendations.build_recommendations).
+    """
+    arrays = _read_arrays(filename)
+    conn = db.connect(isolation_level=None)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        db._drop_summary_triggers(cursor)
+        for table in reversed(list(SNAPSHOT_TABLES)):
+            cursor.execute(f'DELETE FROM {table}')
+        # Рекомендации ссылаются на ID прежнего каталога: после импорта их нужно пересчитать
+        cursor.execute('DELETE FROM product_recommendations')
+        for table, columns in SNAPSHOT_TABLES.items():
+            columns = [(name, dtype) for name, dtype in columns if f'{table}.{name}' in arrays]
+            values = []
+            for name, dtype in columns:
+                column = arrays[f'{table}.{name}']
+                values.append(column.astype(str) if dtype == 'datetime64[D]' else column)
+            names = ', '.join(name for name, _ in columns)
+            placeholders = ', '.join('?' * len(columns))
+            cursor.executemany(f'INSERT INTO {table} ({names}) VALUES ({placeholders})',
+                               zip(*(column.tolist() for column in values)))
+        db._restore_summaries(cursor)
+        cursor.execute('COMMIT')
+    except BaseException:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    for entity in ('clients', 'products', 'orders'):
+        publish(entity, 'import')
+
+def load_snapshot_frames(filename: str = 'snapshot.npz') -> dict:
+    """Загрузить снимок напрямую в pandas DataFrame для анализа, минуя базу данных."""
+    arrays = _read_arrays(filename)
+    return {table: pd.DataFrame({name: arrays[f'{table}.{name}'] for name, _ in columns if f'{table}.{name}' in arrays})
+            for table, columns in SNAPSHOT_TABLES.items()}
@@ -0,0 +1,117 @@
+"""
+Модуль прозрачного сжатия файлов экспорта и импорта.
+Формат выбирается по расширению: .gz, .bz2, .xz, иначе файл без сжатия.
+Gzip пишется параллельно: текст режется на блоки, блоки сжимаются в пуле потоков
+(zlib отпускает GIL) и записываются по порядку как члены одного gzip-файла;
+чтение любого формата потоковое.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+BLOCK_SIZE = 1 << 20  # Размер блока параллельного gzip, байт
+GZIP_LEVEL = 6        # Уровень сжатия gzip (1 — быстрее, 9 — меньше)
+
+# Расширение -> модуль с функцией open(filename, mode, ...)
+COMPRESSORS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+
+def compression_of(filename: str) -> Optional[str]:
+    """Расширение сжатия файла ('.gz', '.bz2', '.xz') или None для несжатого."""
+    extension = os.path.splitext(filename)[1].lower()
+    return extension if extension in COMPRESSORS else None
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """
+    Двоичный поток записи gzip со сжатием блоков в нескольких потоках.
+
+    Параметры
+    ----------
+    filename : str
+        Файл результата.
+    level : int
+        Уровень сжатия.
+    block_size : int
+        Размер независимо сжимаемого блока, байт.
+    workers : int, optional
+        Число потоков сжатия; по умолчанию число ядер.
+
+    Каждый блок — отдельный член gzip (RFC 1952 допускает их конкатенацию), поэтому файл
+    читается gzip, zcat и gzip.open как обычный. В памяти не больше 2 * workers блоков.
+    """
+
+    def __init__(self, filename: str, level: int = GZIP_LEVEL, block_size: int = BLOCK_SIZE,
+                 workers: Optional[int] = None):
+        super().__init__()
+        self.level = level
+        self.block_size = block_size
+        workers = workers or os.cpu_count() or 1
+        self._max_pending = 2 * workers
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='gzip')
+        self._pending = deque()  # Future сжатых блоков в порядке записи
+        self._buffer = bytearray()
+        self._file = open(filename, 'wb')
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("Запись в закрытый файл")
+        self._buffer += data
+        if len(self._buffer) >= self.block_size:
+            view = memoryview(self._buffer)
+            whole = len(self._buffer) - len(self._buffer) % self.block_size
+            for start in range(0, whole, self.block_size):
+                self._submit(bytes(view[start:start + self.block_size]))
+            view.release()
+            del self._buffer[:whole]
+        return len(data)
+
+    def _submit(self, block: bytes):
+        self._pending.append(self._pool.submit(gzip.compress, block, self.level, mtime=0))
+        while len(self._pending) > self._max_pending:
+            self._file.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._pending:
+                self._submit(bytes(self._buffer))  # Пустой файл — тоже корректный gzip
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown()
+            self._file.close()
+            super().close()
+
+def open_file(filename: str, mode: str = 'r', encoding: str = 'utf-8', newline: Optional[str] = None,
+              workers: Optional[int] = None):
+    """
+    Открыть текстовый файл экспорта/импорта со сжатием по расширению.
+
+    Параметры
+    ----------
+    filename : str
+        Имя файла; .gz, .bz2 и .xz сжимаются, остальные открываются как есть.
+    mode : str
+        'r' — чтение (потоковая распаковка), 'w' — запись.
+    encoding, newline
+        Как у встроенного open (для CSV передайте newline='').
+    workers : int, optional
+        Потоков сжатия для .gz; 1 — обычная однопоточная запись.
+    """
+    if mode not in ('r', 'w'):
+        raise ValueError(f"Неподдерживаемый режим: {mode}")
+    compression = compression_of(filename)
+    if compression is None:
+        return open(filename, mode, encoding=encoding, newline=newline)
+    if compression == '.gz' and mode == 'w' and workers != 1:
+        return io.TextIOWrapper(ParallelGzipWriter(filename, workers=workers), encoding=encoding, newline=newline)
+    return COMPRESSORS[compression].open(filename, mode + 't', encoding=encoding, newline=newline)
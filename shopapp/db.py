@@ -1,108 +1,971 @@
 """
 Модуль для операций с базой данных с использованием SQLite.
 Обрабатывает CRUD-операции для клиентов, товаров и заказов.
-Теперь включает импорт/экспорт в CSV и JSON.
+Теперь включает импорт/экспорт в CSV и JSON, в том числе сжатых (.gz, .bz2, .xz).
 """
 
 import sqlite3
 import datetime
 from models import Client, Product, Order, OrderItem
-from typing import List, Optional
+from events import publish, ENTITIES
+from compression import open_file
+from typing import Iterable, List, Optional
+from concurrent.futures import Future
+import contextlib
 import csv
+import functools
+import itertools
 import json
+import logging
 import os
+import random
+import threading
+import time
+import urllib.request
 
-DB_NAME = 'order_management.db'  # Имя файла базы данных
+log = logging.getLogger(__name__)
 
+DB_ENV_VAR = 'SHOPAPP_DB'  # Переменная окружения с путем к базе (или URI, или ':memory:')
+DB_NAME = os.environ.get(DB_ENV_VAR, 'order_management.db')  # Текущая база: путь, URI 'file:...' или ':memory:'
+AUTO_VACUUM_INCREMENTAL = 2  # Значение PRAGMA auto_vacuum в режиме INCREMENTAL
+
+# Параметры совместной работы нескольких процессов с одной базой (см. configure_concurrency)
+JOURNAL_MODE = 'wal'     # Режим журнала: в WAL читатели не блокируют писателя, а писатель — читателей
+BUSY_TIMEOUT = 5.0       # Сколько секунд SQLite ждет снятия чужой блокировки до ошибки «database is locked»
+RETRY_ATTEMPTS = 5       # Сколько раз повторить запись, если блокировка не снялась за BUSY_TIMEOUT
+RETRY_BASE_DELAY = 0.05  # Пауза перед первым повтором, с; удваивается с каждым повтором
+RETRY_MAX_DELAY = 2.0    # Верхняя граница паузы между повторами, с
+
+class Database:
+    """
+    Контекст подключения к базе: файл, URI SQLite ('file:...') или ':memory:'.
+
+    ':memory:' становится именованной базой в памяти процесса (VFS memdb): все соединения
+    процесса видят одни и те же данные с обычными блокировками, а служебное соединение
+    держит базу, пока не вызван close(). Каждый ':memory:' — отдельная изолированная база.
+    """
+
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, target: str):
+        if target == ':memory:':
+            target = f'file:/shopapp-{os.getpid()}-{next(Database._memory_ids)}?vfs=memdb'
+        self.target = target
+        self.uri = target.startswith('file:')
+        self.in_memory = self.uri and ('vfs=memdb' in target or 'mode=memory' in target)
+        self.initialized = False  # Схема создана (init_db выполняется при первом подключении)
+        self.mmap_size = 0  # PRAGMA mmap_size для новых соединений, байт; 0 — настройка SQLite по умолчанию
+        self._keeper = self.connect() if self.in_memory else None
+
+    @property
+    def path(self) -> Optional[str]:
+        """Абсолютный путь файла базы; None для базы в памяти."""
+        if self.in_memory:
+            return None
+        path = self.target[len('file:'):].split('?', 1)[0] if self.uri else self.target
+        return os.path.abspath(path)
+
+    def connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.target, timeout=BUSY_TIMEOUT, uri=self.uri, **kwargs)
+        if self.mmap_size:
+            conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        return conn
+
+    def attach_target(self, path: str) -> str:
+        """Имя файла для ATTACH: из базы в памяти файл подключается через URI с файловой VFS."""
+        if not self.in_memory:
+            return path
+        vfs = 'win32' if os.name == 'nt' else 'unix'  # Иначе ATTACH унаследует memdb и файл не будет создан
+        return f'file:{urllib.request.pathname2url(os.path.abspath(path))}?vfs={vfs}'
+
+    def close(self):
+        """Освободить базу в памяти (для файла ничего не делает)."""
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+
+_databases = {}  # DB_NAME -> Database
+_reading = threading.local()  # Базы чтения потоков (reading_from)
+
+def _current() -> Database:
+    context = getattr(_reading, 'context', None)
+    if context is not None:
+        return context
+    context = _databases.get(DB_NAME)
+    if context is None:
+        context = _databases[DB_NAME] = Database(DB_NAME)
+    return context
+
+def database() -> Database:
+    """Контекст текущей базы DB_NAME; при первом обращении к базе создается схема (init_db)."""
+    context = _current()
+    if not context.initialized:
+        init_db()
+    return context
+
+def use_database(target: Optional[str] = None, initialize: bool = True) -> Database:
+    """
+    Переключить слой данных на другую базу.
+
+    Параметры
+    ----------
+    target : str, optional
+        Путь к файлу, URI SQLite или ':memory:' (новая пустая база в памяти).
+        По умолчанию — переменная окружения SHOPAPP_DB или 'order_management.db'.
+    initialize : bool
+        Создать схему (init_db). False — схема уже создана другим процессом
+        (например, рабочие процессы runner.py не берут блокировку записи при старте).
+
+    Прежняя база в памяти с тем же именем освобождается. Возвращает контекст новой базы.
+    """
+    global DB_NAME
+    target = target or os.environ.get(DB_ENV_VAR, 'order_management.db')
+    queue = _write_queue
+    if queue is not None:  # Дописать очередь в прежнюю базу, затем открыть такую же для новой
+        disable_write_queue()
+    previous = _databases.pop(target, None)
+    if previous is not None:
+        previous.close()
+    DB_NAME = target
+    if not initialize:
+        _current().initialized = True
+    context = database()
+    if queue is not None:
+        enable_write_queue(queue.max_batch, queue.max_delay, queue.durability)
+    return context
+
+@contextlib.contextmanager
+def reading_from(target: str, mmap_size: int = 0):
+    """
+    Временно направить соединения текущего потока к другой готовой базе (например, к снимку report_snapshot.py).
+
+    Параметры
+    ----------
+    target : str
+        Путь или URI SQLite; схема не создается.
+    mmap_size : int
+        PRAGMA mmap_size для соединений этой базы, байт.
+
+    Другие потоки и процессы по-прежнему работают с DB_NAME, поэтому фоновая запись
+    (writequeue.py) не затрагивается. Задания runner.py, поставленные внутри блока,
+    выполняются на той же базе.
+    """
+    context = Database(target)
+    context.initialized = True
+    context.mmap_size = mmap_size
+    previous = getattr(_reading, 'context', None)
+    _reading.context = context
+    try:
+        yield context
+    finally:
+        _reading.context = previous
+        context.close()
+
+def close_database():
+    """Забыть контекст текущей базы и освободить ее, если она в памяти (очередь записи дописывается и закрывается)."""
+    disable_write_queue()
+    context = _databases.pop(DB_NAME, None)
+    if context is not None:
+        context.close()
+
+def connect(db_name: Optional[str] = None, write: bool = False, **kwargs) -> sqlite3.Connection:
+    """
+    Открыть соединение с базой с ожиданием блокировок BUSY_TIMEOUT.
+
+    Без db_name (или с db_name == DB_NAME) подключается к текущей базе через ее контекст,
+    иначе — к указанному файлу или URI. При write=True неявные транзакции начинаются
+    с BEGIN IMMEDIATE: блокировка записи берется сразу, а не при первом изменении, поэтому
+    две записи не могут взаимно заблокироваться на повышении блокировки.
+    Остальные kwargs передаются в sqlite3.connect.
+    """
+    if write:
+        kwargs.setdefault('isolation_level', 'IMMEDIATE')
+    if db_name is None or db_name == DB_NAME:
+        return database().connect(**kwargs)
+    return sqlite3.connect(db_name, timeout=BUSY_TIMEOUT, uri=db_name.startswith('file:'), **kwargs)
+
+def _is_busy(error: Exception) -> bool:
+    """Ошибка вызвана чужой блокировкой базы (ее имеет смысл повторить)."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+def retry_on_busy(func):
+    """
+    Декоратор записи: повторить вызов, если база осталась заблокированной дольше BUSY_TIMEOUT.
+
+    Перед повтором — пауза RETRY_BASE_DELAY * 2**попытка (не больше RETRY_MAX_DELAY)
+    со случайным разбросом, чтобы ожидающие процессы не просыпались одновременно.
+    Функция должна откатывать незафиксированную транзакцию при ошибке (закрытие соединения это делает).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == RETRY_ATTEMPTS:
+                    raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+    return wrapper
+
+def configure_concurrency(journal_mode: Optional[str] = None, busy_timeout: Optional[float] = None,
+                          retries: Optional[int] = None, base_delay: Optional[float] = None,
+                          max_delay: Optional[float] = None) -> str:
+    """
+    Настроить совместный доступ к базе; незаданные параметры не меняются.
+
+    Параметры
+    ----------
+    journal_mode : str, optional
+        Режим журнала ('wal', 'delete', 'truncate' ...); сразу применяется к текущей базе.
+    busy_timeout : float, optional
+        Ожидание чужой блокировки, с.
+    retries : int, optional
+        Число повторов записи после истечения ожидания.
+    base_delay, max_delay : float, optional
+        Начальная и максимальная пауза между повторами, с.
+
+    Возвращает действующий режим журнала базы.
+    """
+    global JOURNAL_MODE, BUSY_TIMEOUT, RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+    if busy_timeout is not None:
+        BUSY_TIMEOUT = busy_timeout
+    if retries is not None:
+        RETRY_ATTEMPTS = retries
+    if base_delay is not None:
+        RETRY_BASE_DELAY = base_delay
+    if max_delay is not None:
+        RETRY_MAX_DELAY = max_delay
+    if journal_mode is not None:
+        JOURNAL_MODE = journal_mode.lower()
+    conn = connect()
+    try:
+        if journal_mode is not None:
+            return conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}').fetchone()[0]
+        return conn.execute('PRAGMA journal_mode').fetchone()[0]
+    finally:
+        conn.close()
+
+@retry_on_busy
 def init_db():
     """Инициализировать базу данных и создать таблицы, если они не существуют."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS clients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL,
-        phone TEXT NOT NULL,
-        address TEXT
+    context = _current()
+    conn = context.connect(isolation_level='IMMEDIATE')
+    try:
+        cursor = conn.cursor()
+        # Режим журнала хранится в файле базы, переключение нужно один раз
+        cursor.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+        # Миграция на инкрементальную очистку: новой базе достаточно PRAGMA до создания таблиц,
+        # существующую нужно один раз перестроить VACUUM (см. maintenance.py)
+        if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            if cursor.execute('PRAGMA page_count').fetchone()[0] > 0:
+                cursor.execute('VACUUM')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            address TEXT
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            category TEXT,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            reorder_threshold INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            FOREIGN KEY (client_id) REFERENCES clients(id)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_products (
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders(id),
+            FOREIGN KEY (product_id) REFERENCES products(id),
+            PRIMARY KEY (order_id, product_id)
+        )
+        ''')
+        # Проверить и добавить столбец quantity в order_products, если отсутствует
+        cursor.execute("PRAGMA table_info(order_products)")
+        columns = [col[1] for col in cursor.fetchall()]
+        if 'quantity' not in columns:
+            cursor.execute('ALTER TABLE order_products ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1')
+        # Порог дозаказа товара и частичный индекс товаров на пороге или ниже (см. get_low_stock_products):
+        # в индекс попадают только такие товары, поэтому он остается маленьким
+        cursor.execute("PRAGMA table_info(products)")
+        if 'reorder_threshold' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE products ADD COLUMN reorder_threshold INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products(quantity) '
+                       'WHERE quantity <= reorder_threshold')
+        # Сводные таблицы для отчетов: при первом создании заполнить по существующим данным
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales_daily'")
+        summaries_exist = cursor.fetchone() is not None
+        for statement in SUMMARY_SCHEMA + SUMMARY_TRIGGERS:
+            cursor.execute(statement)
+        if not summaries_exist:
+            _rebuild_summaries(cursor)
+        # Состояние архива заказов (см. archive.py)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        ''')
+        # Версии данных для кэшей производных результатов (см. get_data_version)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            entity TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        cursor.executemany('INSERT OR IGNORE INTO data_versions (entity) VALUES (?)', [(e,) for e in ENTITIES])
+        for statement in VERSION_TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_client_date ON orders(client_id, date)')
+        # Модель чтения для списков заказов (см. get_order_summaries)
+        cursor.execute('CREATE VIEW IF NOT EXISTS order_summaries AS ' +
+                       ORDER_SUMMARY_QUERY.format(orders='orders', lines='order_products'))
+        # Состояние обслуживания базы (см. maintenance.py)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        ''')
+        # Журнал изменений и водяные знаки потребителей дельта-экспорта (см. changes.py)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_changelog_entity_seq ON changelog(entity, seq)')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_watermarks (
+            consumer TEXT NOT NULL,
+            entity TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            exported_at TEXT NOT NULL,
+            PRIMARY KEY (consumer, entity)
+        )
+        ''')
+        for statement in CHANGELOG_TRIGGERS:
+            cursor.execute(statement)
+        # Рекомендации «часто покупают вместе» (заполняются recommendations.build_recommendations)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_recommendations (
+            product_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            related_id INTEGER NOT NULL,
+            together INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (product_id, rank)
+        )
+        ''')
+        # Уникальные естественные ключи для импорта с обновлением (upsert)
+        for index, (table, key) in NATURAL_KEYS.items():
+            sql = f'CREATE UNIQUE INDEX {index} ON {table} ({", ".join(_key_terms(key))})'
+            existing = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                      (index,)).fetchone()
+            if existing is not None and existing[0] == sql:
+                continue
+            cursor.execute(f'DROP INDEX IF EXISTS {index}')  # Индекс прежней версии (без COALESCE)
+            try:
+                cursor.execute(sql)
+            except sqlite3.IntegrityError:
+                log.warning("В таблице %s есть дубликаты по ключу (%s): импорт с обновлением недоступен, "
+                            "пока они не удалены", table, ', '.join(key))
+        conn.commit()
+    finally:
+        conn.close()
+    context.initialized = True  # Только после фиксации схемы: при ошибке init_db повторится при следующем обращении
+
+# Естественные ключи: индекс -> (таблица, столбцы ключа)
+NATURAL_KEYS = {
+    'idx_clients_email': ('clients', ('email',)),
+    'idx_products_name_category': ('products', ('name', 'category')),
+}
+# Столбцы ключей, допускающие NULL: в уникальном индексе NULL не совпадает с NULL,
+# поэтому такие столбцы сравниваются как COALESCE(столбец, '')
+NULLABLE_KEY_COLUMNS = {'category'}
+
+def _key_terms(key: tuple, alias: str = '') -> List[str]:
+    """Выражения столбцов естественного ключа для индекса и сравнения строк."""
+    prefix = f'{alias}.' if alias else ''
+    return [f"COALESCE({prefix}{c}, '')" if c in NULLABLE_KEY_COLUMNS else f'{prefix}{c}' for c in key]
+
+# Сводные таблицы: заказы, позиции и выручка по дням, по клиентам и по товарам.
+# Выручка считается по текущей цене товара, как в Order.calculate_total.
+# Выручка по товару не хранится, а вычисляется при чтении как quantity * price.
+SUMMARY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        date TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_by_client (
+        client_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
     )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        price REAL NOT NULL,
-        category TEXT,
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_by_product (
+        product_id INTEGER PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
         quantity INTEGER NOT NULL DEFAULT 0
     )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS orders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_id INTEGER NOT NULL,
-        date TEXT NOT NULL,
-        FOREIGN KEY (client_id) REFERENCES clients(id)
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_order_products_product ON order_products(product_id)',
+]
+
+# Строка списка заказов одним запросом: (id, client_id, client_name, date, total, items, products).
+# items — позиции для CSV ("product_id:quantity;..."), products — для таблицы ("Название x 2, ...").
+# Позиции без товара пропускаются, как в Order.calculate_total; порядок позиций — по ID товара
+# (обход индекса первичного ключа order_products). date в GROUP BY позволяет SQLite
+# применить фильтр по дате, наложенный на представление, до агрегирования.
+ORDER_SUMMARY_QUERY = '''
+    SELECT o.id, o.client_id, c.name AS client_name, o.date,
+           COALESCE(SUM(op.quantity * p.price), 0) AS total,
+           COALESCE(group_concat(op.product_id || ':' || op.quantity, ';'), '') AS items,
+           COALESCE(group_concat(p.name || ' x ' || op.quantity, ', '), '') AS products
+    FROM {orders} o
+    LEFT JOIN clients c ON c.id = o.client_id
+    LEFT JOIN ({lines} op JOIN products p ON p.id = op.product_id) ON op.order_id = o.id
+    GROUP BY o.id, o.date'''
+
+# Подзапросы по позициям заказа: количество и сумма
+_ORDER_ITEMS = '(SELECT COALESCE(SUM(quantity), 0) FROM order_products WHERE order_id = {o}.id)'
+_ORDER_REVENUE = ('(SELECT COALESCE(SUM(op.quantity * p.price), 0) FROM order_products op '
+                  'JOIN products p ON p.id = op.product_id WHERE op.order_id = {o}.id)')
+_LINE_PRICE = 'COALESCE((SELECT price FROM products WHERE id = {l}.product_id), 0)'
+
+def _summary_add(o: str) -> str:
+    """SQL добавления заказа (NEW/OLD) в сводки по дням и клиентам."""
+    items, revenue = _ORDER_ITEMS.format(o=o), _ORDER_REVENUE.format(o=o)
+    return f'''
+        INSERT INTO sales_daily (date, orders, items, revenue) VALUES ({o}.date, 1, {items}, {revenue})
+        ON CONFLICT(date) DO UPDATE SET orders = orders + 1, items = items + excluded.items,
+            revenue = revenue + excluded.revenue;
+        INSERT INTO sales_by_client (client_id, orders, items, revenue) VALUES ({o}.client_id, 1, {items}, {revenue})
+        ON CONFLICT(client_id) DO UPDATE SET orders = orders + 1, items = items + excluded.items,
+            revenue = revenue + excluded.revenue;'''
+
+def _summary_remove(o: str) -> str:
+    """SQL вычитания заказа (NEW/OLD) из сводок по дням и клиентам."""
+    items, revenue = _ORDER_ITEMS.format(o=o), _ORDER_REVENUE.format(o=o)
+    return f'''
+        UPDATE sales_daily SET orders = orders - 1, items = items - {items}, revenue = revenue - {revenue}
+        WHERE date = {o}.date;
+        DELETE FROM sales_daily WHERE date = {o}.date AND orders <= 0;
+        UPDATE sales_by_client SET orders = orders - 1, items = items - {items}, revenue = revenue - {revenue}
+        WHERE client_id = {o}.client_id;
+        DELETE FROM sales_by_client WHERE client_id = {o}.client_id AND orders <= 0;'''
+
+def _line_delta(l: str, sign: str) -> str:
+    """SQL изменения сводок по дням и клиентам на одну позицию заказа (NEW/OLD)."""
+    price = _LINE_PRICE.format(l=l)
+    return f'''
+        UPDATE sales_daily SET items = items {sign} {l}.quantity, revenue = revenue {sign} {l}.quantity * {price}
+        WHERE date = (SELECT date FROM orders WHERE id = {l}.order_id);
+        UPDATE sales_by_client SET items = items {sign} {l}.quantity, revenue = revenue {sign} {l}.quantity * {price}
+        WHERE client_id = (SELECT client_id FROM orders WHERE id = {l}.order_id);'''
+
+def _price_delta(p: str, delta: str) -> str:
+    """SQL изменения выручки в сводках при смене цены товара (NEW/OLD) на delta за единицу."""
+    return f'''
+        UPDATE sales_daily SET revenue = revenue + ({delta}) * (
+            SELECT SUM(op.quantity) FROM order_products op JOIN orders o ON o.id = op.order_id
+            WHERE op.product_id = {p}.id AND o.date = sales_daily.date)
+        WHERE date IN (SELECT o.date FROM order_products op JOIN orders o ON o.id = op.order_id
+                       WHERE op.product_id = {p}.id);
+        UPDATE sales_by_client SET revenue = revenue + ({delta}) * (
+            SELECT SUM(op.quantity) FROM order_products op JOIN orders o ON o.id = op.order_id
+            WHERE op.product_id = {p}.id AND o.client_id = sales_by_client.client_id)
+        WHERE client_id IN (SELECT o.client_id FROM order_products op JOIN orders o ON o.id = op.order_id
+                            WHERE op.product_id = {p}.id);'''
+
+# Триггеры поддерживают сводки при любых изменениях: add_order, delete_order, импорт, HTTP-сервис.
+# Смена id при переиндексации (reindex_*) не меняет агрегатов, поэтому сводка по товару
+# просто переносится на новый product_id. После нестандартных правок данных
+# сводки можно пересчитать через rebuild_summaries().
+SUMMARY_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_order_insert AFTER INSERT ON orders
+    BEGIN {_summary_add('NEW')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_order_delete AFTER DELETE ON orders
+    BEGIN {_summary_remove('OLD')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_order_update AFTER UPDATE OF client_id, date ON orders
+    WHEN OLD.client_id IS NOT NEW.client_id OR OLD.date IS NOT NEW.date
+    BEGIN {_summary_remove('OLD')} {_summary_add('NEW')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_line_insert AFTER INSERT ON order_products
+    BEGIN {_line_delta('NEW', '+')}
+        INSERT INTO sales_by_product (product_id, orders, quantity) VALUES (NEW.product_id, 1, NEW.quantity)
+        ON CONFLICT(product_id) DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_line_delete AFTER DELETE ON order_products
+    BEGIN {_line_delta('OLD', '-')}
+        UPDATE sales_by_product SET orders = orders - 1, quantity = quantity - OLD.quantity
+        WHERE product_id = OLD.product_id;
+        DELETE FROM sales_by_product WHERE product_id = OLD.product_id AND orders <= 0;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_line_quantity AFTER UPDATE OF quantity ON order_products
+    WHEN OLD.quantity IS NOT NEW.quantity
+    BEGIN {_line_delta('OLD', '-')} {_line_delta('NEW', '+')}
+        UPDATE sales_by_product SET quantity = quantity - OLD.quantity + NEW.quantity
+        WHERE product_id = NEW.product_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS summary_line_product AFTER UPDATE OF product_id ON order_products
+    WHEN OLD.product_id IS NOT NEW.product_id
+    BEGIN
+        UPDATE sales_by_product SET orders = orders - 1, quantity = quantity - OLD.quantity
+        WHERE product_id = OLD.product_id;
+        DELETE FROM sales_by_product WHERE product_id = OLD.product_id AND orders <= 0;
+        INSERT INTO sales_by_product (product_id, orders, quantity) VALUES (NEW.product_id, 1, NEW.quantity)
+        ON CONFLICT(product_id) DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_product_price AFTER UPDATE OF price ON products
+    WHEN OLD.price IS NOT NEW.price
+    BEGIN {_price_delta('NEW', 'NEW.price - OLD.price')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS summary_product_delete AFTER DELETE ON products
+    BEGIN {_price_delta('OLD', '-OLD.price')}
+    END
+    ''',
+]
+
+# Таблица -> сущность, версия которой растет при любом изменении строк таблицы
+VERSIONED_TABLES = {'clients': 'clients', 'products': 'products', 'orders': 'orders', 'order_products': 'orders'}
+
+VERSION_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS version_{table}_{operation.lower()} AFTER {operation} ON {table}
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE entity = '{entity}';
+    END
+    '''
+    for table, entity in VERSIONED_TABLES.items() for operation in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+def _log_change(entity: str, row: str, operation: str, condition: str = '1') -> str:
+    """Запись в журнал изменений; строки с неположительным ID (временные при переиндексации) не пишутся."""
+    return (f"INSERT INTO changelog (entity, row_id, operation) "
+            f"SELECT '{entity}', {row}, '{operation}' WHERE {row} > 0 AND {condition};")
+
+# Журнал изменений строк для дельта-экспорта (см. changes.py). Смена ID при переиндексации
+# записывается как удаление старого ID и вставка нового; изменение позиций заказа — как изменение заказа.
+CHANGELOG_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS changelog_{table}_{operation.lower()} AFTER {operation} ON {table}
+    BEGIN
+        {body}
+    END
+    '''
+    for table in ('clients', 'products', 'orders')
+    for operation, body in (
+        ('INSERT', _log_change(table, 'NEW.id', 'insert')),
+        ('UPDATE', _log_change(table, 'NEW.id', 'update', 'NEW.id = OLD.id')
+                   + _log_change(table, 'OLD.id', 'delete', 'NEW.id != OLD.id')
+                   + _log_change(table, 'NEW.id', 'insert', 'NEW.id != OLD.id')),
+        ('DELETE', _log_change(table, 'OLD.id', 'delete')),
     )
-    ''')
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS order_products (
-        order_id INTEGER NOT NULL,
-        product_id INTEGER NOT NULL,
-        quantity INTEGER NOT NULL,
-        FOREIGN KEY (order_id) REFERENCES orders(id),
-        FOREIGN KEY (product_id) REFERENCES products(id),
-        PRIMARY KEY (order_id, product_id)
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS changelog_order_products_{operation.lower()} AFTER {operation} ON order_products
+    BEGIN
+        {body}
+    END
+    '''
+    for operation, body in (
+        ('INSERT', _log_change('orders', 'NEW.order_id', 'update')),
+        ('UPDATE', _log_change('orders', 'NEW.order_id', 'update')
+                   + _log_change('orders', 'OLD.order_id', 'update', 'NEW.order_id != OLD.order_id')),
+        ('DELETE', _log_change('orders', 'OLD.order_id', 'update')),
     )
-    ''')
-    # Проверить и добавить столбец quantity в order_products, если отсутствует
-    cursor.execute("PRAGMA table_info(order_products)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if 'quantity' not in columns:
-        cursor.execute('ALTER TABLE order_products ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1')
+]
+
+# Пересчет сводок с нуля по исходным таблицам
+SUMMARY_SOURCES = {
+    'sales_daily': ('date', '''
+        SELECT o.date, COUNT(*), COALESCE(SUM(l.items), 0), COALESCE(SUM(l.revenue), 0)
+        FROM orders o LEFT JOIN (
+            SELECT op.order_id, SUM(op.quantity) AS items, SUM(op.quantity * COALESCE(p.price, 0)) AS revenue
+            FROM order_products op LEFT JOIN products p ON p.id = op.product_id GROUP BY op.order_id
+        ) l ON l.order_id = o.id
+        GROUP BY o.date'''),
+    'sales_by_client': ('client_id', '''
+        SELECT o.client_id, COUNT(*), COALESCE(SUM(l.items), 0), COALESCE(SUM(l.revenue), 0)
+        FROM orders o LEFT JOIN (
+            SELECT op.order_id, SUM(op.quantity) AS items, SUM(op.quantity * COALESCE(p.price, 0)) AS revenue
+            FROM order_products op LEFT JOIN products p ON p.id = op.product_id GROUP BY op.order_id
+        ) l ON l.order_id = o.id
+        GROUP BY o.client_id'''),
+    'sales_by_product': ('product_id', '''
+        SELECT product_id, COUNT(*), SUM(quantity) FROM order_products GROUP BY product_id'''),
+}
+
+def _rebuild_summaries(cursor):
+    """Пересчитать сводные таблицы в рамках текущей транзакции."""
+    for table, (_, query) in SUMMARY_SOURCES.items():
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'INSERT INTO {table} {query}')
+
+def _drop_summary_triggers(cursor):
+    """Снять триггеры сводок и версий перед массовой загрузкой (вернуть через _restore_summaries)."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                   "AND (name LIKE 'summary!_%' ESCAPE '!' OR name LIKE 'version!_%' ESCAPE '!')")
+    for (name,) in cursor.fetchall():
+        cursor.execute(f'DROP TRIGGER {name}')
+
+def _restore_summaries(cursor):
+    """Вернуть триггеры, пересчитать сводки и сменить версии всех данных после массовой загрузки."""
+    for statement in SUMMARY_TRIGGERS + VERSION_TRIGGERS:
+        cursor.execute(statement)
+    _rebuild_summaries(cursor)
+    cursor.execute('UPDATE main.data_versions SET version = version + 1')
+
+def get_data_version(*entities: str) -> tuple:
+    """
+    Получить версии данных сущностей ('clients', 'products', 'orders').
+
+    Версия растет при каждом изменении строк, в том числе из других процессов,
+    поэтому кортеж версий подходит как ключ кэша производных результатов.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT entity, version FROM data_versions')
+    versions = dict(cursor.fetchall())
+    conn.close()
+    return tuple(versions[entity] for entity in entities)
+
+def verify_summaries() -> dict:
+    """
+    Сверить сводные таблицы с исходными данными.
+
+    Возвращает словарь {таблица: число расходящихся строк}; пустой словарь означает согласованность.
+    Выручка сравнивается с точностью до копеек.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    mismatches = {}
+    for table, (key, query) in SUMMARY_SOURCES.items():
+        cursor.execute(f'SELECT * FROM {table}')
+        stored = {row[0]: tuple(round(v, 2) for v in row[1:]) for row in cursor.fetchall()}
+        cursor.execute(query)
+        fresh = {row[0]: tuple(round(v, 2) for v in row[1:]) for row in cursor.fetchall()}
+        count = sum(1 for k in stored.keys() | fresh.keys() if stored.get(k) != fresh.get(k))
+        if count:
+            mismatches[table] = count
+    conn.close()
+    return mismatches
+
+@retry_on_busy
+def rebuild_summaries() -> dict:
+    """
+    Пересчитать сводные таблицы с нуля и проверить результат.
+
+    Возвращает расхождения, найденные до пересчета (см. verify_summaries).
+    """
+    drift = verify_summaries()
+    conn = connect(write=True)
+    cursor = conn.cursor()
+    _rebuild_summaries(cursor)
     conn.commit()
     conn.close()
+    remaining = verify_summaries()
+    if remaining:
+        raise RuntimeError(f"Сводные таблицы не согласованы после пересчета: {remaining}")
+    return drift
 
-def add_client(client: Client):
-    """Добавить клиента в базу данных."""
-    conn = sqlite3.connect(DB_NAME)
+def _archive_state(cursor) -> Optional[dict]:
+    """Состояние архива: path, archived_before, max_order_id; None, если архива нет."""
+    cursor.execute('SELECT key, value FROM main.archive_meta')
+    state = dict(cursor.fetchall())
+    return state if 'path' in state else None
+
+def _attach_archive(cursor, include_archive: bool = False, date_from: Optional[datetime.date] = None) -> bool:
+    """
+    Подключить архив как схему archive, если он нужен запросу.
+
+    Архив нужен, если он запрошен явно или диапазон дат начинается раньше границы архивации.
+    Возвращает True, если архив подключен.
+    """
+    state = _archive_state(cursor)
+    if state is None or not os.path.exists(state['path']):
+        return False
+    if not include_archive and (date_from is None or date_from.isoformat() >= state['archived_before']):
+        return False
+    cursor.execute('ATTACH DATABASE ? AS archive', (_current().attach_target(state['path']),))
+    return True
+
+def _union_source(table: str, columns: str, archived: bool) -> str:
+    """Источник строк таблицы: только рабочая база или объединение с архивом."""
+    if not archived:
+        return f'main.{table}'
+    return f'(SELECT {columns} FROM main.{table} UNION ALL SELECT {columns} FROM archive.{table})'
+
+def _summary_source(table: str, key: str, measures: tuple, archived: bool) -> str:
+    """Источник сводки: рабочая сводка или сумма рабочей и архивной сводок по ключу."""
+    if not archived:
+        return f'main.{table}'
+    columns = ', '.join((key,) + measures)
+    sums = ', '.join(f'SUM({m}) AS {m}' for m in measures)
+    return f'(SELECT {key}, {sums} FROM {_union_source(table, columns, True)} GROUP BY {key})'
+
+def get_daily_sales(include_archive: bool = False) -> List[tuple]:
+    """Получить сводку по дням: (date, orders, items, revenue), по возрастанию даты."""
+    conn = connect()
     cursor = conn.cursor()
+    source = _summary_source('sales_daily', 'date', ('orders', 'items', 'revenue'),
+                             _attach_archive(cursor, include_archive))
+    cursor.execute(f'SELECT date, orders, items, revenue FROM {source} ORDER BY date')
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def get_client_totals(limit: Optional[int] = None, include_archive: bool = False) -> List[tuple]:
+    """Получить сводку по клиентам: (client_id, name, orders, items, revenue), по убыванию числа заказов."""
+    conn = connect()
+    cursor = conn.cursor()
+    source = _summary_source('sales_by_client', 'client_id', ('orders', 'items', 'revenue'),
+                             _attach_archive(cursor, include_archive))
+    cursor.execute(f'''
+        SELECT s.client_id, c.name, s.orders, s.items, s.revenue
+        FROM {source} s JOIN clients c ON c.id = s.client_id
+        ORDER BY s.orders DESC, s.client_id
+        LIMIT ?''', (limit if limit is not None else -1,))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def get_product_totals(include_archive: bool = False) -> List[tuple]:
+    """Получить сводку по товарам: (product_id, name, orders, quantity, revenue), по убыванию выручки."""
+    conn = connect()
+    cursor = conn.cursor()
+    source = _summary_source('sales_by_product', 'product_id', ('orders', 'quantity'),
+                             _attach_archive(cursor, include_archive))
+    cursor.execute(f'''
+        SELECT s.product_id, p.name, s.orders, s.quantity, s.quantity * p.price AS revenue
+        FROM {source} s JOIN products p ON p.id = s.product_id
+        ORDER BY revenue DESC, s.product_id''')
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def get_order_summaries(include_archive: bool = False, date_from: Optional[datetime.date] = None,
+                        date_to: Optional[datetime.date] = None) -> List[tuple]:
+    """
+    Получить строки списка заказов без сборки объектов Order (представление order_summaries).
+
+    Возвращает кортежи (id, client_id, client_name, date, total, items, products) по возрастанию ID;
+    client_name равен None, если клиента нет. Архив и фильтр по датам — как в get_all_orders.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    archived = _attach_archive(cursor, include_archive, date_from)
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append('date >= ?')
+        params.append(date_from.isoformat())
+    if date_to is not None:
+        conditions.append('date <= ?')
+        params.append(date_to.isoformat())
+    where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    if archived:
+        source = '(' + ORDER_SUMMARY_QUERY.format(
+            orders=_union_source('orders', 'id, client_id, date', True),
+            lines=_union_source('order_products', 'order_id, product_id, quantity', True)) + ')'
+    else:
+        source = 'main.order_summaries'
+    cursor.execute(f'SELECT id, client_id, client_name, date, total, items, products FROM {source} {where} '
+                   'ORDER BY id', params)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+_write_queue = None  # Очередь группового коммита, если включена (см. enable_write_queue)
+
+def enable_write_queue(max_batch: int = 256, max_delay: float = 0.005, durability: str = 'full'):
+    """
+    Включить режим очереди записи для add_client, add_product, update_product и add_order.
+
+    В этом режиме функции не пишут сами, а ставят изменение в очередь; возвращаемый Future
+    выполняется после коммита пакета (без очереди он возвращается уже выполненным).
+    Один поток применяет очередь пакетами в общих транзакциях (см. writequeue.WriteQueue).
+    Очередь следует за текущей базой: use_database() дописывает ее и открывает новую
+    с теми же параметрами. Возвращает очередь.
+    """
+    global _write_queue
+    from writequeue import WriteQueue
+    if _write_queue is None:
+        _write_queue = WriteQueue(database().target, max_batch, max_delay, durability)
+    return _write_queue
+
+def disable_write_queue():
+    """Дописать очередь и вернуться к записи с коммитом на каждый вызов."""
+    global _write_queue
+    if _write_queue is not None:
+        _write_queue.close()
+        _write_queue = None
+
+_PRODUCT_COLUMNS = 'id, name, price, category, quantity, reorder_threshold'
+
+def _row_to_product(row) -> Product:
+    """Собрать товар из строки с _PRODUCT_COLUMNS."""
+    product = Product(name=row[1], price=row[2], category=row[3], quantity=row[4], reorder_threshold=row[5])
+    product.id = row[0]
+    return product
+
+def _completed(value) -> Future:
+    """Выполненный Future: запись без очереди возвращает результат в том же виде, что и через очередь."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+def _insert_client(cursor, client: Client) -> int:
     cursor.execute('INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)',
                    (client.name, client.email, client.phone, client.address))
     client.id = cursor.lastrowid
+    return client.id
+
+def _insert_product(cursor, product: Product) -> int:
+    cursor.execute('INSERT INTO products (name, price, category, quantity, reorder_threshold) VALUES (?, ?, ?, ?, ?)',
+                   (product.name, product.price, product.category, product.quantity, product.reorder_threshold))
+    product.id = cursor.lastrowid
+    return product.id
+
+def _update_product(cursor, product: Product) -> int:
+    cursor.execute('UPDATE products SET name=?, price=?, category=?, quantity=?, reorder_threshold=? WHERE id=?',
+                   (product.name, product.price, product.category, product.quantity, product.reorder_threshold,
+                    product.id))
+    return product.id
+
+def _insert_order(cursor, order: Order) -> int:
+    # В очереди записи ID клиента и товаров появляются при применении их вставок, которые стоят раньше;
+    # None значит, что вставка не удалась или еще не поставлена
+    if order.client.id is None or any(item.product.id is None for item in order.items):
+        raise ValueError("Клиент или товар заказа не сохранен в базе: дождитесь результата его добавления")
+    cursor.execute('INSERT INTO orders (client_id, date) VALUES (?, ?)',
+                   (order.client.id, order.date.isoformat()))
+    order.id = cursor.lastrowid
+    cursor.executemany('INSERT INTO order_products (order_id, product_id, quantity) VALUES (?, ?, ?)',
+                       [(order.id, item.product.id, item.quantity) for item in order.items])
+    return order.id
+
+@retry_on_busy
+def add_client(client: Client) -> Future:
+    """Добавить клиента в базу данных. Возвращает Future с ID (см. enable_write_queue)."""
+    if _write_queue is not None:
+        return _write_queue.submit(_insert_client, client, 'clients', 'insert')
+    conn = connect(write=True)
+    cursor = conn.cursor()
+    _insert_client(cursor, client)
     conn.commit()
     conn.close()
+    publish('clients', 'insert', [client.id])
+    return _completed(client.id)
 
+@retry_on_busy
 def update_client(client: Client):
     """Обновить клиента в базу данных."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
     cursor.execute('UPDATE clients SET name=?, email=?, phone=?, address=? WHERE id=?',
                    (client.name, client.email, client.phone, client.address, client.id))
     conn.commit()
     conn.close()
+    publish('clients', 'update', [client.id])
 
+@retry_on_busy
 def delete_client(client_id: int):
     """Удалить клиента из базы данных."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
     cursor.execute('DELETE FROM clients WHERE id=?', (client_id,))
     conn.commit()
     conn.close()
+    publish('clients', 'delete', [client_id])
+
+def _flip_negative_ids(cursor, table: str, column: str, measures: tuple = ()):
+    """
+    Вернуть ссылкам положительные ID после переиндексации.
 
+    Для сводок с ключом column строки, попавшие на уже занятый ключ (например, оставшийся
+    от удаленной записи), суммируются по столбцам measures, как это делают триггеры сводок.
+    """
+    if not measures:
+        cursor.execute(f'UPDATE {table} SET {column} = -{column} WHERE {column} < 0')
+        return
+    columns = ', '.join(measures)
+    sums = ', '.join(f'{m} = {m} + excluded.{m}' for m in measures)
+    cursor.execute(f'INSERT INTO {table} ({column}, {columns}) SELECT -{column}, {columns} FROM {table} '
+                   f'WHERE {column} < 0 ON CONFLICT ({column}) DO UPDATE SET {sums}')
+    cursor.execute(f'DELETE FROM {table} WHERE {column} < 0')
+
+@retry_on_busy
 def reindex_clients():
     """Переиндексировать ID клиентов после удаления."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
+    archived = _attach_archive(cursor, include_archive=True)
+    # Ссылки на клиентов в архиве перенумеровываются вместе с рабочей базой
+    references = [('main.orders', 'client_id', ())]
+    if archived:
+        references += [('archive.orders', 'client_id', ()),
+                       ('archive.sales_by_client', 'client_id', ('orders', 'items', 'revenue'))]
+    cursor.execute('BEGIN IMMEDIATE')  # Список ID читается уже под блокировкой записи
     cursor.execute('SELECT id FROM clients ORDER BY id')
     ids = [row[0] for row in cursor.fetchall()]
     for new_id, old_id in enumerate(ids, 1):
         if new_id == old_id:
             continue
         # Временно обновить на отрицательные значения
-        cursor.execute('UPDATE orders SET client_id = ? WHERE client_id = ?', (-new_id, old_id))
+        for table, column, _ in references:
+            cursor.execute(f'UPDATE {table} SET {column} = ? WHERE {column} = ?', (-new_id, old_id))
         cursor.execute('UPDATE clients SET id = ? WHERE id = ?', (-new_id, old_id))
     # Сделать положительными
-    cursor.execute('UPDATE orders SET client_id = -client_id WHERE client_id < 0')
+    for table, column, measures in references:
+        _flip_negative_ids(cursor, table, column, measures)
     cursor.execute('UPDATE clients SET id = -id WHERE id < 0')
     # Обновить последовательность AUTOINCREMENT
     if ids:
@@ -112,48 +975,73 @@ def reindex_clients():
             pass  # Если таблица sqlite_sequence не существует, игнорируем
     conn.commit()
     conn.close()
+    publish('clients', 'reindex')
 
-def add_product(product: Product):
-    """Добавить товар в базу данных."""
-    conn = sqlite3.connect(DB_NAME)
+@retry_on_busy
+def add_product(product: Product) -> Future:
+    """Добавить товар в базу данных. Возвращает Future с ID (см. enable_write_queue)."""
+    if _write_queue is not None:
+        return _write_queue.submit(_insert_product, product, 'products', 'insert')
+    conn = connect(write=True)
     cursor = conn.cursor()
-    cursor.execute('INSERT INTO products (name, price, category, quantity) VALUES (?, ?, ?, ?)',
-                   (product.name, product.price, product.category, product.quantity))
-    product.id = cursor.lastrowid
+    _insert_product(cursor, product)
     conn.commit()
     conn.close()
+    publish('products', 'insert', [product.id])
+    return _completed(product.id)
 
-def update_product(product: Product):
-    """Обновить товар в базу данных."""
-    conn = sqlite3.connect(DB_NAME)
+@retry_on_busy
+def update_product(product: Product) -> Future:
+    """Обновить товар в базе данных. Возвращает Future с ID (см. enable_write_queue)."""
+    if _write_queue is not None:
+        return _write_queue.submit(_update_product, product, 'products', 'update')
+    conn = connect(write=True)
     cursor = conn.cursor()
-    cursor.execute('UPDATE products SET name=?, price=?, category=?, quantity=? WHERE id=?',
-                   (product.name, product.price, product.category, product.quantity, product.id))
+    _update_product(cursor, product)
     conn.commit()
     conn.close()
+    publish('products', 'update', [product.id])
+    return _completed(product.id)
 
+@retry_on_busy
 def delete_product(product_id: int):
     """Удалить товар из базы данных."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
     cursor.execute('DELETE FROM products WHERE id=?', (product_id,))
     conn.commit()
     conn.close()
+    publish('products', 'delete', [product_id])
 
+@retry_on_busy
 def reindex_products():
     """Переиндексировать ID товаров после удаления."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
+    archived = _attach_archive(cursor, include_archive=True)
+    cursor.execute('BEGIN IMMEDIATE')  # Список ID читается уже под блокировкой записи
+    # Ссылки на товары в архиве перенумеровываются вместе с рабочей базой
+    references = [('main.order_products', 'product_id', ()),
+                  ('main.product_recommendations', 'product_id', ()),
+                  ('main.product_recommendations', 'related_id', ())]
+    # Рекомендации удаленных товаров не переносятся, иначе их ID столкнулись бы с новыми
+    cursor.execute('''DELETE FROM product_recommendations WHERE product_id NOT IN (SELECT id FROM products)
+                      OR related_id NOT IN (SELECT id FROM products)''')
+    if archived:
+        references += [('archive.order_products', 'product_id', ()),
+                       ('archive.sales_by_product', 'product_id', ('orders', 'quantity'))]
     cursor.execute('SELECT id FROM products ORDER BY id')
     ids = [row[0] for row in cursor.fetchall()]
     for new_id, old_id in enumerate(ids, 1):
         if new_id == old_id:
             continue
         # Временно обновить на отрицательные значения
-        cursor.execute('UPDATE order_products SET product_id = ? WHERE product_id = ?', (-new_id, old_id))
+        for table, column, _ in references:
+            cursor.execute(f'UPDATE {table} SET {column} = ? WHERE {column} = ?', (-new_id, old_id))
         cursor.execute('UPDATE products SET id = ? WHERE id = ?', (-new_id, old_id))
     # Сделать положительными
-    cursor.execute('UPDATE order_products SET product_id = -product_id WHERE product_id < 0')
+    for table, column, measures in references:
+        _flip_negative_ids(cursor, table, column, measures)
     cursor.execute('UPDATE products SET id = -id WHERE id < 0')
     # Обновить последовательность AUTOINCREMENT
     if ids:
@@ -163,36 +1051,44 @@ def reindex_products():
             pass  # Если таблица sqlite_sequence не существует, игнорируем
     conn.commit()
     conn.close()
+    publish('products', 'reindex')
 
-def add_order(order: Order):
-    """Добавить заказ в базу данных."""
-    conn = sqlite3.connect(DB_NAME)
+@retry_on_busy
+def add_order(order: Order) -> Future:
+    """Добавить заказ в базу данных. Возвращает Future с ID (см. enable_write_queue)."""
+    if _write_queue is not None:
+        return _write_queue.submit(_insert_order, order, 'orders', 'insert')
+    conn = connect(write=True)
     cursor = conn.cursor()
-    cursor.execute('INSERT INTO orders (client_id, date) VALUES (?, ?)',
-                   (order.client.id, order.date.isoformat()))
-    order.id = cursor.lastrowid
-    for item in order.items:
-        cursor.execute('INSERT INTO order_products (order_id, product_id, quantity) VALUES (?, ?, ?)',
-                       (order.id, item.product.id, item.quantity))
+    _insert_order(cursor, order)
     conn.commit()
     conn.close()
+    publish('orders', 'insert', [order.id])
+    return _completed(order.id)
 
+@retry_on_busy
 def delete_order(order_id: int):
     """Удалить заказ из базы данных."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
     cursor.execute('DELETE FROM order_products WHERE order_id=?', (order_id,))
     cursor.execute('DELETE FROM orders WHERE id=?', (order_id,))
     conn.commit()
     conn.close()
+    publish('orders', 'delete', [order_id])
 
+@retry_on_busy
 def reindex_orders():
     """Переиндексировать ID заказов после удаления."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect(write=True)
     cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')  # Список ID читается уже под блокировкой записи
+    # Номера рабочих заказов начинаются после последнего архивного, чтобы не пересекаться с архивом
+    state = _archive_state(cursor)
+    offset = int(state['max_order_id']) if state else 0
     cursor.execute('SELECT id FROM orders ORDER BY id')
     ids = [row[0] for row in cursor.fetchall()]
-    for new_id, old_id in enumerate(ids, 1):
+    for new_id, old_id in enumerate(ids, offset + 1):
         if new_id == old_id:
             continue
         # Временно обновить на отрицательные значения
@@ -204,15 +1100,16 @@ def reindex_orders():
     # Обновить последовательность AUTOINCREMENT
     if ids:
         try:
-            cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'orders'", (len(ids),))
+            cursor.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'orders'", (offset + len(ids),))
         except sqlite3.OperationalError:
             pass
     conn.commit()
     conn.close()
+    publish('orders', 'reindex')
 
 def get_all_clients() -> List[Client]:
     """Получить всех клиентов из базы данных."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM clients')
     rows = cursor.fetchall()
@@ -226,28 +1123,66 @@ def get_all_clients() -> List[Client]:
 
 def get_all_products() -> List[Product]:
     """Получить все товары из базы данных."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products')
-    rows = cursor.fetchall()
-    products = []
-    for row in rows:
-        product = Product(name=row[1], price=row[2], category=row[3], quantity=row[4])
-        product.id = row[0]
-        products.append(product)
+    cursor.execute(f'SELECT {_PRODUCT_COLUMNS} FROM products')
+    products = [_row_to_product(row) for row in cursor.fetchall()]
     conn.close()
     return products
 
-def get_all_orders() -> List[Order]:
-    """Получить все заказы из базы данных."""
-    conn = sqlite3.connect(DB_NAME)
+def get_low_stock_products(product_ids: Optional[Iterable[int]] = None) -> List[Product]:
+    """
+    Получить товары с остатком на пороге дозаказа или ниже (quantity <= reorder_threshold).
+
+    Запрос читает только частичный индекс idx_products_low_stock, поэтому его стоимость
+    зависит от числа найденных товаров, а не от размера каталога. Товары отсортированы
+    по возрастанию остатка.
+
+    Параметры
+    ----------
+    product_ids : iterable of int, optional
+        Проверить только эти товары (поиск по первичному ключу), например после их изменения.
+    """
+    conn = connect()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM orders')
+    if product_ids is None:
+        cursor.execute(f'SELECT {_PRODUCT_COLUMNS} FROM products WHERE quantity <= reorder_threshold '
+                       'ORDER BY quantity, id')
+    else:
+        ids = list(product_ids)
+        cursor.execute(f'SELECT {_PRODUCT_COLUMNS} FROM products WHERE quantity <= reorder_threshold '
+                       f'AND id IN ({", ".join("?" * len(ids))}) ORDER BY quantity, id', ids)
+    products = [_row_to_product(row) for row in cursor.fetchall()]
+    conn.close()
+    return products
+
+def get_all_orders(include_archive: bool = False, date_from: Optional[datetime.date] = None,
+                   date_to: Optional[datetime.date] = None) -> List[Order]:
+    """
+    Получить заказы из базы данных.
+
+    Архив подключается, если include_archive=True или date_from раньше границы архивации.
+    date_from и date_to ограничивают диапазон дат включительно.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    archived = _attach_archive(cursor, include_archive, date_from)
+    orders_source = _union_source('orders', 'id, client_id, date', archived)
+    lines_source = _union_source('order_products', 'order_id, product_id, quantity', archived)
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append('date >= ?')
+        params.append(date_from.isoformat())
+    if date_to is not None:
+        conditions.append('date <= ?')
+        params.append(date_to.isoformat())
+    where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    cursor.execute(f'SELECT id, client_id, date FROM {orders_source} {where}', params)
     order_rows = cursor.fetchall()
     orders = []
     for order_row in order_rows:
         client = get_client_by_id(order_row[1])
-        cursor.execute('SELECT product_id, quantity FROM order_products WHERE order_id = ?', (order_row[0],))
+        cursor.execute(f'SELECT product_id, quantity FROM {lines_source} WHERE order_id = ?', (order_row[0],))
         items = []
         for pid, qty in cursor.fetchall():
             p = get_product_by_id(pid)
@@ -260,7 +1195,7 @@ def get_all_orders() -> List[Order]:
 
 def get_client_by_id(client_id: int) -> Optional[Client]:
     """Получить клиента по ID."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM clients WHERE id = ?', (client_id,))
     row = cursor.fetchone()
@@ -273,72 +1208,187 @@ def get_client_by_id(client_id: int) -> Optional[Client]:
 
 def get_product_by_id(product_id: int) -> Optional[Product]:
     """Получить товар по ID."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products WHERE id = ?', (product_id,))
+    cursor.execute(f'SELECT {_PRODUCT_COLUMNS} FROM products WHERE id = ?', (product_id,))
     row = cursor.fetchone()
     conn.close()
-    if row:
-        product = Product(name=row[1], price=row[2], category=row[3], quantity=row[4])
-        product.id = row[0]
-        return product
-    return None
+    return _row_to_product(row) if row else None
+
+def _has_natural_key(cursor, index: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,))
+    return cursor.fetchone() is not None
+
+def _count_duplicates(cursor, table: str, key: tuple) -> int:
+    """Число значений естественного ключа, которые встречаются в таблице больше одного раза."""
+    terms = ', '.join(_key_terms(key))
+    return cursor.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM {table} GROUP BY {terms} '
+                          f'HAVING COUNT(*) > 1)').fetchone()[0]
+
+@retry_on_busy
+def upsert_rows(index: str, columns: tuple, rows: List[tuple]) -> dict:
+    """
+    Массово вставить или обновить строки по естественному ключу.
+
+    Строки сначала загружаются во временную таблицу (при повторе ключа в файле побеждает
+    последняя строка), затем одним INSERT ... ON CONFLICT DO UPDATE переносятся в основную.
+    Строки без изменений не перезаписываются.
+
+    Параметры
+    ----------
+    index : str
+        Имя уникального индекса из NATURAL_KEYS.
+    columns : tuple
+        Столбцы строк (должны включать столбцы ключа).
+    rows : list of tuple
+        Значения строк.
+
+    Возвращает словарь с числом строк: inserted, updated, unchanged.
+    """
+    table, key = NATURAL_KEYS[index]
+    others = [c for c in columns if c not in key]
+    col_list = ', '.join(columns)
+    key_match = ' AND '.join(f'{t} = {s}' for t, s in zip(_key_terms(key, 't'), _key_terms(key, 's')))
+    conn = connect(write=True)
+    cursor = conn.cursor()
+    try:
+        if not _has_natural_key(cursor, index):
+            raise ValueError(f"Импорт с обновлением недоступен: в таблице {table} "
+                             f"{_count_duplicates(cursor, table, key)} повторяющихся значений ключа "
+                             f"({', '.join(key)}), уберите дубликаты и перезапустите приложение")
+        cursor.execute('DROP TABLE IF EXISTS temp.upsert_staging')
+        cursor.execute(f'CREATE TEMP TABLE upsert_staging ({col_list})')
+        cursor.execute(f'CREATE UNIQUE INDEX temp.upsert_staging_key ON upsert_staging ({", ".join(_key_terms(key))})')
+        cursor.executemany(f'INSERT OR REPLACE INTO upsert_staging ({col_list}) VALUES ({", ".join("?" * len(columns))})',
+                           rows)
+        total = cursor.execute('SELECT COUNT(*) FROM upsert_staging').fetchone()[0]
+        inserted = cursor.execute(f'SELECT COUNT(*) FROM upsert_staging s WHERE NOT EXISTS '
+                                  f'(SELECT 1 FROM {table} t WHERE {key_match})').fetchone()[0]
+        same = ' AND '.join(f't.{c} IS s.{c}' for c in others) or '1'
+        unchanged = cursor.execute(f'SELECT COUNT(*) FROM upsert_staging s JOIN {table} t ON {key_match} '
+                                   f'WHERE {same}').fetchone()[0]
+        changed = ' OR '.join(f'{table}.{c} IS NOT excluded.{c}' for c in others) or '0'
+        assignments = ', '.join(f'{c} = excluded.{c}' for c in others) or f'{key[0]} = excluded.{key[0]}'
+        cursor.execute(f'INSERT INTO {table} ({col_list}) SELECT {col_list} FROM upsert_staging WHERE true '
+                       f'ON CONFLICT ({", ".join(_key_terms(key))}) DO UPDATE SET {assignments} WHERE {changed}')
+        cursor.execute('DROP TABLE temp.upsert_staging')
+        conn.commit()
+    finally:
+        conn.close()
+    if total > unchanged:
+        publish(table, 'import')
+    return {'inserted': inserted, 'updated': total - inserted - unchanged, 'unchanged': unchanged}
+
+@retry_on_busy
+def insert_rows(table: str, columns: tuple, rows: List[tuple]) -> dict:
+    """
+    Добавить строки одной транзакцией: при ошибке (например, повторе естественного ключа)
+    не добавляется ни одна строка и исключение передается вызывающему.
+    """
+    conn = connect(write=True)
+    try:
+        conn.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})', rows)
+        conn.commit()
+    finally:
+        conn.close()
+    if rows:
+        publish(table, 'import')
+    return {'inserted': len(rows), 'updated': 0, 'unchanged': 0}
+
+def _import_rows(index: str, columns: tuple, rows: List[tuple], mode: str) -> dict:
+    """Импортировать строки в режиме 'upsert' (по естественному ключу index) или 'insert' (все или ничего)."""
+    if mode == 'upsert':
+        return upsert_rows(index, columns, rows)
+    if mode == 'insert':
+        return insert_rows(NATURAL_KEYS[index][0], columns, rows)  # id генерируются новые
+    raise ValueError(f"Неизвестный режим импорта: {mode}")
+
+def _import_clients(rows: List[tuple], mode: str) -> dict:
+    """Импортировать клиентов (name, email, phone, address) в режиме 'upsert' или 'insert'."""
+    return _import_rows('idx_clients_email', ('name', 'email', 'phone', 'address'), rows, mode)
+
+def _import_products(rows: List[tuple], mode: str, thresholds: bool = True) -> dict:
+    """
+    Импортировать товары (name, price, category, quantity, reorder_threshold) в режиме 'upsert' или 'insert'.
+
+    При thresholds=False (в файле нет порогов) строки — без reorder_threshold: новые товары
+    получают порог 0, у существующих порог не меняется.
+    """
+    columns = ('name', 'price', 'category', 'quantity') + (('reorder_threshold',) if thresholds else ())
+    return _import_rows('idx_products_name_category', columns, rows, mode)
 
 def export_clients_to_csv(filename: str = 'clients.csv'):
     """Экспортировать клиентов в CSV."""
     clients = get_all_clients()
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
+    with open_file(filename, 'w', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['id', 'name', 'email', 'phone', 'address'])
         for client in clients:
             writer.writerow([client.id, client.name, client.email, client.phone, client.address])
 
-def import_clients_from_csv(filename: str = 'clients.csv'):
-    """Импортировать клиентов из CSV."""
+def import_clients_from_csv(filename: str = 'clients.csv', mode: str = 'upsert') -> dict:
+    """
+    Импортировать клиентов из CSV.
+
+    В режиме 'upsert' (по умолчанию; до появления режимов импорт всегда добавлял строки)
+    клиенты сопоставляются по email: новые добавляются, измененные обновляются.
+    В режиме 'insert' все строки добавляются как новые одной транзакцией; если email уже
+    есть в базе, импорт отменяется целиком (sqlite3.IntegrityError). Столбец id игнорируется.
+    Возвращает число добавленных, обновленных и неизмененных строк.
+    """
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Файл {filename} не найден")
-    with open(filename, 'r', encoding='utf-8') as f:
+    with open_file(filename, 'r', newline='') as f:
         reader = csv.reader(f)
         next(reader)  # Пропустить заголовок
-        for row in reader:
-            client = Client(name=row[1], email=row[2], phone=row[3], address=row[4])
-            add_client(client)  # id игнорируется, генерируется новый
+        rows = [(row[1], row[2], row[3], row[4]) for row in reader]
+    return _import_clients(rows, mode)
 
 def export_products_to_csv(filename: str = 'products.csv'):
     """Экспортировать товары в CSV."""
     products = get_all_products()
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
+    with open_file(filename, 'w', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(['id', 'name', 'price', 'category', 'quantity'])
+        writer.writerow(['id', 'name', 'price', 'category', 'quantity', 'reorder_threshold'])
         for product in products:
-            writer.writerow([product.id, product.name, product.price, product.category, product.quantity])
+            writer.writerow([product.id, product.name, product.price, product.category, product.quantity,
+                             product.reorder_threshold])
 
-def import_products_from_csv(filename: str = 'products.csv'):
-    """Импортировать товары из CSV."""
+def import_products_from_csv(filename: str = 'products.csv', mode: str = 'upsert') -> dict:
+    """
+    Импортировать товары из CSV.
+
+    В режиме 'upsert' (по умолчанию) товары сопоставляются по паре (название, категория),
+    пустая категория совпадает с пустой. В режиме 'insert' все строки добавляются как новые
+    одной транзакцией; при повторе пары импорт отменяется целиком (sqlite3.IntegrityError).
+    Столбец reorder_threshold необязателен (файлы прежних версий): без него новые товары
+    получают порог 0, а пороги существующих не меняются.
+    Возвращает число добавленных, обновленных и неизмененных строк.
+    """
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Файл {filename} не найден")
-    with open(filename, 'r', encoding='utf-8') as f:
+    with open_file(filename, 'r', newline='') as f:
         reader = csv.reader(f)
-        next(reader)
-        for row in reader:
-            product = Product(name=row[1], price=float(row[2]), category=row[3], quantity=int(row[4]))
-            add_product(product)
+        header = next(reader)
+        thresholds = 'reorder_threshold' in header
+        column = header.index('reorder_threshold') if thresholds else None
+        rows = [(row[1], float(row[2]), row[3], int(row[4])) + ((int(row[column] or 0),) if thresholds else ())
+                for row in reader]
+    return _import_products(rows, mode, thresholds)
 
-def export_orders_to_csv(filename: str = 'orders.csv'):
-    """Экспортировать заказы в CSV (упрощенно, без items)."""
-    orders = get_all_orders()
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
+def export_orders_to_csv(filename: str = 'orders.csv', include_archive: bool = False):
+    """Экспортировать заказы в CSV (позиции — "product_id:quantity;..."), при include_archive=True вместе с архивом."""
+    rows = get_order_summaries(include_archive)
+    with open_file(filename, 'w', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['id', 'client_id', 'date', 'items'])
-        for order in orders:
-            items_str = ';'.join(f"{item.product.id}:{item.quantity}" for item in order.items)
-            writer.writerow([order.id, order.client.id, order.date.isoformat(), items_str])
+        writer.writerows((order_id, client_id, date, items) for order_id, client_id, _, date, _, items, _ in rows)
 
 def import_orders_from_csv(filename: str = 'orders.csv'):
     """Импортировать заказы из CSV."""
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Файл {filename} не найден")
-    with open(filename, 'r', encoding='utf-8') as f:
+    with open_file(filename, 'r', newline='') as f:
         reader = csv.reader(f)
         next(reader)
         for row in reader:
@@ -359,51 +1409,61 @@ def export_clients_to_json(filename: str = 'clients.json'):
     """Экспортировать клиентов в JSON."""
     clients = get_all_clients()
     data = [{'id': c.id, 'name': c.name, 'email': c.email, 'phone': c.phone, 'address': c.address} for c in clients]
-    with open(filename, 'w', encoding='utf-8') as f:
+    with open_file(filename, 'w') as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
-def import_clients_from_json(filename: str = 'clients.json'):
-    """Импортировать клиентов из JSON."""
+def import_clients_from_json(filename: str = 'clients.json', mode: str = 'upsert') -> dict:
+    """Импортировать клиентов из JSON (режимы как в import_clients_from_csv)."""
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Файл {filename} не найден")
-    with open(filename, 'r', encoding='utf-8') as f:
+    with open_file(filename) as f:
         data = json.load(f)
-        for item in data:
-            client = Client(name=item['name'], email=item['email'], phone=item['phone'], address=item.get('address', ''))
-            add_client(client)
+    rows = [(item['name'], item['email'], item['phone'], item.get('address', '')) for item in data]
+    return _import_clients(rows, mode)
 
 def export_products_to_json(filename: str = 'products.json'):
     """Экспортировать товары в JSON."""
     products = get_all_products()
-    data = [{'id': p.id, 'name': p.name, 'price': p.price, 'category': p.category, 'quantity': p.quantity} for p in products]
-    with open(filename, 'w', encoding='utf-8') as f:
+    data = [{'id': p.id, 'name': p.name, 'price': p.price, 'category': p.category, 'quantity': p.quantity,
+             'reorder_threshold': p.reorder_threshold} for p in products]
+    with open_file(filename, 'w') as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
-def import_products_from_json(filename: str = 'products.json'):
-    """Импортировать товары из JSON."""
+def import_products_from_json(filename: str = 'products.json', mode: str = 'upsert') -> dict:
+    """
+    Импортировать товары из JSON (режимы и необязательный reorder_threshold как в import_products_from_csv).
+
+    Порог указывается у всех товаров файла или ни у одного, иначе ValueError.
+    """
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Файл {filename} не найден")
-    with open(filename, 'r', encoding='utf-8') as f:
+    with open_file(filename) as f:
         data = json.load(f)
-        for item in data:
-            product = Product(name=item['name'], price=item['price'], category=item.get('category', 'General'), quantity=item['quantity'])
-            add_product(product)
+    with_threshold = sum('reorder_threshold' in item for item in data)
+    if 0 < with_threshold < len(data):
+        # Без порога у части строк upsert обнулил бы пороги существующих товаров
+        raise ValueError(f"Порог reorder_threshold указан у {with_threshold} из {len(data)} товаров: "
+                         f"укажите его у всех товаров файла или ни у одного")
+    thresholds = with_threshold > 0
+    rows = [(item['name'], item['price'], item.get('category', 'General'), item['quantity'])
+            + ((item['reorder_threshold'],) if thresholds else ()) for item in data]
+    return _import_products(rows, mode, thresholds)
 
-def export_orders_to_json(filename: str = 'orders.json'):
-    """Экспортировать заказы в JSON."""
-    orders = get_all_orders()
+def export_orders_to_json(filename: str = 'orders.json', include_archive: bool = False):
+    """Экспортировать заказы в JSON, при include_archive=True вместе с архивом."""
+    orders = get_all_orders(include_archive)
     data = []
     for order in orders:
         items = [{'product_id': item.product.id, 'quantity': item.quantity} for item in order.items]
         data.append({'id': order.id, 'client_id': order.client.id, 'date': order.date.isoformat(), 'items': items})
-    with open(filename, 'w', encoding='utf-8') as f:
+    with open_file(filename, 'w') as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
 def import_orders_from_json(filename: str = 'orders.json'):
     """Импортировать заказы из JSON."""
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Файл {filename} не найден")
-    with open(filename, 'r', encoding='utf-8') as f:
+    with open_file(filename) as f:
         data = json.load(f)
         for item in data:
             client = get_client_by_id(item['client_id'])
@@ -418,5 +1478,3 @@ def import_orders_from_json(filename: str = 'orders.json'):
             order = Order(client, items, date)
             add_order(order)
 
-# Инициализировать БД при загрузке модуля
-init_db()
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Модуль шины событий об изменениях данных.
+Слой данных (db.py) публикует событие после каждой зафиксированной операции,
+представления подписываются на нужные сущности и операции.
+"""
+
+import threading
+from typing import Callable, Iterable, Optional
+
+# Сущности и операции, о которых публикуются события
+ENTITIES = ('clients', 'products', 'orders')
+OPERATIONS = ('insert', 'update', 'delete', 'reindex', 'import')
+
+class ChangeEvent:
+    """
+    Событие изменения данных.
+
+    Параметры
+    ----------
+    entity : str
+        Сущность: 'clients', 'products' или 'orders'.
+    operation : str
+        Операция: 'insert', 'update', 'delete', 'reindex' (перенумерация всех ID) или 'import' (массовое изменение).
+    ids : iterable of int
+        ID затронутых записей; пусто для 'reindex' и 'import', когда затронута вся таблица.
+    """
+
+    def __init__(self, entity: str, operation: str, ids: Iterable[int] = ()):
+        if entity not in ENTITIES:
+            raise ValueError(f"Неизвестная сущность: {entity}")
+        if operation not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция: {operation}")
+        self.entity = entity
+        self.operation = operation
+        self.ids = tuple(ids)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, ChangeEvent) and
+                (self.entity, self.operation, self.ids) == (other.entity, other.operation, other.ids))
+
+    def __repr__(self) -> str:
+        return f"ChangeEvent(entity={self.entity!r}, operation={self.operation!r}, ids={self.ids!r})"
+
+class EventBus:
+    """Синхронная шина: подписчики вызываются в потоке, опубликовавшем событие."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None], entity: Optional[str] = None,
+                  operations: Optional[Iterable[str]] = None) -> int:
+        """
+        Подписаться на события.
+
+        entity=None означает все сущности, operations=None — все операции.
+        Возвращает токен для unsubscribe.
+        """
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._subscribers[token] = (callback, entity, frozenset(operations) if operations else None)
+        return token
+
+    def unsubscribe(self, token: int):
+        """Отписаться по токену."""
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def publish(self, event: ChangeEvent):
+        """Разослать событие подходящим подписчикам."""
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for callback, entity, operations in subscribers:
+            if (entity is None or entity == event.entity) and (operations is None or event.operation in operations):
+                callback(event)
+
+bus = EventBus()  # Общая шина процесса
+
+def publish(entity: str, operation: str, ids: Iterable[int] = ()):
+    """Опубликовать событие в общей шине."""
+    bus.publish(ChangeEvent(entity, operation, ids))
+
+def subscribe(callback: Callable[[ChangeEvent], None], entity: Optional[str] = None,
+              operations: Optional[Iterable[str]] = None) -> int:
+    """Подписаться на события общей шины."""
+    return bus.subscribe(callback, entity, operations)
+
+def unsubscribe(token: int):
+    """Отписаться от общей шины."""
+    bus.unsubscribe(token)
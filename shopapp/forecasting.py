@@ -0,0 +1,105 @@
+"""
+Модуль прогноза расхода запасов и рекомендаций по дозаказу.
+Спрос по всем товарам считается одним запросом в матрицу «дни × товары»,
+сглаживание выполняется векторно сразу по всем столбцам.
+"""
+
+import datetime
+from typing import Optional
+import numpy as np
+import pandas as pd
+import db
+
+def daily_demand_matrix(days: int = 90, end: Optional[datetime.date] = None, include_archive: bool = False):
+    """
+    Построить матрицу ежедневного спроса за последние days дней (включая end).
+
+    Возвращает (dates, products, demand): даты строк, DataFrame товаров (id, name, quantity)
+    в порядке столбцов и массив формы (days, число товаров) с проданным количеством.
+    """
+    end = end or datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    conn = db.connect()
+    cursor = conn.cursor()
+    archived = db._attach_archive(cursor, include_archive, start)
+    orders_source = db._union_source('orders', 'id, client_id, date', archived)
+    lines_source = db._union_source('order_products', 'order_id, product_id, quantity', archived)
+    products = pd.read_sql_query('SELECT id, name, quantity FROM products ORDER BY id', conn)
+    sales = pd.read_sql_query(f'''
+        SELECT o.date, op.product_id, SUM(op.quantity) AS quantity
+        FROM {lines_source} op JOIN {orders_source} o ON o.id = op.order_id
+        WHERE o.date BETWEEN ? AND ?
+        GROUP BY o.date, op.product_id''', conn, params=(start.isoformat(), end.isoformat()))
+    conn.close()
+
+    dates = pd.date_range(start, end, freq='D')
+    demand = np.zeros((days, len(products)), dtype=np.float64)
+    if not sales.empty:
+        rows = (pd.to_datetime(sales['date']) - pd.Timestamp(start)).dt.days.to_numpy()
+        ids = products['id'].to_numpy()
+        cols = np.searchsorted(ids, sales['product_id'].to_numpy())
+        cols = np.minimum(cols, max(len(ids) - 1, 0))
+        known = (len(ids) > 0) & (ids[cols] == sales['product_id'].to_numpy())  # Продажи удаленных товаров не учитываются
+        np.add.at(demand, (rows[known], cols[known]), sales['quantity'].to_numpy()[known])
+    return dates, products, demand
+
+def smooth_demand(demand: np.ndarray, method: str = 'ewm', alpha: float = 0.3, window: int = 28) -> np.ndarray:
+    """
+    Оценить текущий дневной спрос каждого товара по матрице спроса.
+
+    method='ewm' — экспоненциальное сглаживание с коэффициентом alpha (начальный уровень — среднее за период),
+    method='mean' — скользящее среднее за последние window дней.
+    Возвращает массив длиной в число товаров.
+    """
+    if demand.shape[0] == 0:
+        return np.zeros(demand.shape[1])
+    if method == 'mean':
+        return demand[-window:].mean(axis=0)
+    if method != 'ewm':
+        raise ValueError(f"Неизвестный метод сглаживания: {method}")
+    level = demand.mean(axis=0)
+    for day in demand:  # Цикл по дням, каждый шаг — векторная операция по всем товарам
+        level = alpha * day + (1 - alpha) * level
+    return level
+
+def forecast_stockouts(days: int = 90, method: str = 'ewm', alpha: float = 0.3, lead_time: int = 7,
+                       safety_days: int = 7, cover_days: int = 30, end: Optional[datetime.date] = None,
+                       include_archive: bool = False) -> pd.DataFrame:
+    """
+    Прогноз исчерпания запасов и рекомендуемый дозаказ по всем товарам.
+
+    Параметры
+    ----------
+    days : int
+        Глубина истории спроса в днях.
+    method, alpha : str, float
+        Способ сглаживания (см. smooth_demand).
+    lead_time : int
+        Срок поставки в днях.
+    safety_days : int
+        Страховой запас в днях спроса.
+    cover_days : int
+        На сколько дней спроса после поставки рассчитан заказ.
+
+    Возвращает DataFrame: product_id, name, quantity, daily_demand, days_until_stockout
+    (inf при нулевом спросе), reorder_point, reorder_quantity, needs_reorder;
+    отсортирован по days_until_stockout.
+    """
+    _, products, demand = daily_demand_matrix(days, end, include_archive)
+    rate = smooth_demand(demand, method, alpha)
+    stock = products['quantity'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(rate > 0, stock / rate, np.inf)
+    reorder_point = rate * (lead_time + safety_days)
+    reorder_quantity = np.ceil(np.maximum(rate * (lead_time + safety_days + cover_days) - stock, 0)).astype(np.int64)
+    result = pd.DataFrame({
+        'product_id': products['id'],
+        'name': products['name'],
+        'quantity': products['quantity'],
+        'daily_demand': rate,
+        'days_until_stockout': days_left,
+        'reorder_point': reorder_point,
+        'reorder_quantity': reorder_quantity,
+        'needs_reorder': (stock <= reorder_point) & (rate > 0),
+    })
+    return result.sort_values('days_until_stockout', kind='stable', ignore_index=True)
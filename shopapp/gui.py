@@ -7,17 +7,32 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox, simpledialog, filedialog
+import contextlib
 import re
 import sqlite3
 import datetime
 from models import Client, Product, Order, OrderItem
-from db import (add_client, add_product, add_order, get_all_clients, get_all_orders, get_all_products,
+from db import (add_client, add_product, add_order, get_all_clients, get_order_summaries, get_all_products,
                 get_client_by_id, get_product_by_id, update_product, update_client, delete_client,
                 delete_product, reindex_clients, reindex_products, delete_order, reindex_orders,
                 export_clients_to_csv, import_clients_from_csv, export_products_to_csv, import_products_from_csv,
                 export_orders_to_csv, import_orders_from_csv, export_clients_to_json, import_clients_from_json,
                 export_products_to_json, import_products_from_json, export_orders_to_json, import_orders_from_json)
-from analysis import top_clients_by_orders, plot_order_dynamics, plot_client_graph
+from columnar import export_snapshot, import_snapshot
+from events import subscribe
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from charts import CHARTS, cached_chart, chart_data, chart_from_data, export_chart
+from runner import POLL_INTERVAL_MS, AnalysisRunner
+from search_index import LiveIndex, text_keys
+from table_model import TableModel
+from forecasting import forecast_stockouts
+from segmentation import SEGMENTS, export_rfm_to_csv, get_segment_client_ids
+from recommendations import build_recommendations, get_related_products
+from changes import export_changes
+from backup import create_backup, default_backup_dir, restore_backup
+from maintenance import shutdown_maintenance
+from stock_alerts import LowStockWatch
+from report_snapshot import REFRESH_INTERVAL, default_snapshot_path, reading_snapshot, refresh_snapshot
 from typing import List
 
 def validate_email(email: str) -> bool:
@@ -30,6 +45,75 @@ def validate_phone(phone: str) -> bool:
     pattern = r'^\+?[\d\s-]{10,15}$'
     return bool(re.match(pattern, phone))
 
+class RefreshScheduler:
+    """
+    Объединяет запросы на обновление представлений.
+
+    Сколько бы событий ни пришло подряд, каждое представление обновляется
+    не чаще одного раза за цикл простоя Tk.
+    """
+
+    def __init__(self, root: tk.Tk):
+        self.root = root
+        self._pending = {}
+        self._scheduled = False
+
+    def request(self, name: str, refresh):
+        """Запланировать обновление представления name."""
+        self._pending[name] = refresh
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after_idle(self._flush)
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        for refresh in pending.values():
+            refresh()
+
+def export_filetypes(extension: str) -> list:
+    """Типы файлов диалога экспорта: формат как есть и сжатые варианты (сжатие выбирается по расширению)."""
+    if extension == ".npz":
+        return [("Снимок", "*.npz")]
+    name = extension.lstrip('.').upper()
+    return [(name, f"*{extension}"), (f"{name} gzip", f"*{extension}.gz"),
+            (f"{name} bzip2", f"*{extension}.bz2"), (f"{name} xz", f"*{extension}.xz")]
+
+class Debouncer:
+    """Вызывает callback через delay мс после последнего запроса (например, нажатия клавиши)."""
+
+    def __init__(self, root: tk.Tk, delay: int, callback):
+        self.root = root
+        self.delay = delay
+        self.callback = callback
+        self._after_id = None
+
+    def request(self, *args):
+        """Перезапустить отсчет задержки."""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay, self._fire)
+
+    def _fire(self):
+        self._after_id = None
+        self.callback()
+
+SEARCH_DELAY_MS = 150  # Задержка живого поиска после ввода
+LOW_STOCK_SHOWN = 3    # Сколько заканчивающихся товаров перечислять в строке состояния
+
+# Зависимости представлений от событий: представление -> {сущность: операции (None = любые)}.
+# Список заказов показывает имена клиентов, названия и цены товаров,
+# поэтому добавление клиента или товара его не затрагивает.
+VIEW_DEPENDENCIES = {
+    'clients': {'clients': None},  # От заказов — только при фильтре по сегменту (refresh_client_segments)
+    'order_clients': {'clients': None},
+    'products': {'products': None},
+    'order_products': {'products': None},
+    'orders': {'orders': None,
+               'clients': ('update', 'delete', 'reindex', 'import'),
+               'products': ('update', 'delete', 'reindex', 'import')},
+}
+
 class OrderManagementApp:
 
     def __init__(self, root: tk.Tk):
@@ -37,6 +121,7 @@ class OrderManagementApp:
         self.root.title("Система учета заказов")
         self.root.geometry("800x600")  # Установить размер окна
         self.root.configure(bg='white')  # Белый фон окна
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Стиль для элементов
         style = ttk.Style()
@@ -46,6 +131,30 @@ class OrderManagementApp:
         style.configure("Treeview", font=("Arial", 11), background='white', foreground='black', fieldbackground='white')
         style.configure("Treeview.Heading", font=("Arial", 12, "bold"), background='#D3D3D3', foreground='black')
 
+        # Индексы живого поиска: строятся при первом поиске, дальше обновляются по событиям
+        self.clients_index = LiveIndex('clients', get_all_clients, get_client_by_id,
+                                       lambda c: text_keys(c.name, c.email))
+        self.products_index = LiveIndex('products', get_all_products, get_product_by_id,
+                                        lambda p: text_keys(p.name, p.category))
+
+        # Строка состояния: товары на пороге дозаказа (список обновляется по событиям, без просмотра каталога)
+        status_frame = ttk.Frame(root)
+        status_frame.pack(side='bottom', fill='x')
+        self.low_stock_label = ttk.Label(status_frame, text="")
+        self.low_stock_label.pack(side='left', padx=10, pady=3)
+        self.snapshot_status_label = ttk.Label(status_frame, text="")
+        self.snapshot_status_label.pack(side='left', padx=10, pady=3)
+        ttk.Button(status_frame, text="Мало на складе", command=self.show_low_stock).pack(side='right', padx=10, pady=3)
+        # Тяжелые отчеты считаются в отдельных процессах (см. runner.py)
+        self.runner = AnalysisRunner()
+        self.analysis_jobs = {}  # Job -> заголовок для строки состояния
+        self.chart_jobs = {}     # (отчет, include_archive, по снимку) -> Job
+        self.snapshot_refresh_id = None  # Запланированное обновление снимка для отчетов
+        self.snapshot_job = None         # Последнее запущенное обновление снимка
+        self.analysis_polling = False
+        self.low_stock = LowStockWatch(lambda: self.refresh_scheduler.request('low_stock', self.update_low_stock_label))
+        self.update_low_stock_label()
+
         # Вкладки
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill='both', expand=True)
@@ -83,6 +192,74 @@ class OrderManagementApp:
         self.editing_client_id = None
         self.editing_product_id = None
 
+        # Данные вкладки загружаются при ее первом показе; до этого события ее не обновляют
+        self.view_refreshers = {
+            'clients': self.update_clients_table,
+            'order_clients': self.update_order_clients_table,
+            'products': self.update_products_table,
+            'order_products': self.update_order_products_table,
+            'orders': self.update_orders_table,
+        }
+        self.tab_views = {
+            self.clients_tab: ('clients',),
+            self.products_tab: ('products',),
+            self.create_order_frame: ('order_clients', 'order_products'),
+            self.view_orders_frame: ('orders',),
+        }
+        self.sub_notebooks = {self.orders_tab: self.orders_notebook}
+        self.loaded_views = set()
+
+        # Обновление таблиц по событиям слоя данных
+        self.refresh_scheduler = RefreshScheduler(root)
+        self.subscribe_views()
+
+        for notebook in (self.notebook, self.orders_notebook):
+            notebook.bind('<<NotebookTabChanged>>', lambda event: self.load_visible_views())
+        self.load_visible_views()
+
+    def subscribe_views(self):
+        """Подписать представления на события изменений согласно VIEW_DEPENDENCIES."""
+        for view, dependencies in VIEW_DEPENDENCIES.items():
+            refresh = self.view_refreshers[view]
+            for entity, operations in dependencies.items():
+                subscribe(lambda event, view=view, refresh=refresh: self.request_refresh(view, refresh),
+                          entity, operations)
+        subscribe(lambda event: self.refresh_client_segments(), 'orders')
+
+    def refresh_client_segments(self):
+        """Заказы меняют RFM-сегменты: таблицу клиентов обновлять, только если она отфильтрована по сегменту."""
+        if self.client_segment.get() in SEGMENTS:
+            self.request_refresh('clients', self.view_refreshers['clients'])
+
+    def request_refresh(self, view: str, refresh):
+        """Запланировать обновление загруженного представления; незагруженное прочитает данные при показе."""
+        if view in self.loaded_views:
+            self.refresh_scheduler.request(view, refresh)
+
+    def load_visible_views(self):
+        """Загрузить данные показанных вкладок (и выбранной подвкладки), которые еще не загружались."""
+        notebook = self.notebook
+        while notebook is not None:
+            frame = notebook.nametowidget(notebook.select())
+            for view in self.tab_views.get(frame, ()):
+                if view not in self.loaded_views:
+                    self.loaded_views.add(view)
+                    self.view_refreshers[view]()
+            notebook = self.sub_notebooks.get(frame)
+
+    def reload_table(self, index: LiveIndex, refresh):
+        """Перечитать данные из базы: сбросить индекс поиска и обновить представление."""
+        index.invalidate()
+        refresh()
+
+    def create_search_entry(self, master, refresh) -> ttk.Entry:
+        """Поле поиска, обновляющее представление refresh через SEARCH_DELAY_MS после ввода."""
+        text = tk.StringVar()
+        entry = ttk.Entry(master, textvariable=text)
+        entry.debouncer = Debouncer(self.root, SEARCH_DELAY_MS, refresh)
+        text.trace_add('write', entry.debouncer.request)
+        return entry
+
     def setup_clients_tab(self):
         """Вкладка для клиентов."""
         # Форма добавления/редактирования
@@ -111,23 +288,23 @@ class OrderManagementApp:
         ttk.Button(form_frame, text="Изменить клиента", command=self.load_selected_client).pack(pady=5)
         ttk.Button(form_frame, text="Удалить клиента", command=self.delete_selected_client).pack(pady=5)
 
-        # Фильтр
-        ttk.Label(form_frame, text="Фильтр по имени").pack(pady=5)
-        self.client_filter = ttk.Entry(form_frame)
+        # Фильтр (поиск по мере ввода)
+        ttk.Label(form_frame, text="Поиск по имени или email").pack(pady=5)
+        self.client_filter = self.create_search_entry(form_frame, self.update_clients_table)
         self.client_filter.pack(pady=5)
-        ttk.Button(form_frame, text="Применить фильтр", command=self.update_clients_table).pack(pady=5)
+        ttk.Label(form_frame, text="RFM-сегмент").pack(pady=5)
+        self.client_segment = ttk.Combobox(form_frame, values=["Все"] + SEGMENTS, state='readonly')
+        self.client_segment.set("Все")
+        self.client_segment.bind('<<ComboboxSelected>>', lambda event: self.update_clients_table())
+        self.client_segment.pack(pady=5)
 
         # Таблица
         self.clients_tree = ttk.Treeview(self.clients_tab, columns=('ID', 'Имя', 'Email', 'Телефон', 'Адрес'), show='headings')
-        self.clients_tree.heading('ID', text='ID', command=lambda: self.sort_treeview(self.clients_tree, 'ID', False))
-        self.clients_tree.heading('Имя', text='Имя', command=lambda: self.sort_treeview(self.clients_tree, 'Имя', False))
-        self.clients_tree.heading('Email', text='Email', command=lambda: self.sort_treeview(self.clients_tree, 'Email', False))
-        self.clients_tree.heading('Телефон', text='Телефон', command=lambda: self.sort_treeview(self.clients_tree, 'Телефон', False))
-        self.clients_tree.heading('Адрес', text='Адрес', command=lambda: self.sort_treeview(self.clients_tree, 'Адрес', False))
+        self.clients_model = self.setup_sorting(self.clients_tree, [('ID', 'int'), ('Имя', 'text'), ('Email', 'text'),
+                                                                    ('Телефон', 'text'), ('Адрес', 'text')])
         self.clients_tree.pack(side='right', fill='both', expand=True, padx=10, pady=10)
 
-        ttk.Button(self.clients_tab, text="Обновить таблицу", command=self.update_clients_table).pack(pady=10)
-        self.update_clients_table()  # Начальная загрузка
+        ttk.Button(self.clients_tab, text="Обновить таблицу", command=lambda: self.reload_table(self.clients_index, self.update_clients_table)).pack(pady=10)
 
     def setup_products_tab(self):
         """Вкладка для товаров."""
@@ -151,42 +328,43 @@ class OrderManagementApp:
         self.product_quantity = ttk.Entry(form_frame)
         self.product_quantity.pack(pady=5)
 
+        ttk.Label(form_frame, text="Порог дозаказа").pack(pady=5)
+        self.product_threshold = ttk.Entry(form_frame)
+        self.product_threshold.pack(pady=5)
+
         ttk.Button(form_frame, text="Сохранить товар", command=self.save_product).pack(pady=10)
 
         # Кнопки изменения и удаления
         ttk.Button(form_frame, text="Изменить товар", command=self.load_selected_product).pack(pady=5)
         ttk.Button(form_frame, text="Удалить товар", command=self.delete_selected_product).pack(pady=5)
 
-        # Фильтр
-        ttk.Label(form_frame, text="Фильтр по названию").pack(pady=5)
-        self.product_filter = ttk.Entry(form_frame)
+        # Фильтр (поиск по мере ввода)
+        ttk.Label(form_frame, text="Поиск по названию или категории").pack(pady=5)
+        self.product_filter = self.create_search_entry(form_frame, self.update_products_table)
         self.product_filter.pack(pady=5)
-        ttk.Button(form_frame, text="Применить фильтр", command=self.update_products_table).pack(pady=5)
 
         # Таблица
-        self.products_tree = ttk.Treeview(self.products_tab, columns=('ID', 'Название', 'Цена', 'Категория', 'Количество'), show='headings')
-        self.products_tree.heading('ID', text='ID', command=lambda: self.sort_treeview(self.products_tree, 'ID', False))
-        self.products_tree.heading('Название', text='Название', command=lambda: self.sort_treeview(self.products_tree, 'Название', False))
-        self.products_tree.heading('Цена', text='Цена', command=lambda: self.sort_treeview(self.products_tree, 'Цена', False))
-        self.products_tree.heading('Категория', text='Категория', command=lambda: self.sort_treeview(self.products_tree, 'Категория', False))
-        self.products_tree.heading('Количество', text='Количество', command=lambda: self.sort_treeview(self.products_tree, 'Количество', False))
+        self.products_tree = ttk.Treeview(self.products_tab, columns=('ID', 'Название', 'Цена', 'Категория', 'Количество', 'Порог'), show='headings')
+        self.products_model = self.setup_sorting(self.products_tree, [('ID', 'int'), ('Название', 'text'), ('Цена', 'float'),
+                                                                      ('Категория', 'text'), ('Количество', 'int'), ('Порог', 'int')])
         self.products_tree.pack(side='right', fill='both', expand=True, padx=10, pady=10)
 
-        ttk.Button(self.products_tab, text="Обновить таблицу", command=self.update_products_table).pack(pady=10)
-        self.update_products_table()
+        ttk.Button(self.products_tab, text="Обновить таблицу", command=lambda: self.reload_table(self.products_index, self.update_products_table)).pack(pady=10)
 
     def setup_orders_tab(self):
         """Вкладка для заказов."""
         # Подвкладки для создания и просмотра
-        orders_notebook = ttk.Notebook(self.orders_tab)
-        orders_notebook.pack(fill='both', expand=True)
+        self.orders_notebook = ttk.Notebook(self.orders_tab)
+        self.orders_notebook.pack(fill='both', expand=True)
 
         # Подвкладка Создание заказа
-        create_order_frame = ttk.Frame(orders_notebook)
-        orders_notebook.add(create_order_frame, text='Создать заказ')
+        self.create_order_frame = create_order_frame = ttk.Frame(self.orders_notebook)
+        self.orders_notebook.add(create_order_frame, text='Создать заказ')
 
         # Таблица клиентов
         ttk.Label(create_order_frame, text="Выберите клиента:").pack(pady=5)
+        self.order_client_filter = self.create_search_entry(create_order_frame, self.update_order_clients_table)
+        self.order_client_filter.pack(pady=5)
         self.order_clients_tree = ttk.Treeview(create_order_frame, columns=('ID', 'Имя', 'Email'), show='headings', height=5)
         self.order_clients_tree.heading('ID', text='ID')
         self.order_clients_tree.heading('Имя', text='Имя')
@@ -203,15 +381,14 @@ class OrderManagementApp:
         self.order_products_tree.heading('Количество', text='Количество')
         self.order_products_tree.pack(fill='both', expand=True, padx=10, pady=5)
         self.order_products_tree.bind('<<TreeviewSelect>>', self.on_select_products)
+        self.order_suggestions = ttk.Label(create_order_frame, text="")
+        self.order_suggestions.pack(pady=5)
 
         ttk.Button(create_order_frame, text="Создать заказ", command=self.save_order).pack(pady=10)
 
-        self.update_order_clients_table()
-        self.update_order_products_table()
-
         # Подвкладка Просмотр заказов
-        view_orders_frame = ttk.Frame(orders_notebook)
-        orders_notebook.add(view_orders_frame, text='Просмотр заказов')
+        self.view_orders_frame = view_orders_frame = ttk.Frame(self.orders_notebook)
+        self.orders_notebook.add(view_orders_frame, text='Просмотр заказов')
 
         # Фильтр по дате
         filter_frame = ttk.Frame(view_orders_frame)
@@ -227,11 +404,9 @@ class OrderManagementApp:
         tree_frame.pack(fill='both', expand=True, padx=10, pady=10)
 
         self.orders_tree = ttk.Treeview(tree_frame, columns=('ID', 'Клиент', 'Дата', 'Сумма', 'Товары'), show='headings')
-        self.orders_tree.heading('ID', text='ID', command=lambda: self.sort_treeview(self.orders_tree, 'ID', False))
-        self.orders_tree.heading('Клиент', text='Клиент', command=lambda: self.sort_treeview(self.orders_tree, 'Клиент', False))
-        self.orders_tree.heading('Дата', text='Дата', command=lambda: self.sort_treeview(self.orders_tree, 'Дата', False))
-        self.orders_tree.heading('Сумма', text='Сумма', command=lambda: self.sort_treeview(self.orders_tree, 'Сумма', False))
-        self.orders_tree.heading('Товары', text='Товары', command=lambda: self.sort_treeview(self.orders_tree, 'Товары', False))
+        self.orders_model = self.setup_sorting(self.orders_tree, [('ID', 'int'), ('Клиент', 'text'), ('Дата', 'date'),
+                                                                  ('Сумма', 'float'), ('Товары', 'text')],
+                                               sort_order=[('Дата', False)])
 
         self.orders_tree.column('ID', width=50)
         self.orders_tree.column('Клиент', width=150)
@@ -253,13 +428,219 @@ class OrderManagementApp:
         ttk.Button(view_orders_frame, text="Обновить таблицу", command=self.update_orders_table).pack(pady=5)
         ttk.Button(view_orders_frame, text="Удалить заказ", command=self.delete_selected_order).pack(pady=5)
 
-        self.update_orders_table()
-
     def setup_analysis_tab(self):
-        """Вкладка для анализа."""
-        ttk.Button(self.analysis_tab, text="Топ 5 клиентов", command=top_clients_by_orders).pack(pady=10)
-        ttk.Button(self.analysis_tab, text="Динамика заказов", command=plot_order_dynamics).pack(pady=10)
-        ttk.Button(self.analysis_tab, text="Граф клиентов", command=plot_client_graph).pack(pady=10)
+        """Вкладка для анализа: кнопки отчетов слева, встроенный график справа."""
+        buttons_frame = ttk.Frame(self.analysis_tab)
+        buttons_frame.pack(side='left', padx=10, pady=10, fill='y')
+        self.chart_frame = ttk.Frame(self.analysis_tab)
+        self.chart_frame.pack(side='right', fill='both', expand=True, padx=10, pady=10)
+        self.chart_canvas = None
+        self.current_chart = None
+        self.requested_chart = None
+
+        self.analysis_include_archive = tk.BooleanVar(value=False)
+        ttk.Checkbutton(buttons_frame, text="Включая архив заказов", variable=self.analysis_include_archive).pack(pady=5)
+        self.use_report_snapshot = tk.BooleanVar(value=False)  # Общий для отчетов и экспорта
+        ttk.Checkbutton(buttons_frame, text="По снимку базы (без блокировок)", variable=self.use_report_snapshot,
+                        command=self.toggle_report_snapshot).pack(pady=5)
+        for name, (title, _, _, _) in CHARTS.items():
+            ttk.Button(buttons_frame, text=title, command=lambda name=name: self.show_chart(name)).pack(pady=3, fill='x')
+        ttk.Button(buttons_frame, text="Сохранить график (PNG/SVG)", command=self.export_current_chart).pack(pady=10, fill='x')
+        ttk.Button(buttons_frame, text="Прогноз запасов", command=self.show_stock_forecast).pack(pady=3, fill='x')
+        ttk.Button(buttons_frame, text="Пересчитать рекомендации", command=self.rebuild_recommendations).pack(pady=3, fill='x')
+        ttk.Button(buttons_frame, text="Подготовить все отчеты", command=self.prepare_all_charts).pack(pady=10, fill='x')
+        ttk.Button(buttons_frame, text="Отменить расчет", command=self.cancel_analysis).pack(pady=3, fill='x')
+        self.analysis_status = ttk.Label(buttons_frame, text="", wraplength=200)
+        self.analysis_status.pack(pady=5)
+
+    def run_analysis(self, title: str, func, *args, on_done, on_error=None, **kwargs):
+        """Выполнить расчет в процессе runner; on_done и on_error (по умолчанию окно ошибки) вызываются в потоке Tk."""
+        try:
+            job = self.runner.submit(func, *args, on_done=on_done, **kwargs,
+                                     on_error=on_error or (lambda e: messagebox.showerror("Ошибка", f"{title}: {e}")))
+        except ValueError:  # База в памяти недоступна другим процессам: расчет здесь же
+            on_done(func(*args, **kwargs))
+            return None
+        self.analysis_jobs[job] = title
+        self.update_analysis_status()
+        if not self.analysis_polling:
+            self.analysis_polling = True
+            self.root.after(POLL_INTERVAL_MS, self.poll_analysis)
+        return job
+
+    def poll_analysis(self):
+        """Принять результаты runner; опрос продолжается, пока есть незавершенные задания."""
+        self.analysis_polling = bool(self.runner.poll())
+        self.analysis_jobs = {job: title for job, title in self.analysis_jobs.items() if not job.finished}
+        self.update_analysis_status()
+        if self.analysis_polling:
+            self.root.after(POLL_INTERVAL_MS, self.poll_analysis)
+
+    def update_analysis_status(self):
+        titles = list(self.analysis_jobs.values())
+        self.analysis_status.config(text="Считается: " + ", ".join(titles) if titles else "")
+
+    def cancel_analysis(self):
+        """Остановить все выполняющиеся расчеты."""
+        self.runner.cancel_all()
+        self.analysis_jobs.clear()
+        self.update_analysis_status()
+
+    def report_source(self, from_snapshot: bool):
+        """Контекст чтения для отчетов и экспорта: снимок базы (report_snapshot.py) или рабочая база."""
+        return reading_snapshot() if from_snapshot else contextlib.nullcontext()
+
+    def toggle_report_snapshot(self):
+        """Включить или выключить отчеты по снимку; пока режим включен, снимок обновляется по расписанию."""
+        if self.snapshot_refresh_id is not None:
+            self.root.after_cancel(self.snapshot_refresh_id)
+            self.snapshot_refresh_id = None
+        if not self.use_report_snapshot.get():
+            return
+        self.snapshot_status_label.config(text="")
+        try:
+            default_snapshot_path()
+        except ValueError as e:
+            messagebox.showwarning("Предупреждение", str(e))
+            self.use_report_snapshot.set(False)
+            return
+        self.refresh_report_snapshot()
+
+    def refresh_report_snapshot(self):
+        """
+        Обновить снимок в рабочем процессе (если данные менялись) и запланировать следующее обновление.
+
+        Пока прежнее обновление не закончилось, очередное пропускается.
+        """
+        if self.snapshot_job is None or self.snapshot_job.finished:
+            self.snapshot_job = self.run_analysis("Снимок базы", refresh_snapshot, on_done=lambda result: None,
+                                                  on_error=self.on_snapshot_error)
+        self.snapshot_refresh_id = self.root.after(int(REFRESH_INTERVAL * 1000), self.refresh_report_snapshot)
+
+    def on_snapshot_error(self, error: Exception):
+        """Снимок не обновился: режим снимка выключается, причина — в строке состояния, а не в окне на каждый период."""
+        self.use_report_snapshot.set(False)
+        self.toggle_report_snapshot()
+        self.snapshot_status_label.config(text=f"Снимок базы не обновлен, отчеты по рабочей базе: {error}")
+
+    def request_chart(self, name: str, include_archive: bool, from_snapshot: bool):
+        """Запустить расчет данных отчета, если он еще не выполняется."""
+        key = (name, include_archive, from_snapshot)
+        job = self.chart_jobs.get(key)
+        if job is not None and not job.finished:
+            return
+        with self.report_source(from_snapshot):
+            self.chart_jobs[key] = self.run_analysis(
+                CHARTS[name][0], chart_data, name, include_archive,
+                on_done=lambda result: self.on_chart_data(name, include_archive, from_snapshot, result))
+
+    def on_chart_data(self, name: str, include_archive: bool, from_snapshot: bool, result: tuple):
+        """Нарисовать график по данным из рабочего процесса и показать, если его ждут."""
+        with self.report_source(from_snapshot):
+            chart = chart_from_data(name, result, include_archive)
+        if self.requested_chart == (name, include_archive, from_snapshot):
+            self.display_chart(chart, name, include_archive, from_snapshot)
+
+    def prepare_all_charts(self):
+        """Посчитать все отчеты параллельно, чтобы потом они показывались из кэша."""
+        include_archive, from_snapshot = self.analysis_include_archive.get(), self.use_report_snapshot.get()
+        for name in CHARTS:
+            with self.report_source(from_snapshot):
+                chart = cached_chart(name, include_archive)
+            if chart is None:
+                self.request_chart(name, include_archive, from_snapshot)
+
+    def show_chart(self, name: str):
+        """Показать график отчета во вкладке: из кэша сразу, иначе после расчета в рабочем процессе."""
+        include_archive, from_snapshot = self.analysis_include_archive.get(), self.use_report_snapshot.get()
+        self.requested_chart = (name, include_archive, from_snapshot)
+        with self.report_source(from_snapshot):
+            chart = cached_chart(name, include_archive)
+        if chart is None:
+            self.request_chart(name, include_archive, from_snapshot)
+        else:
+            self.display_chart(chart, name, include_archive, from_snapshot)
+
+    def display_chart(self, chart, name: str, include_archive: bool, from_snapshot: bool):
+        """Встроить построенный график во вкладку."""
+        if self.chart_canvas is not None:
+            self.chart_canvas.get_tk_widget().destroy()
+        self.chart_canvas = FigureCanvasTkAgg(chart.figure, master=self.chart_frame)
+        self.chart_canvas.draw()
+        self.chart_canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.current_chart = (name, include_archive, from_snapshot)
+
+    def export_current_chart(self):
+        """Сохранить показанный график в PNG или SVG."""
+        if self.current_chart is None:
+            messagebox.showwarning("Предупреждение", "Сначала постройте график")
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".png",
+                                                filetypes=[("PNG", "*.png"), ("SVG", "*.svg")])
+        if filename:
+            try:
+                name, include_archive, from_snapshot = self.current_chart
+                with self.report_source(from_snapshot):
+                    export_chart(name, filename, include_archive)
+                messagebox.showinfo("Успех", "График сохранен")
+            except Exception as e:
+                messagebox.showerror("Ошибка", str(e))
+
+    def rebuild_recommendations(self):
+        """Пересчитать рекомендации «часто покупают вместе» в рабочем процессе."""
+        self.run_analysis("Рекомендации", build_recommendations, include_archive=self.analysis_include_archive.get(),
+                          on_done=lambda stats: messagebox.showinfo(
+                              "Рекомендации", f"Товаров с рекомендациями: {stats['products']} ({stats['seconds']:.2f} с)"))
+
+    def show_stock_forecast(self):
+        """Посчитать прогноз расхода в рабочем процессе и показать товары, которым нужен дозаказ."""
+        with self.report_source(self.use_report_snapshot.get()):
+            self.run_analysis("Прогноз запасов", forecast_stockouts, include_archive=self.analysis_include_archive.get(),
+                              on_done=self.show_forecast_window)
+
+    def show_forecast_window(self, forecast):
+        """Окно с товарами, которым по прогнозу нужен дозаказ."""
+        forecast = forecast[forecast['needs_reorder']]
+        if forecast.empty:
+            messagebox.showinfo("Прогноз запасов", "Дозаказ не требуется")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Прогноз запасов")
+        columns = ('ID', 'Название', 'Остаток', 'Спрос в день', 'Дней до исчерпания', 'Дозаказ')
+        tree = ttk.Treeview(window, columns=columns, show='headings')
+        for col in columns:
+            tree.heading(col, text=col)
+        for row in forecast.itertuples(index=False):
+            tree.insert('', 'end', values=(row.product_id, row.name, row.quantity, f"{row.daily_demand:.2f}",
+                                           f"{row.days_until_stockout:.1f}", row.reorder_quantity))
+        tree.pack(fill='both', expand=True)
+
+    def update_low_stock_label(self):
+        """Показать в строке состояния число и первые названия товаров на пороге дозаказа."""
+        products = self.low_stock.products()
+        if not products:
+            self.low_stock_label.config(text="")
+            return
+        names = ", ".join(product.name for product in products[:LOW_STOCK_SHOWN])
+        more = "..." if len(products) > LOW_STOCK_SHOWN else ""
+        self.low_stock_label.config(text=f"Мало на складе ({len(products)}): {names}{more}")
+
+    def show_low_stock(self):
+        """Показать все товары на пороге дозаказа."""
+        products = self.low_stock.products()
+        if not products:
+            messagebox.showinfo("Мало на складе", "Все товары выше порога дозаказа")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Мало на складе")
+        columns = ('ID', 'Название', 'Категория', 'Остаток', 'Порог')
+        tree = ttk.Treeview(window, columns=columns, show='headings')
+        for col in columns:
+            tree.heading(col, text=col)
+        for product in products:
+            tree.insert('', 'end', values=(product.id, product.name, product.category, product.quantity,
+                                           product.reorder_threshold))
+        tree.pack(fill='both', expand=True)
 
     def setup_io_tab(self):
         """Вкладка для импорта/экспорта."""
@@ -268,12 +649,22 @@ class OrderManagementApp:
 
         # Экспорт
         ttk.Label(io_frame, text="Экспорт").pack(pady=5)
+        self.export_include_archive = tk.BooleanVar(value=False)
+        ttk.Checkbutton(io_frame, text="Заказы вместе с архивом", variable=self.export_include_archive).pack(pady=5)
+        ttk.Checkbutton(io_frame, text="Из снимка базы (без блокировок)", variable=self.use_report_snapshot,
+                        command=self.toggle_report_snapshot).pack(pady=5)
         ttk.Button(io_frame, text="Экспорт клиентов CSV", command=lambda: self.export_to_file(export_clients_to_csv)).pack(pady=5)
         ttk.Button(io_frame, text="Экспорт товаров CSV", command=lambda: self.export_to_file(export_products_to_csv)).pack(pady=5)
-        ttk.Button(io_frame, text="Экспорт заказов CSV", command=lambda: self.export_to_file(export_orders_to_csv)).pack(pady=5)
+        ttk.Button(io_frame, text="Экспорт заказов CSV", command=lambda: self.export_to_file(export_orders_to_csv, True)).pack(pady=5)
         ttk.Button(io_frame, text="Экспорт клиентов JSON", command=lambda: self.export_to_file(export_clients_to_json)).pack(pady=5)
         ttk.Button(io_frame, text="Экспорт товаров JSON", command=lambda: self.export_to_file(export_products_to_json)).pack(pady=5)
-        ttk.Button(io_frame, text="Экспорт заказов JSON", command=lambda: self.export_to_file(export_orders_to_json)).pack(pady=5)
+        ttk.Button(io_frame, text="Экспорт заказов JSON", command=lambda: self.export_to_file(export_orders_to_json, True)).pack(pady=5)
+        ttk.Button(io_frame, text="Экспорт RFM-сегментов CSV", command=lambda: self.export_to_file(export_rfm_to_csv, True)).pack(pady=5)
+        ttk.Button(io_frame, text="Экспорт снимка базы (.npz)", command=lambda: self.export_to_file(export_snapshot)).pack(pady=5)
+        ttk.Label(io_frame, text="Изменения с прошлой выгрузки (CSV или JSON)").pack(pady=5)
+        for entity, title in (('clients', "клиентов"), ('products', "товаров"), ('orders', "заказов")):
+            ttk.Button(io_frame, text=f"Изменения {title}",
+                       command=lambda entity=entity: self.export_changes_file(entity)).pack(pady=5)
 
         # Импорт
         ttk.Label(io_frame, text="Импорт").pack(pady=5)
@@ -283,35 +674,87 @@ class OrderManagementApp:
         ttk.Button(io_frame, text="Импорт клиентов JSON", command=lambda: self.import_from_file(import_clients_from_json)).pack(pady=5)
         ttk.Button(io_frame, text="Импорт товаров JSON", command=lambda: self.import_from_file(import_products_from_json)).pack(pady=5)
         ttk.Button(io_frame, text="Импорт заказов JSON", command=lambda: self.import_from_file(import_orders_from_json)).pack(pady=5)
-
-    def export_to_file(self, export_func):
-        """Общий метод для экспорта с выбором файла."""
-        filename = filedialog.asksaveasfilename(defaultextension=".csv" if "csv" in export_func.__name__ else ".json")
+        ttk.Button(io_frame, text="Импорт снимка базы (.npz)", command=self.import_snapshot_file).pack(pady=5)
+
+        # Резервные копии
+        ttk.Label(io_frame, text="Резервные копии").pack(pady=5)
+        ttk.Button(io_frame, text="Создать резервную копию", command=self.backup_database).pack(pady=5)
+        ttk.Button(io_frame, text="Восстановить из копии", command=self.restore_database).pack(pady=5)
+
+    def export_to_file(self, export_func, archive_aware: bool = False):
+        """Общий метод для экспорта с выбором файла; archive_aware - экспорт поддерживает include_archive."""
+        if "snapshot" in export_func.__name__:
+            extension = ".npz"
+        else:
+            extension = ".csv" if "csv" in export_func.__name__ else ".json"
+        filename = filedialog.asksaveasfilename(defaultextension=extension, filetypes=export_filetypes(extension))
         if filename:
             try:
-                export_func(filename)
+                with self.report_source(self.use_report_snapshot.get()):
+                    if archive_aware:
+                        export_func(filename, include_archive=self.export_include_archive.get())
+                    else:
+                        export_func(filename)
                 messagebox.showinfo("Успех", "Экспорт завершен")
             except Exception as e:
                 messagebox.showerror("Ошибка", str(e))
 
+    def export_changes_file(self, entity: str):
+        """Выгрузить изменения сущности после прошлой выгрузки (водяной знак хранится в базе)."""
+        filename = filedialog.asksaveasfilename(defaultextension=".csv",
+                                                filetypes=export_filetypes(".csv") + export_filetypes(".json"))
+        if filename:
+            try:
+                stats = export_changes(entity, filename)
+                messagebox.showinfo("Успех", f"Добавлено: {stats['inserted']}, изменено: {stats['updated']}, "
+                                             f"удалено: {stats['deleted']}")
+            except Exception as e:
+                messagebox.showerror("Ошибка", str(e))
+
     def import_from_file(self, import_func):
         """Общий метод для импорта с выбором файла."""
         filename = filedialog.askopenfilename()
         if filename:
             try:
-                import_func(filename)
-                messagebox.showinfo("Успех", "Импорт завершен")
-                self.update_all_tables()
+                stats = import_func(filename)
+                message = "Импорт завершен"
+                if isinstance(stats, dict):
+                    message += (f"\nДобавлено: {stats['inserted']}, обновлено: {stats['updated']}, "
+                                f"без изменений: {stats['unchanged']}")
+                messagebox.showinfo("Успех", message)
             except Exception as e:
                 messagebox.showerror("Ошибка", str(e))
 
-    def update_all_tables(self):
-        """Обновить все таблицы после импорта."""
-        self.update_clients_table()
-        self.update_products_table()
-        self.update_orders_table()
-        self.update_order_clients_table()
-        self.update_order_products_table()
+    def import_snapshot_file(self):
+        """Импорт снимка базы: заменяет все текущие данные, поэтому требует подтверждения."""
+        if messagebox.askyesno("Подтверждение", "Импорт снимка заменит все текущие данные. Продолжить?"):
+            self.import_from_file(import_snapshot)
+
+    def on_close(self):
+        """Закрыть окно, остановив расчеты и выполнив обслуживание базы (PRAGMA optimize и очистку по порогам)."""
+        self.runner.cancel_all()
+        if self.snapshot_refresh_id is not None:
+            self.root.after_cancel(self.snapshot_refresh_id)
+        shutdown_maintenance()
+        self.root.destroy()
+
+    def backup_database(self):
+        """Снять горячую копию базы в каталог по умолчанию (с ротацией)."""
+        try:
+            result = create_backup()
+            messagebox.showinfo("Успех", f"Копия сохранена: {result['path']}")
+        except Exception as e:
+            messagebox.showerror("Ошибка", str(e))
+
+    def restore_database(self):
+        """Восстановить базу из выбранной копии; текущее состояние сохраняется отдельной копией."""
+        filename = filedialog.askopenfilename(initialdir=default_backup_dir(), filetypes=[("База SQLite", "*.db")])
+        if filename and messagebox.askyesno("Подтверждение", "Восстановление заменит все текущие данные. Продолжить?"):
+            try:
+                safety = restore_backup(filename)
+                messagebox.showinfo("Успех", f"База восстановлена. Прежнее состояние: {safety}")
+            except Exception as e:
+                messagebox.showerror("Ошибка", str(e))
 
     def save_client(self):
         """Сохранить или обновить клиента."""
@@ -337,11 +780,10 @@ class OrderManagementApp:
                 messagebox.showinfo("Успех", "Клиент добавлен")
 
             self.clear_client_form()
-            self.update_clients_table()
-            self.update_order_clients_table()
-            self.update_orders_table()
         except ValueError as e:
             messagebox.showerror("Ошибка", str(e))
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Ошибка", "Клиент с таким email уже существует")
 
     def load_selected_client(self):
         """Загрузить выбранного клиента в форму для редактирования."""
@@ -371,9 +813,6 @@ class OrderManagementApp:
                 delete_client(client_id)
                 reindex_clients()
                 messagebox.showinfo("Успех", "Клиент удален")
-                self.update_clients_table()
-                self.update_order_clients_table()
-                self.update_orders_table()
             except sqlite3.IntegrityError:
                 messagebox.showerror("Ошибка", "Нельзя удалить клиента с заказами")
 
@@ -391,8 +830,9 @@ class OrderManagementApp:
             price = float(self.product_price.get())
             category = self.product_category.get()
             quantity = int(self.product_quantity.get())
+            threshold = int(self.product_threshold.get() or 0)
 
-            product = Product(name, price, category, quantity)
+            product = Product(name, price, category, quantity, threshold)
             if self.editing_product_id:
                 product.id = self.editing_product_id
                 update_product(product)
@@ -403,10 +843,10 @@ class OrderManagementApp:
                 messagebox.showinfo("Успех", "Товар добавлен")
 
             self.clear_product_form()
-            self.update_products_table()
-            self.update_order_products_table()
         except ValueError:
             messagebox.showerror("Ошибка", "Неверные данные")
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Ошибка", "Товар с таким названием и категорией уже существует")
 
     def load_selected_product(self):
         """Загрузить выбранный товар в форму для редактирования."""
@@ -424,6 +864,8 @@ class OrderManagementApp:
                 self.product_category.insert(0, product.category)
                 self.product_quantity.delete(0, tk.END)
                 self.product_quantity.insert(0, str(product.quantity))
+                self.product_threshold.delete(0, tk.END)
+                self.product_threshold.insert(0, str(product.reorder_threshold))
                 self.editing_product_id = product.id
 
     def delete_selected_product(self):
@@ -436,9 +878,6 @@ class OrderManagementApp:
                 delete_product(product_id)
                 reindex_products()
                 messagebox.showinfo("Успех", "Товар удален")
-                self.update_products_table()
-                self.update_order_products_table()
-                self.update_orders_table()
             except sqlite3.IntegrityError:
                 messagebox.showerror("Ошибка", "Нельзя удалить товар с заказами")
 
@@ -448,6 +887,7 @@ class OrderManagementApp:
         self.product_price.delete(0, tk.END)
         self.product_category.delete(0, tk.END)
         self.product_quantity.delete(0, tk.END)
+        self.product_threshold.delete(0, tk.END)
 
     def save_order(self):
         """Сохранить новый заказ."""
@@ -472,10 +912,6 @@ class OrderManagementApp:
             add_order(order)
             messagebox.showinfo("Успех", "Заказ добавлен")
 
-            self.update_orders_table()
-            self.update_products_table()
-            self.update_order_products_table()
-
             # Сброс выбора
             self.selected_client = None
             self.selected_products = []
@@ -502,48 +938,47 @@ class OrderManagementApp:
             product = get_product_by_id(product_id)
             if product:
                 self.selected_products.append(product)
+        related = get_related_products([product.id for product in self.selected_products])
+        self.order_suggestions.config(text="С этим покупают: " + ", ".join(f"{name} (ID {pid})" for pid, name, _ in related)
+                                      if related else "")
 
     def update_clients_table(self):
         """Обновить таблицу клиентов с фильтром."""
-        filter_text = self.client_filter.get().lower()
-        self.clients_tree.delete(*self.clients_tree.get_children())
-        clients = get_all_clients()
-        for client in clients:
-            if filter_text in client.name.lower():
-                self.clients_tree.insert('', 'end', values=(client.id, client.name, client.email, client.phone, client.address))
+        segment = self.client_segment.get()
+        segment_ids = get_segment_client_ids(segment) if segment in SEGMENTS else None
+        clients = self.clients_index.search(self.client_filter.get())
+        self.clients_model.set_rows([(client.id, client.name, client.email, client.phone, client.address)
+                                     for client in clients if segment_ids is None or client.id in segment_ids])
+        self.clients_model.populate(self.clients_tree)
 
     def update_products_table(self):
         """Обновить таблицу товаров с фильтром."""
-        filter_text = self.product_filter.get().lower()
-        self.products_tree.delete(*self.products_tree.get_children())
-        products = get_all_products()
-        for product in products:
-            if filter_text in product.name.lower():
-                self.products_tree.insert('', 'end', values=(product.id, product.name, product.price, product.category, product.quantity))
+        products = self.products_index.search(self.product_filter.get())
+        self.products_model.set_rows([(product.id, product.name, product.price, product.category, product.quantity,
+                                       product.reorder_threshold) for product in products])
+        self.products_model.populate(self.products_tree)
 
     def update_orders_table(self):
         """Обновить таблицу заказов с сортировкой и фильтром."""
         filter_date = self.order_filter.get()
         self.orders_tree.delete(*self.orders_tree.get_children())
-        orders = get_all_orders()
         if filter_date:
             try:
                 filter_dt = datetime.date.fromisoformat(filter_date)
-                orders = [o for o in orders if o.date == filter_dt]
             except ValueError:
                 messagebox.showerror("Ошибка", "Неверный формат даты")
                 return
-
-        # Сортировка по дате с использованием quicksort
-        sorted_orders = self.quicksort_orders(orders, key=lambda o: o.date)
-
-        for order in sorted_orders:
-            if order.client is None:
-                client_name = "Неизвестный"
-            else:
-                client_name = order.client.name
-            product_str = ', '.join(f"{item.product.name} x {item.quantity}" for item in order.items if item.product)
-            self.orders_tree.insert('', 'end', values=(order.id, client_name, str(order.date), order.calculate_total(), product_str))
+            # Фильтр выполняется в запросе; для старых дат автоматически подключается архив
+            summaries = get_order_summaries(date_from=filter_dt, date_to=filter_dt)
+        else:
+            summaries = get_order_summaries()
+
+        # Строки готовы в базе (представление order_summaries): объекты Order не собираются
+        rows = [(order_id, client_name or "Неизвестный", date, total, products)
+                for order_id, _, client_name, date, total, _, products in summaries]
+        # Сортировка по выбранным столбцам (по умолчанию по дате)
+        self.orders_model.set_rows(rows)
+        self.orders_model.populate(self.orders_tree)
 
     def delete_selected_order(self):
         """Удалить выбранный заказ."""
@@ -554,43 +989,34 @@ class OrderManagementApp:
             delete_order(order_id)
             reindex_orders()
             messagebox.showinfo("Успех", "Заказ удален")
-            self.update_orders_table()
 
     def update_order_clients_table(self):
         """Обновить таблицу клиентов для заказа."""
         self.order_clients_tree.delete(*self.order_clients_tree.get_children())
-        clients = get_all_clients()
+        clients = self.clients_index.search(self.order_client_filter.get())
         for client in clients:
             self.order_clients_tree.insert('', 'end', values=(client.id, client.name, client.email))
 
     def update_order_products_table(self):
         """Обновить таблицу товаров для заказа."""
         self.order_products_tree.delete(*self.order_products_tree.get_children())
-        products = get_all_products()
+        products = self.products_index.search()
         for product in products:
             self.order_products_tree.insert('', 'end', values=(product.id, product.name, product.price, product.quantity))
 
-    def quicksort_orders(self, orders: List[Order], key) -> List[Order]:
-        """Рекурсивная быстрая сортировка для заказов."""
-        if len(orders) <= 1:
-            return orders
-        pivot = orders[len(orders) // 2]
-        left = [o for o in orders if key(o) < key(pivot)]
-        middle = [o for o in orders if key(o) == key(pivot)]
-        right = [o for o in orders if key(o) > key(pivot)]
-        return self.quicksort_orders(left, key) + middle + self.quicksort_orders(right, key)
-
-    def sort_treeview(self, tree, col, descending):
-        """Сортировка Treeview по колонке."""
-        data = [(tree.set(item, col), item) for item in tree.get_children('')]
-        # Попытка сортировать как числа, если возможно
-        try:
-            data.sort(key=lambda t: float(t[0]), reverse=descending)
-        except ValueError:
-            data.sort(key=lambda t: t[0], reverse=descending)
-
-        for index, (val, item) in enumerate(data):
-            tree.move(item, '', index)
-
-        # Переключить направление сортировки
-        tree.heading(col, command=lambda: self.sort_treeview(tree, col, not descending))
\ No newline at end of file
+    def setup_sorting(self, tree, columns, sort_order=None) -> TableModel:
+        """Подключить к Treeview модель сортировки: щелчок по заголовку — сортировка, Shift+щелчок — добавить столбец."""
+        model = TableModel(columns, sort_order)
+        for name, _ in columns:
+            tree.heading(name, text=model.heading_text(name))
+        tree.bind('<Button-1>', lambda event: self.on_heading_click(tree, model, event), add='+')
+        return model
+
+    def on_heading_click(self, tree, model: TableModel, event):
+        """Отсортировать таблицу по столбцу, на заголовке которого щелкнули."""
+        if tree.identify_region(event.x, event.y) != 'heading':
+            return None
+        column = model.columns[int(tree.identify_column(event.x).lstrip('#')) - 1]
+        model.toggle_sort(column, add=bool(event.state & 0x0001))  # 0x0001 — нажат Shift
+        model.populate(tree)
+        return 'break'
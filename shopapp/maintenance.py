@@ -0,0 +1,114 @@
+"""
+Модуль обслуживания базы: обновление статистики планировщика и возврат свободного места.
+База работает в режиме auto_vacuum=INCREMENTAL (миграция в db.init_db): страницы,
+освободившиеся после удалений, возвращаются порциями PRAGMA incremental_vacuum, когда
+их доля превышает порог; ANALYZE запускается после заданного числа изменений строк
+(счетчик — сумма data_versions). PRAGMA optimize выполняется при завершении приложения.
+"""
+
+import os
+import time
+from typing import Optional
+import db
+
+FREE_PAGE_RATIO = 0.10   # Доля свободных страниц, после которой запускается инкрементальная очистка
+FREE_PAGES_MIN = 64      # ...но не меньше стольких свободных страниц
+ANALYZE_CHANGES = 1000   # Изменений строк с прошлого ANALYZE, после которых статистика обновляется
+
+def _file_size() -> int:
+    """Размер базы на диске вместе с журналом WAL; для базы в памяти — занятые страницы."""
+    path = db.database().path
+    if path is None:
+        conn = db.connect()
+        size = conn.execute('PRAGMA page_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+        conn.close()
+        return size
+    return sum(os.path.getsize(name) for name in (path, path + '-wal') if os.path.exists(name))
+
+def _changes(cursor) -> int:
+    """Счетчик изменений строк: сумма версий данных (растет на каждую измененную строку)."""
+    return cursor.execute('SELECT COALESCE(SUM(version), 0) FROM data_versions').fetchone()[0]
+
+def _analyzed_at(cursor) -> int:
+    row = cursor.execute("SELECT value FROM maintenance_meta WHERE key = 'analyzed_changes'").fetchone()
+    return int(row[0]) if row else 0
+
+def database_stats() -> dict:
+    """
+    Состояние базы для решения об обслуживании.
+
+    Возвращает словарь: page_size, page_count, freelist_count, auto_vacuum (0 — нет,
+    1 — полный, 2 — инкрементальный), size (байт) и changes_since_analyze.
+    """
+    conn = db.connect()
+    cursor = conn.cursor()
+    try:
+        stats = {pragma: cursor.execute(f'PRAGMA {pragma}').fetchone()[0]
+                 for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')}
+        stats['changes_since_analyze'] = _changes(cursor) - _analyzed_at(cursor)
+    finally:
+        conn.close()
+    stats['size'] = _file_size()
+    return stats
+
+@db.retry_on_busy
+def run_maintenance(force: bool = False, optimize: bool = True) -> dict:
+    """
+    Выполнить обслуживание, если превышены пороги.
+
+    Параметры
+    ----------
+    force : bool
+        Вернуть все свободные страницы и обновить статистику независимо от порогов.
+    optimize : bool
+        Выполнить PRAGMA optimize (дешево; рекомендуется перед закрытием приложения).
+
+    Возвращает отчет: vacuumed, analyzed, optimized (что выполнено), pages_freed,
+    bytes_reclaimed (изменение размера файла), size_before, size_after, seconds.
+    """
+    start = time.perf_counter()
+    size_before = _file_size()
+    conn = db.connect(isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        page_count = cursor.execute('PRAGMA page_count').fetchone()[0]
+        free = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        incremental = cursor.execute('PRAGMA auto_vacuum').fetchone()[0] == db.AUTO_VACUUM_INCREMENTAL
+        vacuumed = incremental and free > 0 and (
+            force or free >= max(FREE_PAGES_MIN, FREE_PAGE_RATIO * page_count))
+        if vacuumed:
+            cursor.executescript('PRAGMA incremental_vacuum')  # executescript шагает до конца: execute освободил бы одну страницу
+        pages_freed = free - cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        changes = _changes(cursor)
+        analyzed = force or changes - _analyzed_at(cursor) >= ANALYZE_CHANGES
+        if analyzed:
+            cursor.execute('ANALYZE')
+            cursor.execute("INSERT INTO maintenance_meta (key, value) VALUES ('analyzed_changes', ?) "
+                           "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (str(changes),))
+        if optimize:
+            cursor.execute('PRAGMA optimize')
+        if vacuumed:
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')  # Укоротить файл сразу, не дожидаясь контрольной точки
+    finally:
+        conn.close()
+    size_after = _file_size()
+    return {'vacuumed': vacuumed, 'analyzed': analyzed, 'optimized': optimize, 'pages_freed': pages_freed,
+            'bytes_reclaimed': size_before - size_after, 'size_before': size_before, 'size_after': size_after,
+            'seconds': time.perf_counter() - start}
+
+def format_report(report: dict) -> str:
+    """Отчет об обслуживании одной строкой для консоли и интерфейса."""
+    done = [name for key, name in (('vacuumed', "очистка"), ('analyzed', "статистика"), ('optimized', "optimize"))
+            if report[key]]
+    return (f"Выполнено: {', '.join(done) or 'ничего'}; освобождено страниц: {report['pages_freed']}, "
+            f"место: {report['bytes_reclaimed'] / 1024:.0f} КБ "
+            f"({report['size_before'] / 1024:.0f} -> {report['size_after'] / 1024:.0f} КБ) "
+            f"за {report['seconds']:.2f} с")
+
+def shutdown_maintenance() -> Optional[dict]:
+    """Обслуживание при завершении приложения: ошибки не должны мешать выходу."""
+    try:
+        return run_maintenance()
+    except Exception as e:
+        print(f"Обслуживание базы при выходе не выполнено: {e}")
+        return None
@@ -0,0 +1,173 @@
+"""
+Консольные команды обслуживания базы данных.
+
+Пример: `python manage.py rebuild-summaries`.
+"""
+
+import argparse
+import datetime
+import sys
+import time
+from db import rebuild_summaries, verify_summaries, configure_concurrency, use_database
+from archive import archive_orders
+from recommendations import build_recommendations
+from changes import export_changes, prune_changelog, DEFAULT_CONSUMER
+from maintenance import database_stats, format_report, run_maintenance
+from backup import BACKUP_KEEP, create_backup, list_backups, restore_backup, verify_backup
+from report_snapshot import refresh_snapshot
+
+def cmd_verify_summaries(args) -> int:
+    """Сверить сводные таблицы с исходными данными."""
+    mismatches = verify_summaries()
+    if not mismatches:
+        print("Сводные таблицы согласованы")
+        return 0
+    for table, count in mismatches.items():
+        print(f"{table}: расходящихся строк {count}")
+    return 1
+
+def cmd_rebuild_summaries(args) -> int:
+    """Пересчитать сводные таблицы с нуля."""
+    drift = rebuild_summaries()
+    if drift:
+        for table, count in drift.items():
+            print(f"{table}: исправлено строк {count}")
+    print("Сводные таблицы пересчитаны и согласованы")
+    return 0
+
+def cmd_archive_orders(args) -> int:
+    """Перенести старые заказы в архив."""
+    result = archive_orders(datetime.date.fromisoformat(args.before), args.path)
+    print(f"Перенесено заказов: {result['orders']}, позиций: {result['items']} за {result['seconds']:.2f} с")
+    return 0
+
+def cmd_build_recommendations(args) -> int:
+    """Пересчитать рекомендации «часто покупают вместе»."""
+    result = build_recommendations(args.top_k, args.min_together, args.include_archive)
+    print(f"Товаров с рекомендациями: {result['products']}, строк: {result['rows']} за {result['seconds']:.2f} с")
+    return 0
+
+def cmd_export_changes(args) -> int:
+    """Выгрузить изменения после водяного знака потребителя."""
+    stats = export_changes(args.entity, args.output, args.consumer, args.since)
+    print(f"Добавлено: {stats['inserted']}, изменено: {stats['updated']}, удалено: {stats['deleted']}, "
+          f"водяной знак: {stats['watermark']}")
+    return 0
+
+def cmd_prune_changelog(args) -> int:
+    """Удалить записи журнала, выгруженные всеми потребителями."""
+    print(f"Удалено записей журнала: {prune_changelog()}")
+    return 0
+
+def cmd_backup(args) -> int:
+    """Снять горячую копию базы с ротацией."""
+    result = create_backup(args.dir, args.keep)
+    print(f"Копия {result['path']}: {result['size'] / 1e6:.1f} МБ за {result['seconds']:.2f} с")
+    for path in result['removed']:
+        print(f"Удалена старая копия {path}")
+    return 0
+
+def cmd_list_backups(args) -> int:
+    """Показать копии базы, новые первыми."""
+    for backup in list_backups(args.dir):
+        print(f"{backup['created']:%Y-%m-%d %H:%M:%S}  {backup['size'] / 1e6:8.1f} МБ  {backup['path']}")
+    return 0
+
+def cmd_verify_backup(args) -> int:
+    """Проверить целостность копии."""
+    result = verify_backup(args.path)
+    print('\n'.join(result))
+    return 0 if result == ['ok'] else 1
+
+def cmd_restore_backup(args) -> int:
+    """Восстановить базу из копии."""
+    safety = restore_backup(args.path, safety_backup=not args.no_safety_backup)
+    print("База восстановлена" + (f", прежнее состояние сохранено в {safety}" if safety else ""))
+    return 0
+
+def cmd_maintenance(args) -> int:
+    """Обновить статистику и вернуть свободное место, если превышены пороги."""
+    stats = database_stats()
+    print(f"Страниц: {stats['page_count']}, свободных: {stats['freelist_count']}, "
+          f"изменений с прошлого ANALYZE: {stats['changes_since_analyze']}")
+    print(format_report(run_maintenance(force=args.force)))
+    return 0
+
+def cmd_snapshot(args) -> int:
+    """Обновить снимок для отчетов; с --every — повторять с периодом, пока процесс не остановят."""
+    while True:
+        result = refresh_snapshot(args.path, force=args.force)
+        if result is None:
+            print("Снимок актуален")
+        else:
+            print(f"Снимок {result['path']}: {result['size'] / 1e6:.1f} МБ за {result['seconds']:.2f} с")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+def cmd_journal_mode(args) -> int:
+    """Показать или сменить режим журнала базы."""
+    print(f"Режим журнала: {configure_concurrency(journal_mode=args.mode)}")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Обслуживание базы данных системы учета заказов")
+    parser.add_argument('--db', dest='db_name', help="Файл базы (по умолчанию SHOPAPP_DB или order_management.db)")
+    parser.add_argument('--busy-timeout', type=float, help="Ожидание чужой блокировки базы, с")
+    parser.add_argument('--retries', type=int, help="Повторов записи, если база осталась заблокированной")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('verify-summaries', help="Сверить сводные таблицы").set_defaults(func=cmd_verify_summaries)
+    commands.add_parser('rebuild-summaries', help="Пересчитать сводные таблицы").set_defaults(func=cmd_rebuild_summaries)
+    archive = commands.add_parser('archive-orders', help="Перенести заказы старше даты в архив")
+    archive.add_argument('--before', required=True, help="Граница YYYY-MM-DD: архивируются более ранние заказы")
+    archive.add_argument('--path', help="Файл архива")
+    archive.set_defaults(func=cmd_archive_orders)
+    recommend = commands.add_parser('build-recommendations', help="Пересчитать рекомендации товаров")
+    recommend.add_argument('--top-k', type=int, default=5, help="Рекомендаций на товар")
+    recommend.add_argument('--min-together', type=int, default=1, help="Минимум совместных заказов")
+    recommend.add_argument('--include-archive', action='store_true', help="Учитывать архив заказов")
+    recommend.set_defaults(func=cmd_build_recommendations)
+    delta = commands.add_parser('export-changes', help="Выгрузить изменения с прошлой выгрузки потребителя")
+    delta.add_argument('entity', choices=('clients', 'products', 'orders'))
+    delta.add_argument('output', help="Файл .csv или .json, можно сжатый (.csv.gz ...)")
+    delta.add_argument('--consumer', default=DEFAULT_CONSUMER, help="Имя потребителя (свой водяной знак)")
+    delta.add_argument('--since', type=int, help="Явный водяной знак вместо сохраненного")
+    delta.set_defaults(func=cmd_export_changes)
+    commands.add_parser('prune-changelog', help="Очистить выгруженную часть журнала изменений").set_defaults(
+        func=cmd_prune_changelog)
+    backup = commands.add_parser('backup', help="Снять горячую копию базы")
+    backup.add_argument('--dir', help="Каталог копий (по умолчанию рядом с базой)")
+    backup.add_argument('--keep', type=int, default=BACKUP_KEEP, help="Сколько последних копий хранить")
+    backup.set_defaults(func=cmd_backup)
+    backups = commands.add_parser('list-backups', help="Показать копии базы")
+    backups.add_argument('--dir', help="Каталог копий")
+    backups.set_defaults(func=cmd_list_backups)
+    verify = commands.add_parser('verify-backup', help="Проверить целостность копии")
+    verify.add_argument('path')
+    verify.set_defaults(func=cmd_verify_backup)
+    restore = commands.add_parser('restore-backup', help="Восстановить базу из копии")
+    restore.add_argument('path')
+    restore.add_argument('--no-safety-backup', action='store_true', help="Не сохранять текущее состояние перед восстановлением")
+    restore.set_defaults(func=cmd_restore_backup)
+    maintain = commands.add_parser('maintenance', help="ANALYZE, optimize и инкрементальная очистка по порогам")
+    maintain.add_argument('--force', action='store_true', help="Выполнить все независимо от порогов")
+    maintain.set_defaults(func=cmd_maintenance)
+    snapshot = commands.add_parser('snapshot', help="Обновить снимок базы для отчетов, если данные изменились")
+    snapshot.add_argument('--path', help="Файл снимка (по умолчанию рядом с базой)")
+    snapshot.add_argument('--force', action='store_true', help="Пересоздать снимок, даже если данные не менялись")
+    snapshot.add_argument('--every', type=float, help="Обновлять каждые N секунд")
+    snapshot.set_defaults(func=cmd_snapshot)
+    journal = commands.add_parser('journal-mode', help="Показать или сменить режим журнала (wal, delete ...)")
+    journal.add_argument('mode', nargs='?', help="Новый режим журнала")
+    journal.set_defaults(func=cmd_journal_mode)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.db_name:
+        use_database(args.db_name)
+    configure_concurrency(busy_timeout=args.busy_timeout, retries=args.retries)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
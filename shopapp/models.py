@@ -33,12 +33,14 @@ class Client(Person):
         return f"Клиент(ID={self.id}, Имя={self.name}, Email={self.email})"
 
 class Product:
-    def __init__(self, name: str, price: float, category: str = 'General', quantity: int = 0):
+    def __init__(self, name: str, price: float, category: str = 'General', quantity: int = 0,
+                 reorder_threshold: int = 0):
         self.id = None
         self.name = name
         self.price = price
         self.category = category
         self.quantity = quantity
+        self.reorder_threshold = reorder_threshold  # Остаток, при котором (и ниже) товар нужно дозаказать
 
     def __str__(self) -> str:
         return f"Товар(ID={self.id}, Название={self.name}, Цена={self.price}, Количество={self.quantity})"
@@ -0,0 +1,113 @@
+"""
+Модуль рекомендаций «часто покупают вместе».
+Разреженная матрица совместных покупок товар × товар строится одним запросом
+в формате COO (строка, столбец, значение), лучшие k соседей каждого товара
+отбираются векторно и сохраняются в таблицу product_recommendations.
+"""
+
+import time
+from typing import Iterable, List
+import numpy as np
+import db
+
+DEFAULT_TOP_K = 5  # Сколько рекомендаций хранить на товар
+
+def cooccurrence_matrix(include_archive: bool = False):
+    """
+    Построить разреженную матрицу совместных покупок.
+
+    Возвращает (rows, cols, together, frequency): для каждой ненулевой пары товаров (rows[i], cols[i])
+    число заказов together[i], где они куплены вместе, и массив frequency формы (n, 2)
+    с парами (product_id, число заказов с товаром), отсортированный по product_id.
+    Матрица симметрична, диагональ не хранится.
+    """
+    conn = db.connect()
+    cursor = conn.cursor()
+    archived = db._attach_archive(cursor, include_archive)
+    lines = db._union_source('order_products', 'order_id, product_id, quantity', archived)
+    summary = db._summary_source('sales_by_product', 'product_id', ('orders', 'quantity'), archived)
+    cursor.execute(f'SELECT product_id, orders FROM {summary} ORDER BY product_id')
+    frequency = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    cursor.execute(f'''
+        SELECT a.product_id, b.product_id, COUNT(*)
+        FROM {lines} a JOIN {lines} b ON b.order_id = a.order_id AND b.product_id != a.product_id
+        GROUP BY a.product_id, b.product_id''')
+    pairs = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+    conn.close()
+    rows, cols, together = pairs.T
+    return rows, cols, together, frequency
+
+def top_k_related(rows: np.ndarray, cols: np.ndarray, together: np.ndarray, frequency: np.ndarray,
+                  top_k: int = DEFAULT_TOP_K, min_together: int = 1):
+    """
+    Отобрать для каждого товара top_k соседей с наибольшей оценкой.
+
+    Оценка — косинусная мера together / sqrt(orders_a * orders_b), при равенстве выше пара
+    с большим числом совместных покупок. Возвращает (rows, ranks, cols, together, scores),
+    ранги начинаются с 1.
+    """
+    keep = together >= min_together
+    rows, cols, together = rows[keep], cols[keep], together[keep]
+    ids, orders = frequency[:, 0], frequency[:, 1].astype(np.float64)
+    denominator = np.sqrt(orders[np.searchsorted(ids, rows)] * orders[np.searchsorted(ids, cols)])
+    scores = np.divide(together, denominator, out=np.zeros(len(together)), where=denominator > 0)
+    order = np.lexsort((cols, -together, -scores, rows))
+    rows, cols, together, scores = rows[order], cols[order], together[order], scores[order]
+    _, starts, counts = np.unique(rows, return_index=True, return_counts=True)
+    ranks = np.arange(len(rows)) - np.repeat(starts, counts) + 1
+    best = ranks <= top_k
+    return rows[best], ranks[best], cols[best], together[best], scores[best]
+
+@db.retry_on_busy
+def _store_recommendations(related: tuple):
+    """Заменить таблицу рекомендаций строками (product_id, rank, related_id, together, score)."""
+    conn = db.connect(write=True)
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM product_recommendations')
+    cursor.executemany('INSERT INTO product_recommendations (product_id, rank, related_id, together, score) '
+                       'VALUES (?, ?, ?, ?, ?)', zip(*(column.tolist() for column in related)))
+    conn.commit()
+    conn.close()
+
+def build_recommendations(top_k: int = DEFAULT_TOP_K, min_together: int = 1, include_archive: bool = False) -> dict:
+    """
+    Пересчитать таблицу рекомендаций.
+
+    Параметры
+    ----------
+    top_k : int
+        Сколько рекомендаций хранить на товар.
+    min_together : int
+        Минимальное число совместных заказов для рекомендации.
+    include_archive : bool
+        Учитывать заказы из архива.
+
+    Возвращает словарь: products (товаров с рекомендациями), rows (записано строк), seconds.
+    """
+    start = time.perf_counter()
+    related = top_k_related(*cooccurrence_matrix(include_archive), top_k=top_k, min_together=min_together)
+    _store_recommendations(related)
+    return {'products': len(np.unique(related[0])), 'rows': len(related[0]), 'seconds': time.perf_counter() - start}
+
+def get_related_products(product_ids: Iterable[int], limit: int = DEFAULT_TOP_K) -> List[tuple]:
+    """
+    Получить рекомендации к набору товаров: (product_id, name, score), по убыванию оценки.
+
+    Оценки соседей нескольких товаров суммируются; сами товары набора и удаленные товары не предлагаются.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    placeholders = ', '.join('?' * len(product_ids))
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT r.related_id, p.name, SUM(r.score) AS score
+        FROM product_recommendations r JOIN products p ON p.id = r.related_id
+        WHERE r.product_id IN ({placeholders}) AND r.related_id NOT IN ({placeholders})
+        GROUP BY r.related_id
+        ORDER BY score DESC, r.related_id
+        LIMIT ?''', (*product_ids, *product_ids, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
@@ -0,0 +1,98 @@
+"""
+Модуль снимка базы для отчетов.
+Снимок — копия рабочей базы на один момент времени (SQLite backup API), которая
+открывается только для чтения с immutable=1: SQLite не берет блокировок, не читает
+журнал и -shm, а страницы читает через mmap. Отчеты (analysis.py, charts.py) и экспорт
+db.py внутри reading_snapshot() работают со снимком и не мешают записи в рабочую базу.
+Снимок обновляется refresh_snapshot() по расписанию: из интерфейса, `manage.py snapshot --every`
+или планировщиком ОС; пока данные не менялись, копия не пересоздается.
+"""
+
+import contextlib
+import os
+import time
+import urllib.request
+from typing import Optional
+import db
+from events import ENTITIES
+
+SNAPSHOT_MMAP_SIZE = 256 * 1024 * 1024  # PRAGMA mmap_size соединений снимка, байт
+REFRESH_INTERVAL = 300.0                # Период обновления снимка по умолчанию, с
+
+def default_snapshot_path() -> str:
+    """Файл снимка по умолчанию: рядом с рабочей базой, с суффиксом _snapshot."""
+    path = db.database().path
+    if path is None:
+        raise ValueError("У базы в памяти нет файла снимка по умолчанию, укажите path")
+    return os.path.splitext(path)[0] + '_snapshot.db'
+
+def snapshot_uri(path: Optional[str] = None) -> str:
+    """URI снимка только для чтения без блокировок (mode=ro&immutable=1)."""
+    path = os.path.abspath(path or default_snapshot_path())
+    return f'file:{urllib.request.pathname2url(path)}?mode=ro&immutable=1'
+
+def create_snapshot(path: Optional[str] = None) -> dict:
+    """
+    Снять снимок рабочей базы.
+
+    Копия делается одним шагом backup API внутри одной транзакции чтения, поэтому соответствует
+    одному состоянию базы; в режиме WAL запись в это время не останавливается. Снимок пишется
+    во временный файл и подменяет прежний атомарно (os.replace): соединения, открытые
+    со старым снимком, дочитывают его (на Windows подмена ждет их закрытия).
+    Архив заказов (archive.py) в снимок не входит и читается из своего файла.
+
+    Возвращает словарь: path, pages, size, seconds.
+    """
+    start = time.perf_counter()
+    path = os.path.abspath(path or default_snapshot_path())
+    partial = f'{path}.{os.getpid()}.part'  # Свой файл у каждого процесса: обновления не пишут в один файл
+    source = db.connect()
+    target = db.connect(partial)
+    try:
+        source.backup(target)
+        # immutable=1 не читает журнал WAL, поэтому снимок — один самодостаточный файл
+        target.execute('PRAGMA journal_mode = DELETE')
+        pages = target.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    try:
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {'path': path, 'pages': pages, 'size': os.path.getsize(path), 'seconds': time.perf_counter() - start}
+
+def snapshot_versions(path: Optional[str] = None) -> Optional[tuple]:
+    """Версии данных (ENTITIES) на момент снимка; None, если снимка нет."""
+    path = path or default_snapshot_path()
+    if not os.path.exists(path):
+        return None
+    with db.reading_from(snapshot_uri(path)):
+        return db.get_data_version(*ENTITIES)
+
+def is_stale(path: Optional[str] = None) -> bool:
+    """Снимка нет или рабочая база изменилась после него."""
+    versions = snapshot_versions(path)
+    return versions is None or versions != db.get_data_version(*ENTITIES)
+
+def refresh_snapshot(path: Optional[str] = None, force: bool = False) -> Optional[dict]:
+    """Пересоздать снимок, если он устарел (или всегда при force). None — снимок актуален."""
+    if not force and not is_stale(path):
+        return None
+    return create_snapshot(path)
+
+@contextlib.contextmanager
+def reading_snapshot(path: Optional[str] = None):
+    """
+    Читать снимок вместо рабочей базы внутри блока (в текущем потоке), например:
+    `with reading_snapshot(): analysis.load_line_items()`.
+
+    Если снимка еще нет, он создается. Запись внутри блока завершится ошибкой
+    «attempt to write a readonly database».
+    """
+    path = path or default_snapshot_path()
+    if not os.path.exists(path):
+        create_snapshot(path)
+    with db.reading_from(snapshot_uri(path), SNAPSHOT_MMAP_SIZE) as context:
+        yield context
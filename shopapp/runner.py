@@ -0,0 +1,190 @@
+"""
+Модуль выполнения тяжелых отчетов в отдельных процессах.
+Расчеты pandas/networkx держат GIL, поэтому поток не разгрузил бы интерфейс: каждое
+задание выполняется в своем процессе (одновременно не больше workers, по умолчанию по
+числу ядер), а в интерфейс по каналу (Pipe) возвращаются только данные отчета.
+Процесс можно остановить в любой момент, поэтому у заданий есть отмена и таймаут.
+Обработчики результатов вызываются из poll() или wait() в потоке владельца;
+интерфейс Tk вызывает poll() через after каждые POLL_INTERVAL_MS.
+"""
+
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait as wait_connections
+from typing import Callable, List, Optional
+import db
+
+JOB_TIMEOUT = 120.0    # Таймаут задания по умолчанию, с
+POLL_INTERVAL_MS = 100  # Период опроса из интерфейса
+PRELOAD_MODULES = ['charts', 'forecasting', 'recommendations']  # Импортируются один раз в forkserver
+
+def _run_job(conn, target: str, func, args: tuple, kwargs: dict):
+    """Тело рабочего процесса: подключиться к той же базе, выполнить func и отправить результат."""
+    try:
+        db.use_database(target, initialize=False)
+        result = (True, func(*args, **kwargs))
+    except BaseException as e:
+        result = (False, e)
+    try:
+        conn.send(result)
+    except Exception:  # Результат или исключение не сериализуются
+        conn.send((False, RuntimeError(traceback.format_exc())))
+    conn.close()
+
+class Job:
+    """
+    Задание runner: функция с аргументами, обработчики и состояние.
+
+    state: 'pending' (в очереди), 'running', 'done', 'failed', 'timeout' или 'cancelled'.
+    После завершения result содержит результат, error — исключение.
+    """
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, timeout: float,
+                 on_done: Optional[Callable] = None, on_error: Optional[Callable] = None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.on_done = on_done
+        self.on_error = on_error
+        self.target = db.database().target  # База на момент постановки (с учетом db.reading_from)
+        self.state = 'pending'
+        self.result = None
+        self.error = None
+        self.process = None
+        self.conn = None
+        self.deadline = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state not in ('pending', 'running')
+
+class AnalysisRunner:
+    """
+    Очередь заданий, каждое из которых выполняется в отдельном процессе.
+
+    Параметры
+    ----------
+    workers : int, optional
+        Сколько заданий выполнять одновременно; по умолчанию по числу ядер.
+    timeout : float
+        Таймаут задания по умолчанию, с.
+    start_method : str, optional
+        Способ запуска процессов multiprocessing. По умолчанию forkserver, где он есть
+        (быстрый старт без копирования потоков и состояния Tk), иначе spawn.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: float = JOB_TIMEOUT,
+                 start_method: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            self._context.set_forkserver_preload(PRELOAD_MODULES)
+        self._pending: List[Job] = []
+        self._running: List[Job] = []
+
+    def submit(self, func: Callable, *args, timeout: Optional[float] = None, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, **kwargs) -> Job:
+        """
+        Поставить задание в очередь.
+
+        Параметры
+        ----------
+        func : callable
+            Функция уровня модуля (передается в процесс по имени); результат должен сериализоваться.
+        timeout : float, optional
+            Таймаут этого задания, с; отсчитывается от запуска процесса.
+        on_done, on_error : callable, optional
+            Вызываются с результатом или исключением (TimeoutError при таймауте). При отмене не вызываются.
+        """
+        if db.database().in_memory:
+            raise ValueError("База в памяти недоступна другим процессам")
+        job = Job(func, args, kwargs, self.timeout if timeout is None else timeout, on_done, on_error)
+        self._pending.append(job)
+        self._start_pending()
+        return job
+
+    def _start_pending(self):
+        while self._pending and len(self._running) < self.workers:
+            job = self._pending.pop(0)
+            receiver, sender = self._context.Pipe(duplex=False)
+            job.process = self._context.Process(target=_run_job, daemon=True,
+                                                args=(sender, job.target, job.func, job.args, job.kwargs))
+            job.process.start()
+            sender.close()
+            job.conn = receiver
+            job.deadline = time.monotonic() + job.timeout
+            job.state = 'running'
+            self._running.append(job)
+
+    def _finish(self, job: Job, state: str, value):
+        self._running.remove(job)
+        job.conn.close()
+        if state == 'done':
+            job.process.join(1)
+        if job.process.is_alive():
+            job.process.terminate()
+        job.process.join()
+        job.state = state
+        if state == 'done':
+            job.result = value
+            callback = job.on_done
+        else:
+            job.error = value
+            callback = job.on_error if state != 'cancelled' else None
+        if callback is not None:
+            callback(value)
+
+    def poll(self) -> int:
+        """Принять готовые результаты, остановить просроченные задания; вернуть число незавершенных."""
+        for job in list(self._running):
+            if job.conn.poll():
+                try:
+                    ok, value = job.conn.recv()
+                except EOFError:
+                    job.process.join()
+                    ok, value = False, RuntimeError(
+                        f"Процесс анализа завершился без результата (код {job.process.exitcode})")
+                self._finish(job, 'done' if ok else 'failed', value)
+            elif time.monotonic() >= job.deadline:
+                self._finish(job, 'timeout', TimeoutError(f"Задание не уложилось в {job.timeout:g} с"))
+        self._start_pending()
+        return len(self._pending) + len(self._running)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться завершения всех заданий (для консоли и тестов); False, если истек timeout."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while self.poll():
+            now = time.monotonic()
+            if end is not None and now >= end:
+                return False
+            limit = min(job.deadline for job in self._running)
+            if end is not None:
+                limit = min(limit, end)
+            wait_connections([job.conn for job in self._running], max(0.0, limit - now))
+        return True
+
+    def cancel(self, job: Job) -> bool:
+        """Отменить задание: убрать из очереди или остановить его процесс. False, если оно уже завершено."""
+        if job in self._pending:
+            self._pending.remove(job)
+            job.state = 'cancelled'
+            return True
+        if job in self._running:
+            self._finish(job, 'cancelled', None)
+            self._start_pending()
+            return True
+        return False
+
+    def cancel_all(self):
+        """Отменить все задания (например, при закрытии окна)."""
+        for job in self._pending + self._running:
+            self.cancel(job)
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._running)
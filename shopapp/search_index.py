@@ -0,0 +1,138 @@
+"""
+Модуль поиска по префиксу в памяти для живых фильтров интерфейса.
+Ключи (слова имени, email и т.п.) хранятся в отсортированном списке,
+поиск — двоичный (bisect) по префиксу; индекс обновляется по событиям слоя данных.
+"""
+
+import bisect
+import re
+from typing import Callable, Iterable, List, Optional
+from events import ChangeEvent, subscribe, unsubscribe
+
+_WORD = re.compile(r'\w+')
+
+def text_keys(*values: Optional[str]) -> set:
+    """Ключи поиска по строкам: строка целиком и каждое слово, в нижнем регистре."""
+    keys = set()
+    for value in values:
+        if value:
+            value = value.lower()
+            keys.add(value)
+            keys.update(_WORD.findall(value))
+    return keys
+
+class PrefixIndex:
+    """
+    Отсортированный индекс ключей для поиска записей по префиксу.
+
+    Параметры
+    ----------
+    key_func : callable
+        Функция записи, возвращающая ключи поиска (строки в нижнем регистре).
+    id_func : callable
+        Функция записи, возвращающая ее ID.
+    """
+
+    def __init__(self, key_func: Callable[[object], Iterable[str]], id_func: Callable[[object], int] = lambda r: r.id):
+        self.key_func = key_func
+        self.id_func = id_func
+        self._records = {}  # ID -> запись, в порядке добавления (обычно по возрастанию ID)
+        self._keys = {}     # ID -> ключи записи
+        self._entries = []  # Отсортированный список (ключ, ID)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def rebuild(self, records: Iterable[object]):
+        """Построить индекс заново по всем записям (одна сортировка вместо вставок)."""
+        self._records = {self.id_func(record): record for record in records}
+        self._keys = {record_id: set(self.key_func(record)) for record_id, record in self._records.items()}
+        self._entries = sorted((key, record_id) for record_id, keys in self._keys.items() for key in keys)
+
+    def _remove_keys(self, record_id: int):
+        for key in self._keys.pop(record_id, ()):
+            position = bisect.bisect_left(self._entries, (key, record_id))
+            if position < len(self._entries) and self._entries[position] == (key, record_id):
+                del self._entries[position]
+
+    def add(self, record: object):
+        """Добавить или обновить запись."""
+        record_id = self.id_func(record)
+        self._remove_keys(record_id)
+        self._records[record_id] = record  # Обновление сохраняет позицию записи
+        keys = set(self.key_func(record))
+        self._keys[record_id] = keys
+        for key in keys:
+            bisect.insort(self._entries, (key, record_id))
+
+    def discard(self, record_id: int):
+        """Удалить запись, если она есть."""
+        self._remove_keys(record_id)
+        self._records.pop(record_id, None)
+
+    def search(self, prefix: str = '', limit: Optional[int] = None) -> List[object]:
+        """
+        Найти записи, у которых какой-либо ключ начинается с prefix (без учета регистра).
+
+        Пустой prefix возвращает все записи. Результат упорядочен по ID;
+        limit ограничивает число найденных записей.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            records = list(self._records.values())
+            return records if limit is None else records[:limit]
+        found = set()
+        position = bisect.bisect_left(self._entries, (prefix,))
+        while position < len(self._entries):
+            key, record_id = self._entries[position]
+            if not key.startswith(prefix):
+                break
+            found.add(record_id)
+            if limit is not None and len(found) >= limit:
+                break
+            position += 1
+        return [self._records[record_id] for record_id in sorted(found)]
+
+class LiveIndex(PrefixIndex):
+    """
+    Индекс сущности, синхронизируемый с базой через шину событий.
+
+    Вставки и изменения дочитываются по ID (load_one), удаления убираются из индекса,
+    перенумерация и массовый импорт помечают индекс устаревшим: он перестраивается
+    через load_all при следующем поиске.
+    """
+
+    def __init__(self, entity: str, load_all: Callable[[], Iterable[object]],
+                 load_one: Callable[[int], Optional[object]], key_func: Callable[[object], Iterable[str]]):
+        super().__init__(key_func)
+        self.load_all = load_all
+        self.load_one = load_one
+        self._stale = True
+        self._token = subscribe(self._on_change, entity)
+
+    def _on_change(self, event: ChangeEvent):
+        if self._stale:
+            return
+        if event.operation in ('reindex', 'import') or not event.ids:
+            self._stale = True
+            return
+        for record_id in event.ids:
+            record = self.load_one(record_id) if event.operation != 'delete' else None
+            if record is None:
+                self.discard(record_id)
+            else:
+                self.add(record)
+
+    def search(self, prefix: str = '', limit: Optional[int] = None) -> List[object]:
+        if self._stale:
+            self.rebuild(self.load_all())
+            self._stale = False
+        return super().search(prefix, limit)
+
+    def invalidate(self):
+        """Пометить индекс устаревшим (например, если базу меняли другие процессы)."""
+        self._stale = True
+
+    def close(self):
+        """Отписаться от событий."""
+        unsubscribe(self._token)
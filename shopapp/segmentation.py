@@ -0,0 +1,133 @@
+"""
+Модуль RFM-сегментации клиентов (давность, частота и сумма покупок).
+Показатели всех клиентов читаются одним агрегирующим запросом порциями в массивы NumPy,
+баллы 1-5 выставляются векторно по квинтилям. Результат кэшируется до изменения данных.
+"""
+
+import datetime
+import threading
+from typing import Optional
+import numpy as np
+import pandas as pd
+import db
+
+RFM_CHUNK = 100_000  # Строк за одно чтение из курсора
+
+# Сегменты по баллам давности (R) и частоты (F): (название, (R от, R до), (F от, F до)).
+# Правила проверяются по порядку, клиент получает первый подходящий сегмент.
+SEGMENT_RULES = [
+    ('Чемпионы', (4, 5), (4, 5)),
+    ('Лояльные', (3, 5), (4, 5)),
+    ('Новые', (4, 5), (1, 1)),
+    ('Перспективные', (3, 5), (1, 3)),
+    ('Под угрозой', (1, 2), (3, 5)),
+    ('Спящие', (1, 2), (1, 2)),
+]
+NO_ORDERS = 'Без заказов'  # Сегмент клиентов без заказов
+SEGMENTS = [name for name, _, _ in SEGMENT_RULES] + [NO_ORDERS]
+
+_cache = {}  # (база, reference_date, include_archive) -> (версия данных, DataFrame)
+_cache_lock = threading.Lock()
+
+def _read_metrics(include_archive: bool, chunk_size: int) -> dict:
+    """Прочитать по каждому клиенту дату последнего заказа, число заказов и выручку."""
+    conn = db.connect()
+    cursor = conn.cursor()
+    archived = db._attach_archive(cursor, include_archive)
+    summary = db._summary_source('sales_by_client', 'client_id', ('orders', 'items', 'revenue'), archived)
+    orders = db._union_source('orders', 'id, client_id, date', archived)
+    count = cursor.execute('SELECT COUNT(*) FROM clients').fetchone()[0]
+    metrics = {
+        'client_id': np.empty(count, dtype=np.int64),
+        'name': np.empty(count, dtype=object),
+        'last_order': np.empty(count, dtype='datetime64[D]'),
+        'frequency': np.empty(count, dtype=np.int64),
+        'monetary': np.empty(count, dtype=np.float64),
+    }
+    cursor.execute(f'''
+        SELECT c.id, c.name, r.last_order, COALESCE(s.orders, 0), COALESCE(s.revenue, 0)
+        FROM clients c
+        LEFT JOIN {summary} s ON s.client_id = c.id
+        LEFT JOIN (SELECT client_id, MAX(date) AS last_order FROM {orders} GROUP BY client_id) r
+            ON r.client_id = c.id
+        ORDER BY c.id''')
+    position = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        columns = list(zip(*rows))
+        end = position + len(rows)
+        for (name, array), column in zip(metrics.items(), columns):
+            array[position:end] = np.array(column, dtype=array.dtype)
+        position = end
+    conn.close()
+    return {name: array[:position] for name, array in metrics.items()}
+
+def _quintile_scores(values: np.ndarray, higher_is_better: bool = True) -> np.ndarray:
+    """Баллы 1-5 по квинтилям: 5 у лучших 20% значений."""
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    edges = np.quantile(values, [0.2, 0.4, 0.6, 0.8])
+    below = np.searchsorted(edges, values, side='left')  # Число границ строго меньше значения
+    return below + 1 if higher_is_better else 5 - below
+
+def compute_rfm(reference_date: Optional[datetime.date] = None, include_archive: bool = False,
+                chunk_size: int = RFM_CHUNK) -> pd.DataFrame:
+    """
+    Рассчитать RFM-показатели и сегменты всех клиентов.
+
+    Параметры
+    ----------
+    reference_date : datetime.date, optional
+        Дата, от которой считается давность. По умолчанию сегодня.
+    include_archive : bool
+        Учитывать заказы из архива.
+    chunk_size : int
+        Сколько строк читать из базы за раз.
+
+    Возвращает DataFrame: client_id, name, last_order, recency (дней), frequency, monetary,
+    r, f, m (баллы 1-5, 0 без заказов), rfm (строка баллов) и segment.
+    Повторный вызов с теми же параметрами возвращает копию кэша, пока не изменились клиенты,
+    товары (цены входят в выручку) или заказы.
+    """
+    reference_date = reference_date or datetime.date.today()
+    key = (db.database().target, reference_date, include_archive)
+    version = db.get_data_version('clients', 'products', 'orders')
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1].copy()
+
+    metrics = _read_metrics(include_archive, chunk_size)
+    has_orders = metrics['frequency'] > 0
+    recency = (np.datetime64(reference_date, 'D') - metrics['last_order']).astype(np.float64)
+    recency[~has_orders] = np.nan
+    scores = {}
+    for column, values, higher_is_better in (('r', recency, False), ('f', metrics['frequency'], True),
+                                             ('m', metrics['monetary'], True)):
+        scores[column] = np.zeros(len(values), dtype=np.int64)
+        scores[column][has_orders] = _quintile_scores(values[has_orders], higher_is_better)
+    r, f = scores['r'], scores['f']
+    conditions = [has_orders & (r >= r_min) & (r <= r_max) & (f >= f_min) & (f <= f_max)
+                  for _, (r_min, r_max), (f_min, f_max) in SEGMENT_RULES]
+    segment = np.select(conditions, [name for name, _, _ in SEGMENT_RULES], NO_ORDERS)
+    rfm = np.char.add(np.char.add(scores['r'].astype(str), scores['f'].astype(str)), scores['m'].astype(str))
+    result = pd.DataFrame({**metrics, 'recency': recency, **scores, 'rfm': rfm,
+                           'segment': pd.Categorical(segment, categories=SEGMENTS)})
+    result = result[['client_id', 'name', 'last_order', 'recency', 'frequency', 'monetary',
+                     'r', 'f', 'm', 'rfm', 'segment']]
+    with _cache_lock:
+        _cache.clear()  # Храним только последний результат, чтобы не держать в памяти несколько копий
+        _cache[key] = (version, result)
+    return result.copy()
+
+def get_segment_client_ids(segment: str, include_archive: bool = False) -> set:
+    """Получить ID клиентов сегмента (для фильтра вкладки клиентов)."""
+    rfm = compute_rfm(include_archive=include_archive)
+    return set(rfm.loc[rfm['segment'] == segment, 'client_id'].tolist())
+
+def export_rfm_to_csv(filename: str = 'rfm.csv', include_archive: bool = False):
+    """Экспортировать RFM-показатели и сегменты клиентов в CSV."""
+    rfm = compute_rfm(include_archive=include_archive)
+    rfm.to_csv(filename, index=False, date_format='%Y-%m-%d')
@@ -0,0 +1,453 @@
+"""
+Модуль локального HTTP-сервиса с JSON API поверх базы данных из db.py.
+Используется кассовыми терминалами для чтения каталога и оформления заказов.
+Только стандартная библиотека: http.server, sqlite3, threading.
+
+Запуск: `python server.py --port 8080 --workers 4`.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import db
+from events import publish
+from maintenance import shutdown_maintenance
+
+DEFAULT_PAGE_SIZE = 50  # Размер страницы по умолчанию
+MAX_PAGE_SIZE = 500  # Максимальный размер страницы
+CACHE_SIZE = 256  # Число закэшированных ответов на один рабочий поток
+
+# Столбцы, по которым разрешена сортировка списков (параметр sort); текстовые сравниваются без учета регистра
+SORT_COLUMNS = {
+    'clients': {'id': 'id', 'name': 'name COLLATE NOCASE', 'email': 'email COLLATE NOCASE'},
+    'products': {'id': 'id', 'name': 'name COLLATE NOCASE', 'price': 'price',
+                 'category': 'category COLLATE NOCASE', 'quantity': 'quantity'},
+    'orders': {'id': 'id', 'client_id': 'client_id', 'date': 'date'},
+}
+
+
+class ApiError(Exception):
+    """Ошибка обработки запроса с HTTP-статусом."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class OrderWriter:
+    """
+    Единственный сериализованный писатель.
+
+    Все изменения базы проходят через одно соединение под блокировкой,
+    поэтому запросы на запись от разных рабочих потоков не конкурируют между собой.
+    """
+
+    def __init__(self, db_name: str):
+        self._conn = db.connect(db_name, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+
+    def place_order(self, client_id: int, items: dict, date: datetime.date) -> int:
+        """Оформить заказ, списав остатки товаров. Возвращает ID заказа."""
+        with self._lock:
+            order_id = self._insert_order(client_id, items, date)
+        publish('products', 'update', list(items))
+        publish('orders', 'insert', [order_id])
+        return order_id
+
+    @db.retry_on_busy
+    def _insert_order(self, client_id: int, items: dict, date: datetime.date) -> int:
+        """Транзакция заказа; если база занята другим процессом дольше BUSY_TIMEOUT, она повторяется."""
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT 1 FROM clients WHERE id = ?', (client_id,))
+            if cursor.fetchone() is None:
+                raise ApiError(404, f"Клиент {client_id} не найден")
+            for product_id, qty in items.items():
+                cursor.execute('SELECT quantity FROM products WHERE id = ?', (product_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    raise ApiError(404, f"Товар {product_id} не найден")
+                if row[0] < qty:
+                    raise ApiError(409, f"Недостаточно товара {product_id} на складе")
+                cursor.execute('UPDATE products SET quantity = quantity - ? WHERE id = ?', (qty, product_id))
+            cursor.execute('INSERT INTO orders (client_id, date) VALUES (?, ?)', (client_id, date.isoformat()))
+            order_id = cursor.lastrowid
+            cursor.executemany('INSERT INTO order_products (order_id, product_id, quantity) VALUES (?, ?, ?)',
+                               [(order_id, pid, qty) for pid, qty in items.items()])
+            cursor.execute('COMMIT')
+        except BaseException:
+            if self._conn.in_transaction:  # BEGIN мог не выполниться из-за блокировки
+                cursor.execute('ROLLBACK')
+            raise
+        return order_id
+
+    def close(self):
+        """Закрыть соединение писателя."""
+        with self._lock:
+            self._conn.close()
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTP-сервер с фиксированным пулом рабочих потоков.
+
+    Каждый рабочий поток держит собственное соединение для чтения и кэш ответов,
+    запись выполняется через общий OrderWriter.
+    """
+
+    def __init__(self, server_address, workers: int = 4, db_name: str = None, verbose: bool = False):
+        super().__init__(server_address, ApiRequestHandler)
+        self.db_name = db_name or db.DB_NAME
+        self.verbose = verbose
+        self.writer = OrderWriter(self.db_name)
+        self._local = threading.local()
+        self._requests = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def read_connection(self) -> sqlite3.Connection:
+        """Соединение для чтения текущего рабочего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = db.connect(self.db_name)
+            conn.execute('PRAGMA query_only = 1')
+            self._local.conn = conn
+            self._local.cache = {}
+        return conn
+
+    def response_cache(self) -> dict:
+        """Кэш ответов текущего рабочего потока: ключ -> (data_version, etag, body)."""
+        return self._local.cache
+
+    def process_request(self, request, client_address):
+        """Передать соединение в очередь пула вместо создания нового потока."""
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        while True:
+            job = self._requests.get()
+            if job is None:
+                break
+            request, client_address = job
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+
+    def server_close(self):
+        """Остановить рабочие потоки и закрыть соединения."""
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.join()
+        self.writer.close()
+
+
+def _page_params(params: dict):
+    """Разобрать параметры пагинации limit/offset."""
+    try:
+        limit = int(params.get('limit', [DEFAULT_PAGE_SIZE])[0])
+        offset = int(params.get('offset', [0])[0])
+    except ValueError:
+        raise ApiError(400, "limit и offset должны быть целыми числами")
+    if limit < 1 or limit > MAX_PAGE_SIZE or offset < 0:
+        raise ApiError(400, f"limit должен быть от 1 до {MAX_PAGE_SIZE}, offset не меньше 0")
+    return limit, offset
+
+
+def _order_by(params: dict, resource: str) -> str:
+    """
+    Разобрать параметр sort в ORDER BY.
+
+    Пример: `sort=category,-price` — по категории, затем по убыванию цены.
+    Порядок всегда дополняется id, чтобы страницы были стабильными.
+    """
+    allowed = SORT_COLUMNS[resource]
+    terms = []
+    for field in ','.join(params.get('sort', [])).split(','):
+        field = field.strip()
+        if not field:
+            continue
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        if name not in allowed:
+            raise ApiError(400, f"Сортировка по {name} не поддерживается, доступны: {', '.join(allowed)}")
+        terms.append(f"{allowed[name]} {'DESC' if descending else 'ASC'}")
+    if not any(term.startswith('id ') for term in terms):
+        terms.append('id ASC')
+    return 'ORDER BY ' + ', '.join(terms)
+
+
+def _client_dict(row) -> dict:
+    return {'id': row[0], 'name': row[1], 'email': row[2], 'phone': row[3], 'address': row[4]}
+
+
+def _product_dict(row) -> dict:
+    return {'id': row[0], 'name': row[1], 'price': row[2], 'category': row[3], 'quantity': row[4],
+            'reorder_threshold': row[5]}
+
+
+def _orders_with_items(cursor, order_rows) -> list:
+    """Дополнить строки заказов позициями одним запросом (без N+1)."""
+    orders = {row[0]: {'id': row[0], 'client_id': row[1], 'date': row[2], 'items': []} for row in order_rows}
+    if orders:
+        placeholders = ','.join('?' * len(orders))
+        cursor.execute(f'SELECT order_id, product_id, quantity FROM order_products '
+                       f'WHERE order_id IN ({placeholders}) ORDER BY order_id, product_id', list(orders))
+        for order_id, product_id, quantity in cursor.fetchall():
+            orders[order_id]['items'].append({'product_id': product_id, 'quantity': quantity})
+    return list(orders.values())
+
+
+def list_clients(conn, params: dict) -> dict:
+    """Страница клиентов."""
+    limit, offset = _page_params(params)
+    order_by = _order_by(params, 'clients')
+    cursor = conn.cursor()
+    total = cursor.execute('SELECT COUNT(*) FROM clients').fetchone()[0]
+    cursor.execute(f'SELECT * FROM clients {order_by} LIMIT ? OFFSET ?', (limit, offset))
+    return {'items': [_client_dict(row) for row in cursor.fetchall()], 'total': total, 'limit': limit, 'offset': offset}
+
+
+def get_client(conn, client_id: int) -> dict:
+    """Клиент по ID."""
+    row = conn.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
+    if row is None:
+        raise ApiError(404, f"Клиент {client_id} не найден")
+    return _client_dict(row)
+
+
+def list_products(conn, params: dict) -> dict:
+    """Страница каталога товаров с необязательным фильтром по категории."""
+    limit, offset = _page_params(params)
+    order_by = _order_by(params, 'products')
+    where, args = '', []
+    if 'category' in params:
+        where, args = 'WHERE category = ?', [params['category'][0]]
+    cursor = conn.cursor()
+    total = cursor.execute(f'SELECT COUNT(*) FROM products {where}', args).fetchone()[0]
+    cursor.execute(f'SELECT * FROM products {where} {order_by} LIMIT ? OFFSET ?', args + [limit, offset])
+    return {'items': [_product_dict(row) for row in cursor.fetchall()], 'total': total, 'limit': limit, 'offset': offset}
+
+
+def get_product(conn, product_id: int) -> dict:
+    """Товар по ID."""
+    row = conn.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
+    if row is None:
+        raise ApiError(404, f"Товар {product_id} не найден")
+    return _product_dict(row)
+
+
+def list_orders(conn, params: dict) -> dict:
+    """Страница заказов вместе с позициями."""
+    limit, offset = _page_params(params)
+    order_by = _order_by(params, 'orders')
+    cursor = conn.cursor()
+    total = cursor.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+    cursor.execute(f'SELECT id, client_id, date FROM orders {order_by} LIMIT ? OFFSET ?', (limit, offset))
+    items = _orders_with_items(cursor, cursor.fetchall())
+    return {'items': items, 'total': total, 'limit': limit, 'offset': offset}
+
+
+def get_order(conn, order_id: int) -> dict:
+    """Заказ по ID вместе с позициями."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, client_id, date FROM orders WHERE id = ?', (order_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        raise ApiError(404, f"Заказ {order_id} не найден")
+    return _orders_with_items(cursor, rows)[0]
+
+
+def parse_order(payload) -> tuple:
+    """Проверить тело запроса на создание заказа. Возвращает (client_id, {product_id: qty}, date)."""
+    if not isinstance(payload, dict):
+        raise ApiError(400, "Ожидается JSON-объект")
+    try:
+        client_id = int(payload['client_id'])
+        items = {}
+        for item in payload['items']:
+            product_id, qty = int(item['product_id']), int(item['quantity'])
+            if qty < 1:
+                raise ApiError(400, "Количество должно быть положительным")
+            items[product_id] = items.get(product_id, 0) + qty
+        date = datetime.date.fromisoformat(payload['date']) if payload.get('date') else datetime.date.today()
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(400, "Ожидаются поля client_id, items[{product_id, quantity}] и необязательное date")
+    if not items:
+        raise ApiError(400, "Заказ должен содержать хотя бы один товар")
+    return client_id, items, date
+
+
+# Маршруты GET: (коллекция, функция списка, функция одного объекта, кэшировать ли ответы)
+ROUTES = {
+    'clients': (list_clients, get_client, False),
+    'products': (list_products, get_product, True),
+    'orders': (list_orders, get_order, False),
+}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов JSON API."""
+
+    server_version = 'ShopApp/1.0'
+
+    def do_GET(self):
+        try:
+            url = urlsplit(self.path)
+            parts = [p for p in url.path.split('/') if p]
+            if not parts or parts[0] not in ROUTES or len(parts) > 2:
+                raise ApiError(404, "Ресурс не найден")
+            list_func, item_func, cacheable = ROUTES[parts[0]]
+            params = parse_qs(url.query)
+            if len(parts) == 2:
+                try:
+                    object_id = int(parts[1])
+                except ValueError:
+                    raise ApiError(404, "Ресурс не найден")
+                handler = lambda conn: item_func(conn, object_id)
+            else:
+                handler = lambda conn: list_func(conn, params)
+            if cacheable:
+                self._send_cached(url.path + '?' + url.query, handler)
+            else:
+                self._send_json(200, handler(self.server.read_connection()))
+        except ApiError as e:
+            self._send_json(e.status, {'error': e.message})
+        except sqlite3.Error as e:
+            self._send_database_error(e)
+
+    def do_POST(self):
+        try:
+            if urlsplit(self.path).path.rstrip('/') != '/orders':
+                raise ApiError(404, "Ресурс не найден")
+            length = self.headers.get('Content-Length') or '0'
+            if not length.strip().isdecimal():
+                raise ApiError(400, "Некорректный заголовок Content-Length")
+            length = int(length)
+            try:
+                payload = json.loads(self.rfile.read(length) or b'null')
+            except ValueError:
+                raise ApiError(400, "Некорректный JSON")
+            client_id, items, date = parse_order(payload)
+            order_id = self.server.writer.place_order(client_id, items, date)
+            body = {'id': order_id, 'client_id': client_id, 'date': date.isoformat(),
+                    'items': [{'product_id': pid, 'quantity': qty} for pid, qty in items.items()]}
+            self._send_json(201, body, {'Location': f'/orders/{order_id}'})
+        except ApiError as e:
+            self._send_json(e.status, {'error': e.message})
+        except sqlite3.Error as e:
+            self._send_database_error(e)
+
+    def _send_database_error(self, error: sqlite3.Error):
+        """Ответить на ошибку SQLite: 503 с Retry-After для занятой базы (OperationalError), иначе 500."""
+        if isinstance(error, sqlite3.OperationalError):  # База осталась занятой после всех повторов
+            self._send_json(503, {'error': f"База данных занята, повторите запрос позже: {error}"}, {'Retry-After': '1'})
+        else:
+            self._send_json(500, {'error': f"Ошибка базы данных: {error}"})
+
+    def _send_cached(self, key: str, handler):
+        """
+        Ответить с ETag, повторно используя тело, пока база не менялась.
+
+        PRAGMA data_version меняется, когда другое соединение (писатель сервиса,
+        GUI или другой процесс) фиксирует изменения, поэтому проверка стоит одного запроса.
+        """
+        conn = self.server.read_connection()
+        cache = self.server.response_cache()
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        cached = cache.get(key)
+        if cached is None or cached[0] != version:
+            body = self._encode(handler(conn))
+            etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            if len(cache) >= CACHE_SIZE:
+                cache.clear()
+            cached = cache[key] = (version, etag, body)
+        _, etag, body = cached
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._send_body(200, body, {'ETag': etag, 'Cache-Control': 'no-cache'})
+
+    @staticmethod
+    def _encode(data) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _send_json(self, status: int, data, headers: dict = None):
+        self._send_body(status, self._encode(data), headers)
+
+    def _send_body(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8080, workers: int = 4,
+                  db_name: str = None, verbose: bool = False) -> PooledHTTPServer:
+    """
+    Создать HTTP-сервер (порт 0 выбирает свободный порт).
+
+    Параметры
+    ----------
+    host : str
+        Адрес для прослушивания, по умолчанию только локальный.
+    port : int
+        Порт.
+    workers : int
+        Число рабочих потоков, каждый со своим соединением для чтения.
+    db_name : str
+        Файл базы данных, по умолчанию db.DB_NAME.
+    verbose : bool
+        Печатать журнал запросов.
+    """
+    return PooledHTTPServer((host, port), workers=workers, db_name=db_name, verbose=verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный JSON API системы учета заказов")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--db', dest='db_name', default=None, help="Файл базы данных (по умолчанию SHOPAPP_DB или order_management.db)")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    if args.db_name:
+        db.use_database(args.db_name)
+    server = create_server(args.host, args.port, args.workers, verbose=args.verbose)
+    print(f"Сервер запущен на http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shutdown_maintenance()
+
+
+if __name__ == '__main__':
+    main()
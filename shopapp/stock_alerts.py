@@ -0,0 +1,56 @@
+"""
+Модуль оповещений о товарах на пороге дозаказа.
+Список строится один раз запросом по частичному индексу (db.get_low_stock_products),
+дальше обновляется по событиям шины: изменившиеся товары перепроверяются по ID,
+поэтому списание остатков при заказе не требует просмотра каталога.
+"""
+
+from typing import Callable, Dict, List, Optional
+import db
+from events import ChangeEvent, subscribe, unsubscribe
+from models import Product
+
+class LowStockWatch:
+    """
+    Товары с остатком на пороге дозаказа или ниже, синхронизируемые с базой через шину событий.
+
+    Параметры
+    ----------
+    on_change : callable, optional
+        Вызывается без аргументов, когда список или остатки в нем изменились
+        (в потоке, опубликовавшем событие).
+    """
+
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        self.on_change = on_change
+        self._products: Dict[int, Product] = {}
+        self.reload()
+        self._token = subscribe(self._on_change, 'products')
+
+    def reload(self):
+        """Перечитать список из базы (например, если базу меняли другие процессы)."""
+        self._products = {product.id: product for product in db.get_low_stock_products()}
+
+    def _on_change(self, event: ChangeEvent):
+        if event.operation in ('reindex', 'import') or not event.ids:
+            self.reload()
+            changed = True
+        else:
+            changed = any(self._products.pop(product_id, None) is not None for product_id in event.ids)
+            if event.operation != 'delete':
+                fresh = db.get_low_stock_products(event.ids)
+                self._products.update((product.id, product) for product in fresh)
+                changed = changed or bool(fresh)
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def products(self) -> List[Product]:
+        """Товары списка по возрастанию остатка."""
+        return sorted(self._products.values(), key=lambda product: (product.quantity, product.id))
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def close(self):
+        """Отписаться от событий."""
+        unsubscribe(self._token)
@@ -0,0 +1,96 @@
+"""
+Модуль модели таблицы для представлений Treeview.
+Сортировка выполняется по исходным типизированным значениям строк, а не по тексту ячеек:
+ключи каждого столбца вычисляются один раз и кэшируются до замены данных.
+"""
+
+import datetime
+from typing import List, Sequence, Tuple
+
+# Тип столбца -> функция ключа сортировки значения
+KEY_FUNCS = {
+    'int': int,
+    'float': float,
+    'text': lambda value: str(value).casefold(),
+    'date': lambda value: value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value)),
+}
+
+def _sort_key(kind: str):
+    convert = KEY_FUNCS[kind]
+    # Пустые значения всегда идут после заполненных
+    return lambda value: (1, None) if value is None or value == '' else (0, convert(value))
+
+class TableModel:
+    """
+    Данные таблицы и порядок сортировки.
+
+    Параметры
+    ----------
+    columns : sequence of (str, str)
+        Пары (имя столбца Treeview, тип: 'int', 'float', 'text' или 'date').
+    sort_order : list of (str, bool), optional
+        Начальный порядок: [(столбец, по убыванию), ...], первый столбец главный.
+    """
+
+    def __init__(self, columns: Sequence[Tuple[str, str]], sort_order: List[Tuple[str, bool]] = None):
+        self.columns = [name for name, _ in columns]
+        self._key_funcs = [_sort_key(kind) for _, kind in columns]
+        self.sort_order = list(sort_order or [])
+        self.rows = []
+        self._keys = {}  # Столбец -> список ключей строк
+
+    def set_rows(self, rows: Sequence[tuple]):
+        """Заменить данные; кэш ключей сбрасывается."""
+        self.rows = list(rows)
+        self._keys = {}
+
+    def _column_keys(self, column: str) -> list:
+        if column not in self._keys:
+            position = self.columns.index(column)
+            key = self._key_funcs[position]
+            self._keys[column] = [key(row[position]) for row in self.rows]
+        return self._keys[column]
+
+    def toggle_sort(self, column: str, add: bool = False):
+        """
+        Изменить порядок по щелчку на заголовке.
+
+        Без add столбец становится единственным ключом (повторный щелчок меняет направление).
+        С add (Shift+щелчок) столбец добавляется к порядку или у него меняется направление.
+        """
+        current = dict(self.sort_order)
+        descending = not current[column] if column in current else False
+        if add:
+            if column in current:
+                self.sort_order = [(c, descending if c == column else d) for c, d in self.sort_order]
+            else:
+                self.sort_order.append((column, False))
+        else:
+            self.sort_order = [(column, descending if len(self.sort_order) == 1 and column in current else False)]
+
+    def sorted_rows(self) -> List[tuple]:
+        """Строки в текущем порядке сортировки (устойчивая сортировка по ключам, начиная с младшего)."""
+        indices = list(range(len(self.rows)))
+        for column, descending in reversed(self.sort_order):
+            keys = self._column_keys(column)
+            # Направление меняет только порядок значений: пустые остаются в конце и по убыванию
+            filled = [i for i in indices if not keys[i][0]]
+            filled.sort(key=keys.__getitem__, reverse=descending)
+            indices = filled + [i for i in indices if keys[i][0]]
+        return [self.rows[i] for i in indices]
+
+    def heading_text(self, column: str) -> str:
+        """Заголовок столбца со стрелкой направления и номером ключа при сортировке по нескольким столбцам."""
+        for position, (name, descending) in enumerate(self.sort_order, 1):
+            if name == column:
+                arrow = '▼' if descending else '▲'
+                return f"{column} {arrow}{position if len(self.sort_order) > 1 else ''}"
+        return column
+
+    def populate(self, tree):
+        """Перезаполнить Treeview за один проход в текущем порядке и обновить заголовки."""
+        tree.delete(*tree.get_children())
+        for row in self.sorted_rows():
+            tree.insert('', 'end', values=row)
+        for column in self.columns:
+            tree.heading(column, text=self.heading_text(column))
@@ -1,42 +1,31 @@
 import unittest
-from unittest.mock import patch, MagicMock
-from analysis import top_clients_by_orders, plot_order_dynamics, plot_client_graph
+from unittest.mock import patch
+from analysis import (top_clients_data, order_dynamics_data, client_graph_data, revenue_by_product,
+                      revenue_by_category, revenue_by_period, average_basket_size, iter_line_items)
 from models import Order, Client, Product, OrderItem
 import datetime
+from db import add_product, delete_order
+from test_db import DbTestCase
 
 class TestAnalysis(unittest.TestCase):
-    @patch('analysis.get_all_orders')
-    @patch('analysis.get_all_clients')
-    @patch('analysis.plt')
-    def test_top_clients_by_orders(self, mock_plt, mock_get_clients, mock_get_orders):
-        client1 = Client("Client1", "c1@email.com", "+1")
-        client1.id = 1
-        client2 = Client("Client2", "c2@email.com", "+2")
-        client2.id = 2
-        order1 = Order(client1, [])
-        order2 = Order(client2, [])
-        mock_get_orders.return_value = [order1, order2]
-        mock_get_clients.return_value = [client1, client2]
-        top_clients_by_orders()
-        mock_plt.figure.assert_called()
-        mock_plt.show.assert_called()
+    @patch('analysis.get_client_totals')
+    def test_top_clients_data(self, mock_get_totals):
+        mock_get_totals.return_value = [(1, "Client1", 2, 3, 30.0), (2, "Client2", 1, 1, 10.0)]
+        top_df = top_clients_data()
+        mock_get_totals.assert_called_with(limit=5, include_archive=False)
+        self.assertEqual(list(top_df['client_name']), ["Client1", "Client2"])
 
-    @patch('analysis.get_all_orders')
-    @patch('analysis.plt')
-    @patch('analysis.sns')
-    def test_plot_order_dynamics(self, mock_sns, mock_plt, mock_get_orders):
-        order = Order(MagicMock(), [], datetime.date.today())
-        mock_get_orders.return_value = [order]
-        plot_order_dynamics()
-        mock_plt.figure.assert_called()
-        mock_plt.show.assert_called()
+    @patch('analysis.get_daily_sales')
+    def test_order_dynamics_data(self, mock_get_daily):
+        mock_get_daily.return_value = [(datetime.date.today().isoformat(), 1, 2, 20.0)]
+        df_grouped = order_dynamics_data()
+        self.assertEqual(list(df_grouped['count']), [1])
+        self.assertEqual(df_grouped['date'].iloc[0].date(), datetime.date.today())
 
     @patch('analysis.get_all_orders')
     @patch('analysis.get_all_clients')
     @patch('analysis.get_all_products')
-    @patch('analysis.plt')
-    @patch('analysis.nx')
-    def test_plot_client_graph(self, mock_nx, mock_plt, mock_get_products, mock_get_clients, mock_get_orders):
+    def test_client_graph_data(self, mock_get_products, mock_get_clients, mock_get_orders):
         client = Client("Client", "c@email.com", "+1")
         client.id = 1
         product = Product("Item", 10.0)
@@ -46,9 +35,54 @@ class TestAnalysis(unittest.TestCase):
         mock_get_orders.return_value = [order]
         mock_get_clients.return_value = [client]
         mock_get_products.return_value = [product]
-        plot_client_graph()
-        mock_plt.figure.assert_called()
-        mock_plt.show.assert_called()
+        G = client_graph_data()
+        self.assertEqual(list(G.edges()), [("Client", "Item")])
+        mock_get_orders.return_value = []
+        self.assertIsNone(client_graph_data())
+
+class TestRevenueAnalytics(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        client = self.make_client()
+        apple = self.make_product("Apple", 2.0)
+        pear = Product("Pear", 5.0, "Other", 10)
+        add_product(pear)
+        self.make_order(client, [(apple, 3), (pear, 1)], datetime.date(2025, 1, 15))
+        self.make_order(client, [(apple, 1)], datetime.date(2025, 2, 1))
+
+    def test_revenue_by_product(self):
+        result = revenue_by_product()
+        self.assertEqual(list(result['name']), ["Apple", "Pear"])
+        self.assertEqual(list(result['revenue']), [8.0, 5.0])
+
+    def test_revenue_by_category(self):
+        result = revenue_by_category()
+        self.assertEqual(dict(zip(result['category'], result['revenue'])), {"Cat": 8.0, "Other": 5.0})
+
+    def test_revenue_by_period(self):
+        result = revenue_by_period('M')
+        self.assertEqual(list(result['period']), ['2025-01', '2025-02'])
+        self.assertEqual(list(result['revenue']), [11.0, 2.0])
+
+    def test_average_basket_size(self):
+        result = average_basket_size()
+        self.assertEqual(result['orders'][0], 2)
+        self.assertEqual(result['revenue_per_order'][0], 6.5)
+        self.assertEqual(result['items_per_order'][0], 2.5)
+
+    def test_chunks_keep_orders_whole(self):
+        chunks = list(iter_line_items(chunk_size=1))
+        self.assertEqual([list(chunk['order_id']) for chunk in chunks], [[1, 1], [2]])
+        with patch('analysis.LINE_ITEMS_CHUNK', 1):
+            result = revenue_by_category()
+            self.assertEqual(dict(zip(result['category'], result['orders'])), {"Cat": 2, "Other": 1})
+            self.assertEqual(list(revenue_by_period('M')['orders']), [1, 1])
+            self.assertEqual(average_basket_size()['lines_per_order'][0], 1.5)
+
+    def test_empty_database(self):
+        delete_order(1)
+        delete_order(2)
+        self.assertTrue(revenue_by_category().empty)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,51 @@
+import unittest
+import datetime
+import db
+from archive import archive_orders, get_archive_info
+from test_db import DbTestCase
+
+class TestArchive(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.archive_path = self.temp_path('archive.db')
+        self.client = self.make_client()
+        self.apple = self.make_product("Apple", 2.0)
+        self.old = self.make_order(self.client, [(self.apple, 1)], datetime.date(2024, 1, 10))
+        self.new = self.make_order(self.client, [(self.apple, 3)], datetime.date(2025, 6, 1))
+        self.result = archive_orders(datetime.date(2025, 1, 1), self.archive_path)
+
+    def test_moves_old_orders(self):
+        self.assertEqual((self.result['orders'], self.result['items']), (1, 1))
+        self.assertEqual([o.id for o in db.get_all_orders()], [self.new.id])
+        self.assertEqual(sorted(o.id for o in db.get_all_orders(include_archive=True)), [self.old.id, self.new.id])
+        self.assertEqual(get_archive_info()['orders'], 1)
+        self.assertEqual(db.verify_summaries(), {})
+
+    def test_date_range_reaches_archive(self):
+        orders = db.get_all_orders(date_from=datetime.date(2024, 1, 1), date_to=datetime.date(2024, 12, 31))
+        self.assertEqual([(o.id, o.calculate_total()) for o in orders], [(self.old.id, 2.0)])
+
+    def test_summaries_include_archive(self):
+        self.assertEqual(db.get_daily_sales(), [('2025-06-01', 1, 3, 6.0)])
+        self.assertEqual(len(db.get_daily_sales(include_archive=True)), 2)
+        self.assertEqual(db.get_client_totals(include_archive=True), [(self.client.id, "Client", 2, 4, 8.0)])
+
+    def test_reindex_does_not_collide_with_archive(self):
+        db.delete_order(self.new.id)
+        self.make_order(self.client, [(self.apple, 1)], datetime.date(2025, 7, 1))
+        db.reindex_orders()
+        ids = [o.id for o in db.get_all_orders(include_archive=True)]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_reindex_clients_updates_archive(self):
+        second = self.make_client("Second")
+        order = self.make_order(second, [(self.apple, 2)], datetime.date(2024, 5, 5))
+        archive_orders(datetime.date(2025, 1, 1))
+        db.delete_client(self.client.id)
+        db.reindex_clients()
+        archived = {o.id: o for o in db.get_all_orders(include_archive=True)}
+        self.assertEqual(archived[order.id].client.name, "Second")
+        self.assertEqual(db.verify_summaries(), {})
+
+if __name__ == '__main__':
+    unittest.main()
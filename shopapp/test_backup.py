@@ -0,0 +1,62 @@
+import unittest
+import os
+import db
+import backup
+from events import subscribe, unsubscribe
+from test_db import DbTestCase
+
+class TestBackup(DbTestCase):
+    IN_MEMORY = False  # Копируется и восстанавливается файл базы
+
+    def setUp(self):
+        super().setUp()
+        self.directory = self.temp_path('backups')
+        os.mkdir(self.directory)
+
+    def test_backup_is_verified_copy(self):
+        self.make_client("Alice")
+        steps = []
+        result = backup.create_backup(self.directory, pages=1, sleep=0, progress=lambda done, total: steps.append(done))
+        self.assertTrue(os.path.exists(result['path']))
+        self.assertGreater(len(steps), 1)  # Копирование шло порциями
+        self.assertEqual(steps[-1], result['pages'])
+        self.assertEqual(backup.verify_backup(result['path']), ['ok'])
+        self.assertFalse(os.path.exists(result['path'] + '-wal'))
+        self.assertEqual([b['path'] for b in backup.list_backups(self.directory)], [result['path']])
+
+    def test_rotation_keeps_latest(self):
+        paths = [backup.create_backup(self.directory, keep=2, sleep=0)['path'] for _ in range(4)]
+        self.assertEqual([b['path'] for b in backup.list_backups(self.directory)], paths[:-3:-1])
+
+    def test_restore_brings_back_data_and_raises_versions(self):
+        alice = self.make_client("Alice")
+        saved = backup.create_backup(self.directory, sleep=0)['path']
+        db.delete_client(alice.id)
+        self.make_client("Bob")
+        version = db.get_data_version('clients')[0]
+        events = []
+        token = subscribe(events.append, 'clients')
+        try:
+            safety = backup.restore_backup(saved, directory=self.directory)
+        finally:
+            unsubscribe(token)
+        self.assertEqual([c.name for c in db.get_all_clients()], ["Alice"])
+        self.assertEqual(db.configure_concurrency(), 'wal')
+        self.assertGreater(db.get_data_version('clients')[0], version)
+        self.assertEqual([e.operation for e in events], ['import'])
+        self.assertTrue(os.path.exists(safety))
+        backup.restore_backup(safety, safety_backup=False)
+        self.assertEqual([c.name for c in db.get_all_clients()], ["Bob"])
+
+    def test_corrupt_backup_is_rejected(self):
+        path = os.path.join(self.directory, 'broken.db')
+        with open(path, 'wb') as f:
+            f.write(b'not a database' * 100)
+        self.assertNotEqual(backup.verify_backup(path), ['ok'])
+        self.make_client("Alice")
+        with self.assertRaises(RuntimeError):
+            backup.restore_backup(path, directory=self.directory)
+        self.assertEqual([c.name for c in db.get_all_clients()], ["Alice"])
+
+if __name__ == '__main__':
+    unittest.main()
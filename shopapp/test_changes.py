@@ -0,0 +1,86 @@
+import unittest
+import csv
+import datetime
+import gzip
+import json
+import db
+import changes
+from test_db import DbTestCase
+
+class TestChanges(DbTestCase):
+    def export(self, entity, suffix, **kwargs):
+        filename = self.temp_path(entity + suffix)
+        return filename, changes.export_changes(entity, filename, **kwargs)
+
+    def test_first_export_is_full_then_only_changes(self):
+        alice = self.make_client("Alice")
+        bob = self.make_client("Bob")
+        _, stats = self.export('clients', '.csv')
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(changes.get_watermark('clients'), stats['watermark'])
+
+        bob.phone = "+7000"
+        db.update_client(bob)
+        self.make_client("Carol")
+        db.delete_client(alice.id)
+        filename, stats = self.export('clients', '.csv')
+        self.assertEqual((stats['inserted'], stats['updated'], stats['deleted']), (1, 1, 1))
+        with open(filename, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(r['operation'], r['id']) for r in rows],
+                         [('delete', '1'), ('update', '2'), ('insert', '3')])
+        self.assertEqual(rows[1]['phone'], "+7000")
+
+        _, stats = self.export('clients', '.csv')
+        self.assertEqual((stats['inserted'], stats['updated'], stats['deleted']), (0, 0, 0))
+
+    def test_order_lines_and_reindex(self):
+        alice = self.make_client("Alice")
+        tea = self.make_product("Tea")
+        first = self.make_order(alice, [(tea, 1)], datetime.date(2024, 1, 1))
+        self.make_order(alice, [(tea, 2)], datetime.date(2024, 1, 2))
+        self.export('orders', '.json')
+        db.delete_order(first.id)
+        db.reindex_orders()
+        filename, stats = self.export('orders', '.json.gz')
+        with gzip.open(filename, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        # Заказ 2 стал заказом 1: для потребителя это замена строки 1 и удаление строки 2
+        self.assertEqual([(item['operation'], item['id']) for item in data], [('update', 1), ('delete', 2)])
+        self.assertEqual(data[0]['items'], [{'product_id': tea.id, 'quantity': 2}])
+
+    def test_threshold_change_is_exported(self):
+        tea = self.make_product("Tea")
+        self.export('products', '.csv')
+        tea.reorder_threshold = 20
+        db.update_product(tea)
+        filename, stats = self.export('products', '.csv')
+        self.assertEqual(stats['updated'], 1)
+        with open(filename, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(r['operation'], r['reorder_threshold']) for r in rows], [('update', '20')])
+
+    def test_consumers_are_independent_and_prune(self):
+        self.make_product("Tea")
+        self.export('products', '.csv', consumer='shop')
+        self.make_product("Coffee")
+        _, stats = self.export('products', '.csv', consumer='warehouse')
+        self.assertEqual(stats['inserted'], 2)  # Первая выгрузка склада — полная
+        _, stats = self.export('products', '.csv', consumer='shop')
+        self.assertEqual(stats['inserted'], 1)
+        self.assertGreater(changes.prune_changelog(), 0)
+        changes_left, _ = changes.read_changes('products', since=0)
+        self.assertEqual(changes_left, [])
+
+    def test_explicit_since_and_unknown_format(self):
+        tea = self.make_product("Tea")
+        result, watermark = changes.read_changes('products', since=0)
+        self.assertEqual(result, [('insert', (tea.id, "Tea", 10.0, "Cat", 100, 0))])
+        self.assertEqual(changes.read_changes('products', since=watermark)[0], [])
+        with self.assertRaises(ValueError):
+            changes.export_changes('products', self.temp_path('products.xml'))
+        with self.assertRaises(ValueError):
+            changes.read_changes('invoices')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import datetime
+from charts import CHARTS, render_chart, export_chart, clear_cache
+from db import delete_order
+from test_db import DbTestCase
+
+class TestCharts(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        clear_cache()
+        self.client = self.make_client()
+        self.item = self.make_product("Item", 5.0)
+        self.make_order(self.client, [(self.item, 2)], datetime.date(2025, 1, 15))
+
+    def test_all_charts_render(self):
+        for name in CHARTS:
+            self.assertTrue(render_chart(name).image('png').startswith(b'\x89PNG'), name)
+
+    def test_cache_reused_until_data_changes(self):
+        chart = render_chart('order_dynamics')
+        self.assertIs(render_chart('order_dynamics'), chart)
+        self.assertIsNot(render_chart('revenue_by_period', freq='D'), render_chart('revenue_by_period'))
+        self.make_order(self.client, [(self.item, 1)], datetime.date(2025, 1, 16))
+        self.assertIsNot(render_chart('order_dynamics'), chart)
+
+    def test_export_reuses_cached_image(self):
+        png, svg = self.temp_path('chart.png'), self.temp_path('chart.svg')
+        export_chart('top_clients', png)
+        export_chart('top_clients', svg)
+        with open(png, 'rb') as f:
+            self.assertEqual(f.read(), render_chart('top_clients').image('png'))
+        with open(svg, 'rb') as f:
+            self.assertIn(b'<svg', f.read())
+        with self.assertRaises(ValueError):
+            export_chart('top_clients', 'chart.bmp')
+
+    def test_empty_data(self):
+        delete_order(1)
+        self.assertTrue(render_chart('client_graph').image('png').startswith(b'\x89PNG'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import datetime
+import numpy as np
+import db
+from columnar import export_snapshot, import_snapshot, load_snapshot_frames
+from test_db import DbTestCase
+
+class TestColumnar(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        client = self.make_client()
+        apple, pear = self.make_product("Apple", 2.5), self.make_product("Pear", 3.0)
+        self.make_order(client, [(apple, 2), (pear, 1)], datetime.date(2025, 3, 1))
+        apple.reorder_threshold = 5
+        db.update_product(apple)
+        self.snapshot = self.temp_path('snapshot.npz')
+        export_snapshot(self.snapshot)
+
+    def test_round_trip(self):
+        db.delete_order(1)
+        self.make_product("Extra")
+        import_snapshot(self.snapshot)
+        self.assertEqual([(p.name, p.reorder_threshold) for p in db.get_all_products()], [("Apple", 5), ("Pear", 0)])
+        order = db.get_all_orders()[0]
+        self.assertEqual(order.date, datetime.date(2025, 3, 1))
+        self.assertEqual(order.calculate_total(), 8.0)
+        self.assertEqual(db.get_daily_sales(), [('2025-03-01', 1, 3, 8.0)])
+        self.assertEqual(db.verify_summaries(), {})
+
+    def test_version_1_snapshot_gets_default_threshold(self):
+        with np.load(self.snapshot) as data:
+            arrays = {key: data[key] for key in data.files if key != 'products.reorder_threshold'}
+        arrays['version'] = np.array(1)
+        old = self.temp_path('old.npz')
+        np.savez(old, **arrays)
+        tea = db.get_product_by_id(1)
+        tea.reorder_threshold = 50
+        db.update_product(tea)
+        import_snapshot(old)
+        self.assertEqual([p.reorder_threshold for p in db.get_all_products()], [0, 0])
+
+    def test_load_frames(self):
+        frames = load_snapshot_frames(self.snapshot)
+        self.assertEqual(list(frames['products']['price']), [2.5, 3.0])
+        self.assertEqual(frames['order_products']['quantity'].sum(), 3)
+        self.assertEqual(str(frames['orders']['date'].iloc[0].date()), '2025-03-01')
+
+if __name__ == '__main__':
+    unittest.main()
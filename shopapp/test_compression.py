@@ -0,0 +1,73 @@
+import unittest
+import datetime
+import gzip
+import os
+import tempfile
+import db
+from compression import ParallelGzipWriter, compression_of, open_file
+from test_db import DbTestCase
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_compression_of(self):
+        self.assertEqual(compression_of('orders.csv.GZ'), '.gz')
+        self.assertEqual(compression_of('orders.json.xz'), '.xz')
+        self.assertIsNone(compression_of('orders.csv'))
+
+    def test_roundtrip_all_formats(self):
+        text = "id,name\n" + "".join(f"{i},Клиент {i}\n" for i in range(1000))
+        for name in ('plain.csv', 'a.csv.gz', 'b.csv.bz2', 'c.csv.xz'):
+            with open_file(self.path(name), 'w') as f:
+                f.write(text)
+            with open_file(self.path(name)) as f:
+                self.assertEqual(f.read(), text, name)
+        with open(self.path('c.csv.xz'), 'rb') as f:
+            self.assertEqual(f.read(6), b'\xfd7zXZ\x00')
+
+    def test_parallel_writer_writes_members_in_order(self):
+        data = b''.join(f"строка {i}\n".encode() for i in range(20000))
+        writer = ParallelGzipWriter(self.path('blocks.gz'), block_size=4096, workers=4)
+        for start in range(0, len(data), 1000):
+            writer.write(data[start:start + 1000])
+        writer.close()
+        with open(self.path('blocks.gz'), 'rb') as f:
+            raw = f.read()
+        self.assertGreater(raw.count(b'\x1f\x8b\x08'), 1)  # Несколько членов gzip
+        self.assertEqual(gzip.decompress(raw), data)
+
+    def test_empty_gzip_is_valid(self):
+        ParallelGzipWriter(self.path('empty.gz')).close()
+        with gzip.open(self.path('empty.gz')) as f:
+            self.assertEqual(f.read(), b'')
+
+class TestCompressedExports(DbTestCase):
+    def test_orders_csv_gz_roundtrip(self):
+        alice = self.make_client("Alice")
+        tea = self.make_product("Tea")
+        self.make_order(alice, [(tea, 2)], datetime.date(2024, 1, 5))
+        filename = self.temp_path('orders.csv.gz')
+        db.export_orders_to_csv(filename)
+        with gzip.open(filename, 'rt', encoding='utf-8') as f:
+            self.assertTrue(f.readline().startswith('id,client_id'))
+        db.import_orders_from_csv(filename)
+        orders = db.get_all_orders()
+        self.assertEqual(len(orders), 2)
+        self.assertEqual(orders[1].items[0].quantity, 2)
+
+    def test_clients_json_xz_roundtrip(self):
+        self.make_client("Alice")
+        filename = self.temp_path('clients.json.xz')
+        db.export_clients_to_json(filename)
+        stats = db.import_clients_from_json(filename)
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0, 'unchanged': 1})
+
+if __name__ == '__main__':
+    unittest.main()
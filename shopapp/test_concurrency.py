@@ -0,0 +1,97 @@
+import unittest
+import datetime
+import multiprocessing
+import sqlite3
+import threading
+from unittest.mock import patch
+import db
+from models import Client, Order, OrderItem
+from test_db import DbTestCase
+
+def add_orders(db_name: str, count: int):
+    """Процесс-писатель: добавить count заказов клиенту 1 на товар 1."""
+    db.DB_NAME = db_name
+    client, product = db.get_client_by_id(1), db.get_product_by_id(1)
+    for _ in range(count):
+        db.add_order(Order(client, [OrderItem(product, 1)], datetime.date(2024, 1, 1)))
+
+class TestConcurrency(DbTestCase):
+    IN_MEMORY = False  # Процессы-писатели открывают общий файл
+
+    def setUp(self):
+        super().setUp()
+        self.settings = (db.BUSY_TIMEOUT, db.RETRY_ATTEMPTS, db.RETRY_BASE_DELAY, db.RETRY_MAX_DELAY)
+
+    def tearDown(self):
+        db.BUSY_TIMEOUT, db.RETRY_ATTEMPTS, db.RETRY_BASE_DELAY, db.RETRY_MAX_DELAY = self.settings
+        db.JOURNAL_MODE = 'wal'
+        super().tearDown()
+
+    def test_init_db_enables_wal(self):
+        conn = db.connect()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        conn.close()
+
+    def test_configure_concurrency_switches_journal_mode(self):
+        self.assertEqual(db.configure_concurrency(journal_mode='delete', busy_timeout=0.5), 'delete')
+        self.assertEqual(db.BUSY_TIMEOUT, 0.5)
+        self.assertEqual(db.configure_concurrency(), 'delete')
+
+    def test_retry_on_busy_retries_locked_errors_only(self):
+        db.configure_concurrency(retries=3, base_delay=0, max_delay=0)
+        calls = []
+
+        @db.retry_on_busy
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise sqlite3.OperationalError("database is locked")
+            return 'ok'
+
+        self.assertEqual(flaky(), 'ok')
+        self.assertEqual(len(calls), 3)
+
+        @db.retry_on_busy
+        def broken():
+            calls.append(1)
+            raise sqlite3.OperationalError("no such table: missing")
+
+        calls.clear()
+        with self.assertRaises(sqlite3.OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+    def test_retry_gives_up_after_attempts(self):
+        db.configure_concurrency(retries=2, base_delay=0.01, max_delay=0.01)
+
+        @db.retry_on_busy
+        def locked():
+            raise sqlite3.OperationalError("database is locked")
+
+        with patch('db.time.sleep') as sleep, self.assertRaises(sqlite3.OperationalError):
+            locked()
+        self.assertEqual(sleep.call_count, 2)
+        for call in sleep.call_args_list:
+            self.assertTrue(0.005 <= call.args[0] <= 0.01)
+
+    def test_write_waits_for_lock_held_by_other_connection(self):
+        db.configure_concurrency(busy_timeout=0.05, retries=20, base_delay=0.02, max_delay=0.05)
+        holder = db.connect(check_same_thread=False, isolation_level=None)
+        holder.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(0.3, lambda: holder.execute('COMMIT'))
+        timer.start()
+        db.add_client(Client("Late", "late@email.com", "+1234567890"))
+        timer.join()
+        holder.close()
+        self.assertEqual([c.name for c in db.get_all_clients()], ["Late"])
+
+    def test_no_writes_lost_across_processes(self):
+        self.make_order(self.make_client("Alice"), [(self.make_product("Tea"), 1)], datetime.date(2024, 1, 1))
+        with multiprocessing.Pool(4) as pool:
+            pool.starmap(add_orders, [(db.DB_NAME, 25)] * 4)
+        self.assertEqual(len(db.get_all_orders()), 101)
+        self.assertEqual(db.get_product_totals()[0][2], 101)
+        self.assertEqual(db.verify_summaries(), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import db
+from models import Client, Product, Order, OrderItem
+from archive import archive_orders
+
+class DbTestCase(unittest.TestCase):
+    """
+    Базовый класс: каждый тест работает с отдельной базой в памяти.
+
+    Тестам, которым нужен файл базы (несколько процессов, резервные копии), — IN_MEMORY = False:
+    база создается во временном каталоге (db_path). Вспомогательные файлы — через temp_path().
+    """
+
+    IN_MEMORY = True
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = None if self.IN_MEMORY else os.path.join(self.tmp_dir, 'test.db')
+        self.db_patch = patch('db.DB_NAME', db.DB_NAME)
+        self.db_patch.start()
+        db.use_database(self.db_path or ':memory:')
+
+    def tearDown(self):
+        db.close_database()
+        self.db_patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def temp_path(self, name: str) -> str:
+        """Путь вспомогательного файла теста во временном каталоге."""
+        return os.path.join(self.tmp_dir, name)
+
+    def make_client(self, name="Client", email=None):
+        client = Client(name, email or f"{name.lower()}@email.com", "+1234567890")
+        db.add_client(client)
+        return client
+
+    def make_product(self, name="Item", price=10.0, quantity=100):
+        product = Product(name, price, "Cat", quantity)
+        db.add_product(product)
+        return product
+
+    def make_order(self, client, items, date=None):
+        order = Order(client, [OrderItem(p, q) for p, q in items], date or datetime.date(2025, 1, 1))
+        db.add_order(order)
+        return order
+
+class TestSummaries(DbTestCase):
+    def test_add_order_updates_summaries(self):
+        client = self.make_client()
+        apple, pear = self.make_product("Apple", 2.0), self.make_product("Pear", 3.0)
+        self.make_order(client, [(apple, 2), (pear, 1)])
+        self.make_order(client, [(apple, 1)], datetime.date(2025, 1, 2))
+        self.assertEqual(db.get_daily_sales(), [('2025-01-01', 1, 3, 7.0), ('2025-01-02', 1, 1, 2.0)])
+        self.assertEqual(db.get_client_totals(), [(client.id, "Client", 2, 4, 9.0)])
+        self.assertEqual(db.get_product_totals(), [(apple.id, "Apple", 2, 3, 6.0), (pear.id, "Pear", 1, 1, 3.0)])
+        self.assertEqual(db.verify_summaries(), {})
+
+    def test_delete_order_and_reindex(self):
+        client = self.make_client()
+        apple = self.make_product("Apple", 2.0)
+        first = self.make_order(client, [(apple, 2)])
+        self.make_order(client, [(apple, 5)], datetime.date(2025, 1, 3))
+        db.delete_order(first.id)
+        db.reindex_orders()
+        self.assertEqual(db.get_daily_sales(), [('2025-01-03', 1, 5, 10.0)])
+        self.assertEqual(db.verify_summaries(), {})
+
+    def test_price_change_and_client_reindex(self):
+        first, second = self.make_client("First"), self.make_client("Second")
+        apple = self.make_product("Apple", 2.0)
+        self.make_order(second, [(apple, 4)])
+        apple.price = 5.0
+        db.update_product(apple)
+        db.delete_client(first.id)
+        db.reindex_clients()
+        self.assertEqual(db.get_client_totals(), [(1, "Second", 1, 4, 20.0)])
+        self.assertEqual(db.verify_summaries(), {})
+
+    def test_rebuild_reports_drift(self):
+        client = self.make_client()
+        apple = self.make_product("Apple", 2.0)
+        self.make_order(client, [(apple, 1)])
+        conn = db.connect()
+        conn.execute('UPDATE sales_daily SET orders = 10')
+        conn.commit()
+        conn.close()
+        self.assertEqual(db.rebuild_summaries(), {'sales_daily': 1})
+        self.assertEqual(db.verify_summaries(), {})
+
+class TestOrderSummaries(DbTestCase):
+    def test_rows_match_hydrated_orders(self):
+        alice = self.make_client("Alice")
+        apple, pear = self.make_product("Apple", 2.0), self.make_product("Pear", 3.5)
+        self.make_order(alice, [(pear, 1), (apple, 3)], datetime.date(2025, 1, 2))
+        empty = self.make_order(alice, [], datetime.date(2025, 1, 3))
+        rows = db.get_order_summaries()
+        self.assertEqual(rows[0], (1, alice.id, "Alice", '2025-01-02', 9.5, f'{apple.id}:3;{pear.id}:1',
+                                   "Apple x 3, Pear x 1"))
+        self.assertEqual(rows[1], (empty.id, alice.id, "Alice", '2025-01-03', 0, '', ''))
+        self.assertEqual([round(r[4], 2) for r in rows], [o.calculate_total() for o in db.get_all_orders()])
+        self.assertEqual([r[0] for r in db.get_order_summaries(date_from=datetime.date(2025, 1, 3))], [empty.id])
+
+    def test_csv_export_and_archive(self):
+        alice = self.make_client("Alice")
+        apple = self.make_product("Apple", 2.0)
+        self.make_order(alice, [(apple, 1)], datetime.date(2024, 1, 1))
+        self.make_order(alice, [(apple, 2)], datetime.date(2025, 1, 1))
+        archive_orders(datetime.date(2025, 1, 1), self.temp_path('archive.db'))
+        self.assertEqual([r[0] for r in db.get_order_summaries()], [2])
+        self.assertEqual([r[5] for r in db.get_order_summaries(include_archive=True)], [f'{apple.id}:1', f'{apple.id}:2'])
+        path = self.temp_path('orders.csv')
+        db.export_orders_to_csv(path, include_archive=True)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines(), ['id,client_id,date,items', f'1,{alice.id},2024-01-01,{apple.id}:1',
+                                                     f'2,{alice.id},2025-01-01,{apple.id}:2'])
+
+class TestUpsertImport(DbTestCase):
+    def write_csv(self, lines):
+        fd, path = tempfile.mkstemp(suffix='.csv', dir=self.tmp_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_reimport_clients_is_idempotent(self):
+        path = self.write_csv(['id,name,email,phone,address', '1,Ann,ann@email.com,+100,A', '2,Bob,bob@email.com,+200,B'])
+        self.assertEqual(db.import_clients_from_csv(path), {'inserted': 2, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(db.import_clients_from_csv(path), {'inserted': 0, 'updated': 0, 'unchanged': 2})
+        self.assertEqual(len(db.get_all_clients()), 2)
+
+    def test_upsert_updates_changed_clients(self):
+        self.make_client("Ann", "ann@email.com")
+        path = self.write_csv(['id,name,email,phone,address', '7,Anna,ann@email.com,+100,A', '8,Eve,eve@email.com,+300,C'])
+        self.assertEqual(db.import_clients_from_csv(path), {'inserted': 1, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(sorted(c.name for c in db.get_all_clients()), ["Anna", "Eve"])
+
+    def test_upsert_products_by_name_and_category(self):
+        apple = self.make_product("Apple", 2.0)
+        path = self.write_csv(['id,name,price,category,quantity', '1,Apple,2.5,Cat,100', '2,Apple,1.0,Other,5'])
+        self.assertEqual(db.import_products_from_csv(path), {'inserted': 1, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(db.get_product_by_id(apple.id).price, 2.5)
+
+    def test_product_thresholds_round_trip(self):
+        for export, import_ in ((db.export_products_to_csv, db.import_products_from_csv),
+                                (db.export_products_to_json, db.import_products_from_json)):
+            with self.subTest(export.__name__):
+                source = db.use_database(':memory:')
+                self.addCleanup(source.close)
+                db.add_product(Product("Tea", 5.0, "Drinks", 3, 10))
+                db.add_product(Product("Salt", 1.0, "Food", 50, 0))
+                path = self.temp_path('products' + ('.csv' if 'csv' in export.__name__ else '.json'))
+                export(path)
+                self.addCleanup(db.use_database(':memory:').close)
+                import_(path)
+                self.assertEqual([(p.name, p.reorder_threshold) for p in db.get_all_products()],
+                                 [("Tea", 10), ("Salt", 0)])
+                self.assertEqual([p.name for p in db.get_low_stock_products()], ["Tea"])
+
+    def test_products_without_threshold_column(self):
+        tea = Product("Tea", 5.0, "Cat", 3, 10)
+        db.add_product(tea)
+        path = self.write_csv(['id,name,price,category,quantity', '1,Tea,6.0,Cat,3', '2,Salt,1.0,Cat,50'])
+        self.assertEqual(db.import_products_from_csv(path), {'inserted': 1, 'updated': 1, 'unchanged': 0})
+        self.assertEqual([(p.name, p.price, p.reorder_threshold) for p in db.get_all_products()],
+                         [("Tea", 6.0, 10), ("Salt", 1.0, 0)])  # Порог существующего товара сохранен
+
+    def test_json_thresholds_all_or_none(self):
+        db.add_product(Product("Tea", 5.0, "Cat", 3, 10))
+        path = self.temp_path('products.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([{'name': "Tea", 'price': 6.0, 'category': "Cat", 'quantity': 3},
+                       {'name': "Salt", 'price': 1.0, 'category': "Cat", 'quantity': 50, 'reorder_threshold': 5}], f)
+        with self.assertRaises(ValueError):
+            db.import_products_from_json(path)
+        self.assertEqual([(p.name, p.price, p.reorder_threshold) for p in db.get_all_products()], [("Tea", 5.0, 10)])
+
+    def test_insert_mode_is_all_or_nothing(self):
+        self.make_client("Ann", "ann@email.com")
+        path = self.write_csv(['id,name,email,phone,address', '1,Bob,bob@email.com,+200,B', '2,Ann,ann@email.com,+100,A'])
+        with self.assertRaises(db.sqlite3.IntegrityError):
+            db.import_clients_from_csv(path, mode='insert')
+        self.assertEqual([c.name for c in db.get_all_clients()], ["Ann"])  # Bob не добавлен
+        path = self.write_csv(['id,name,email,phone,address', '1,Bob,bob@email.com,+200,B'])
+        self.assertEqual(db.import_clients_from_csv(path, mode='insert')['inserted'], 1)
+
+    def test_products_without_category_are_matched(self):
+        db.add_product(Product("Salt", 1.0, None, 5))
+        rows = [("Salt", 1.5, None, 7), ("Salt", 1.5, None, 8)]
+        self.assertEqual(db.upsert_rows('idx_products_name_category', ('name', 'price', 'category', 'quantity'), rows),
+                         {'inserted': 0, 'updated': 1, 'unchanged': 0})
+        self.assertEqual([(p.price, p.quantity) for p in db.get_all_products()], [(1.5, 8)])
+
+    def test_duplicates_disable_upsert_with_clear_error(self):
+        conn = db.connect()
+        conn.execute('DROP INDEX idx_clients_email')
+        conn.executemany("INSERT INTO clients (name, email, phone) VALUES (?, 'ann@email.com', '+1')", [("Ann",), ("Anna",)])
+        conn.commit()
+        conn.close()
+        with self.assertLogs('db', 'WARNING'):
+            db.init_db()
+        path = self.write_csv(['id,name,email,phone,address', '1,Ann,ann@email.com,+100,A'])
+        with self.assertRaisesRegex(ValueError, 'clients 1 повторяющихся'):
+            db.import_clients_from_csv(path)
+
+class TestDatabaseTarget(DbTestCase):
+    def test_memory_databases_are_isolated(self):
+        self.make_client("Alice")
+        first = db.database()
+        db.use_database(':memory:')
+        self.assertEqual(db.get_all_clients(), [])
+        self.assertIsNone(db.database().path)
+        self.assertNotEqual(db.database().target, first.target)
+        first.close()
+
+    def test_file_target_and_environment(self):
+        path = self.temp_path('shop.db')
+        with patch.dict(os.environ, {db.DB_ENV_VAR: path}):
+            db.use_database()
+        self.assertEqual(db.database().path, path)
+        self.make_client("Alice")
+        self.assertTrue(os.path.exists(path))
+
+    def test_failed_initialization_is_retried(self):
+        path = self.temp_path('locked.db')
+        holder = db.sqlite3.connect(path, isolation_level=None)
+        holder.execute('BEGIN EXCLUSIVE')
+        with patch.object(db, 'BUSY_TIMEOUT', 0.05), patch.object(db, 'RETRY_ATTEMPTS', 0):
+            with self.assertRaisesRegex(db.sqlite3.OperationalError, 'locked'):
+                db.use_database(path)
+        holder.execute('ROLLBACK')
+        holder.close()
+        self.assertEqual(db.get_all_clients(), [])  # Схема создается при следующем обращении
+
+    def test_archive_from_memory_goes_to_file(self):
+        client = self.make_client()
+        self.make_order(client, [(self.make_product(), 1)], datetime.date(2024, 1, 1))
+        archive_orders(datetime.date(2025, 1, 1), self.temp_path('archive.db'))
+        self.assertTrue(os.path.exists(self.temp_path('archive.db')))
+        self.assertEqual(len(db.get_all_orders(include_archive=True)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import MagicMock
+from types import SimpleNamespace
+import events
+from events import EventBus, ChangeEvent
+from gui import OrderManagementApp, RefreshScheduler
+from segmentation import SEGMENTS
+from test_db import DbTestCase
+
+class TestEventBus(unittest.TestCase):
+    def test_filter_by_entity_and_operation(self):
+        bus = EventBus()
+        received = []
+        bus.subscribe(received.append, 'clients', ('update',))
+        bus.publish(ChangeEvent('clients', 'insert', [1]))
+        bus.publish(ChangeEvent('products', 'update', [1]))
+        bus.publish(ChangeEvent('clients', 'update', [2]))
+        self.assertEqual(received, [ChangeEvent('clients', 'update', [2])])
+
+    def test_unsubscribe(self):
+        bus = EventBus()
+        callback = MagicMock()
+        token = bus.subscribe(callback)
+        bus.unsubscribe(token)
+        bus.publish(ChangeEvent('orders', 'delete', [1]))
+        callback.assert_not_called()
+
+    def test_unknown_entity(self):
+        with self.assertRaises(ValueError):
+            ChangeEvent('users', 'insert')
+
+class TestDbEvents(DbTestCase):
+    def test_mutations_publish_events(self):
+        received = []
+        token = events.subscribe(received.append)
+        self.addCleanup(events.unsubscribe, token)
+        client = self.make_client()
+        product = self.make_product()
+        order = self.make_order(client, [(product, 1)])
+        db_events = [(e.entity, e.operation, e.ids) for e in received]
+        self.assertEqual(db_events, [('clients', 'insert', (client.id,)), ('products', 'insert', (product.id,)),
+                                     ('orders', 'insert', (order.id,))])
+
+class TestRefreshScheduler(unittest.TestCase):
+    def test_burst_is_coalesced(self):
+        root = MagicMock()
+        scheduler = RefreshScheduler(root)
+        refresh_orders, refresh_clients = MagicMock(), MagicMock()
+        for _ in range(10):
+            scheduler.request('orders', refresh_orders)
+        scheduler.request('clients', refresh_clients)
+        root.after_idle.assert_called_once()
+        root.after_idle.call_args[0][0]()
+        refresh_orders.assert_called_once()
+        refresh_clients.assert_called_once()
+
+class TestLazyTabs(unittest.TestCase):
+    def make_app(self):
+        def notebook(selected):
+            tabs = MagicMock()
+            tabs.select.return_value = selected
+            tabs.nametowidget.side_effect = lambda name: name
+            return tabs
+        app = SimpleNamespace(loaded_views=set(), refresh_scheduler=MagicMock(),
+                              view_refreshers={view: MagicMock() for view in ('clients', 'order_clients', 'orders')})
+        app.notebook, app.orders_notebook = notebook('clients_tab'), notebook('create_frame')
+        app.tab_views = {'clients_tab': ('clients',), 'create_frame': ('order_clients',), 'view_frame': ('orders',)}
+        app.sub_notebooks = {'orders_tab': app.orders_notebook}
+        return app
+
+    def test_tab_is_loaded_once_when_shown(self):
+        app = self.make_app()
+        OrderManagementApp.load_visible_views(app)
+        OrderManagementApp.load_visible_views(app)
+        app.view_refreshers['clients'].assert_called_once()
+        app.view_refreshers['order_clients'].assert_not_called()  # Подвкладка выбрана, но вкладка Заказы скрыта
+        app.notebook.select.return_value = 'orders_tab'
+        OrderManagementApp.load_visible_views(app)
+        app.view_refreshers['order_clients'].assert_called_once()
+        app.view_refreshers['orders'].assert_not_called()
+        self.assertEqual(app.loaded_views, {'clients', 'order_clients'})
+
+    def test_events_skip_views_never_shown(self):
+        app = self.make_app()
+        app.loaded_views.add('clients')
+        OrderManagementApp.request_refresh(app, 'orders', app.view_refreshers['orders'])
+        app.refresh_scheduler.request.assert_not_called()
+        OrderManagementApp.request_refresh(app, 'clients', app.view_refreshers['clients'])
+        app.refresh_scheduler.request.assert_called_once_with('clients', app.view_refreshers['clients'])
+
+    def test_orders_refresh_clients_only_with_segment_filter(self):
+        app = SimpleNamespace(client_segment=MagicMock(), request_refresh=MagicMock(),
+                              view_refreshers={'clients': MagicMock()})
+        app.client_segment.get.return_value = "Все"
+        OrderManagementApp.refresh_client_segments(app)
+        app.request_refresh.assert_not_called()
+        app.client_segment.get.return_value = SEGMENTS[0]
+        OrderManagementApp.refresh_client_segments(app)
+        app.request_refresh.assert_called_once_with('clients', app.view_refreshers['clients'])
+
+class TestSnapshotRefresh(unittest.TestCase):
+    def make_app(self):
+        app = SimpleNamespace(root=MagicMock(), snapshot_job=None, snapshot_refresh_id=None,
+                              use_report_snapshot=MagicMock(), snapshot_status_label=MagicMock(),
+                              run_analysis=MagicMock())
+        app.refresh_report_snapshot = lambda: OrderManagementApp.refresh_report_snapshot(app)
+        app.toggle_report_snapshot = lambda: OrderManagementApp.toggle_report_snapshot(app)
+        app.on_snapshot_error = lambda error: OrderManagementApp.on_snapshot_error(app, error)
+        return app
+
+    def test_tick_skipped_while_previous_refresh_runs(self):
+        app = self.make_app()
+        app.run_analysis.return_value = SimpleNamespace(finished=False)
+        OrderManagementApp.refresh_report_snapshot(app)
+        OrderManagementApp.refresh_report_snapshot(app)
+        app.run_analysis.assert_called_once()
+        self.assertEqual(app.root.after.call_count, 2)  # Расписание сохраняется
+        app.snapshot_job.finished = True
+        OrderManagementApp.refresh_report_snapshot(app)
+        self.assertEqual(app.run_analysis.call_count, 2)
+
+    def test_error_turns_snapshot_mode_off(self):
+        app = self.make_app()
+        OrderManagementApp.refresh_report_snapshot(app)
+        on_error = app.run_analysis.call_args.kwargs['on_error']
+        app.use_report_snapshot.get.return_value = False
+        on_error(OSError("read-only file system"))
+        app.use_report_snapshot.set.assert_called_once_with(False)
+        app.root.after_cancel.assert_called_once_with(app.root.after.return_value)
+        self.assertIsNone(app.snapshot_refresh_id)
+        self.assertIn("read-only file system", app.snapshot_status_label.config.call_args.kwargs['text'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import datetime
+import numpy as np
+from forecasting import daily_demand_matrix, smooth_demand, forecast_stockouts
+from test_db import DbTestCase
+
+END = datetime.date(2025, 1, 10)
+
+class TestSmoothDemand(unittest.TestCase):
+    def test_mean_and_ewm_are_vectorized_over_products(self):
+        demand = np.array([[0, 4], [2, 4], [4, 4]], dtype=float)
+        np.testing.assert_allclose(smooth_demand(demand, 'mean', window=2), [3, 4])
+        level = demand[:, 0].mean()
+        for value in demand[:, 0]:
+            level = 0.5 * value + 0.5 * level
+        np.testing.assert_allclose(smooth_demand(demand, 'ewm', alpha=0.5), [level, 4])
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            smooth_demand(np.zeros((3, 2)), 'median')
+
+class TestForecast(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        client = self.make_client()
+        self.fast = self.make_product("Fast", quantity=20)
+        self.slow = self.make_product("Slow", quantity=100)
+        self.idle = self.make_product("Idle", quantity=5)
+        for day in range(1, 11):
+            self.make_order(client, [(self.fast, 4), (self.slow, 1)], datetime.date(2025, 1, day))
+        self.make_order(client, [(self.idle, 3)], datetime.date(2024, 1, 1))  # За пределами окна
+
+    def test_daily_demand_matrix(self):
+        dates, products, demand = daily_demand_matrix(days=10, end=END)
+        self.assertEqual(len(dates), 10)
+        self.assertEqual(list(products['name']), ["Fast", "Slow", "Idle"])
+        np.testing.assert_array_equal(demand.sum(axis=0), [40, 10, 0])
+
+    def test_forecast_stockouts(self):
+        result = forecast_stockouts(days=10, method='mean', lead_time=3, safety_days=2, cover_days=5, end=END)
+        self.assertEqual(list(result['name']), ["Fast", "Slow", "Idle"])
+        fast = result.iloc[0]
+        self.assertAlmostEqual(fast['daily_demand'], 4.0)
+        self.assertAlmostEqual(fast['days_until_stockout'], 5.0)
+        self.assertEqual(fast['reorder_quantity'], 20)  # 4 * (3 + 2 + 5) - 20
+        self.assertTrue(fast['needs_reorder'])
+        self.assertFalse(result.iloc[1]['needs_reorder'])
+        idle = result.iloc[2]
+        self.assertEqual(idle['days_until_stockout'], np.inf)
+        self.assertEqual(idle['reorder_quantity'], 0)
+        self.assertFalse(idle['needs_reorder'])
+
+if __name__ == '__main__':
+    unittest.main()
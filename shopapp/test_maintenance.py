@@ -0,0 +1,67 @@
+import unittest
+import sqlite3
+from unittest.mock import patch
+import db
+import maintenance
+from models import Client
+from test_db import DbTestCase
+
+class TestMaintenance(DbTestCase):
+    def fill_and_delete(self, count=2000):
+        conn = db.connect()
+        conn.executemany('INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)',
+                         [(f"Client {i}", f"c{i}@email.com", "+1234567890", "x" * 200) for i in range(count)])
+        conn.execute('DELETE FROM clients')
+        conn.commit()
+        conn.close()
+
+    def test_new_database_uses_incremental_vacuum(self):
+        self.assertEqual(maintenance.database_stats()['auto_vacuum'], db.AUTO_VACUUM_INCREMENTAL)
+
+    def test_existing_database_is_migrated(self):
+        path = self.temp_path('old.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, '
+                     'email TEXT NOT NULL, phone TEXT NOT NULL, address TEXT)')
+        conn.execute("INSERT INTO clients (name, email, phone) VALUES ('Old', 'old@email.com', '+1')")
+        conn.commit()
+        conn.close()
+        db.use_database(path)
+        self.assertEqual(maintenance.database_stats()['auto_vacuum'], db.AUTO_VACUUM_INCREMENTAL)
+        self.assertEqual([c.name for c in db.get_all_clients()], ["Old"])
+
+    def test_vacuum_and_analyze_follow_thresholds(self):
+        db.add_client(Client("Alice", "alice@email.com", "+1234567890"))
+        report = maintenance.run_maintenance()
+        self.assertFalse(report['vacuumed'])
+        self.assertFalse(report['analyzed'])
+        self.assertTrue(report['optimized'])
+
+        self.fill_and_delete()
+        stats = maintenance.database_stats()
+        self.assertGreater(stats['freelist_count'], maintenance.FREE_PAGES_MIN)
+        self.assertGreaterEqual(stats['changes_since_analyze'], maintenance.ANALYZE_CHANGES)
+        report = maintenance.run_maintenance()
+        self.assertTrue(report['vacuumed'])
+        self.assertTrue(report['analyzed'])
+        self.assertEqual(report['pages_freed'], stats['freelist_count'])
+        self.assertGreater(report['bytes_reclaimed'], 0)
+        self.assertEqual(maintenance.database_stats()['changes_since_analyze'], 0)
+        self.assertIn("очистка", maintenance.format_report(report))
+
+    def test_force_runs_everything(self):
+        report = maintenance.run_maintenance(force=True, optimize=False)
+        self.assertTrue(report['analyzed'])
+        self.assertFalse(report['optimized'])
+        conn = db.connect()
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+        self.assertIn('sqlite_stat1', tables)
+
+    def test_shutdown_maintenance_swallows_errors(self):
+        with patch('maintenance.run_maintenance', side_effect=sqlite3.OperationalError("disk I/O error")), \
+                patch('builtins.print'):
+            self.assertIsNone(maintenance.shutdown_maintenance())
+
+if __name__ == '__main__':
+    unittest.main()
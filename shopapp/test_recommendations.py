@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+import db
+from columnar import export_snapshot, import_snapshot
+from recommendations import top_k_related, build_recommendations, get_related_products
+from test_db import DbTestCase
+
+class TestTopK(unittest.TestCase):
+    def test_ranks_by_cosine_score(self):
+        rows = np.array([1, 1, 1, 2, 3, 4])
+        cols = np.array([2, 3, 4, 1, 1, 1])
+        together = np.array([2, 1, 1, 2, 1, 1])
+        frequency = np.array([[1, 4], [2, 2], [3, 1], [4, 4]])
+        r, ranks, c, t, scores = top_k_related(rows, cols, together, frequency, top_k=2)
+        self.assertEqual(list(r), [1, 1, 2, 3, 4])
+        self.assertEqual(list(ranks), [1, 2, 1, 1, 1])
+        self.assertEqual(list(c[:2]), [2, 3])  # 2/sqrt(8) > 1/sqrt(4) > 1/sqrt(16)
+        np.testing.assert_allclose(scores[:2], [2 / np.sqrt(8), 0.5])
+
+    def test_min_together(self):
+        r, *_ = top_k_related(np.array([1, 2]), np.array([2, 1]), np.array([1, 1]),
+                              np.array([[1, 1], [2, 1]]), min_together=2)
+        self.assertEqual(len(r), 0)
+
+class TestRecommendations(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        client = self.make_client()
+        self.salt, self.bread, self.butter, self.milk = (self.make_product(n) for n in ("Salt", "Bread", "Butter", "Milk"))
+        self.make_order(client, [(self.bread, 1), (self.butter, 1)])
+        self.make_order(client, [(self.bread, 1), (self.butter, 1), (self.milk, 1)])
+        self.make_order(client, [(self.salt, 1)])
+
+    def test_build_and_lookup(self):
+        stats = build_recommendations()
+        self.assertEqual(stats['products'], 3)
+        self.assertEqual(stats['rows'], 6)
+        related = get_related_products([self.bread.id])
+        self.assertEqual([name for _, name, _ in related], ["Butter", "Milk"])
+        self.assertEqual(get_related_products([self.salt.id]), [])
+        self.assertEqual([name for _, name, _ in get_related_products([self.bread.id, self.butter.id])], ["Milk"])
+
+    def test_reindex_keeps_recommendations(self):
+        build_recommendations()
+        db.delete_order(3)
+        db.delete_product(self.salt.id)
+        db.reindex_products()
+        related = get_related_products([1])  # Bread получил ID 1
+        self.assertEqual([name for _, name, _ in related], ["Butter", "Milk"])
+        self.assertEqual([pid for pid, _, _ in related], [2, 3])
+
+    def test_snapshot_import_clears_recommendations(self):
+        build_recommendations()
+        snapshot = self.temp_path('snapshot.npz')
+        export_snapshot(snapshot)
+        with np.load(snapshot) as data:
+            arrays = {key: data[key] for key in data.files}
+        # Другой каталог с теми же ID и без заказов
+        arrays['products.name'] = np.array(['X1', 'X2', 'X3', 'X4'])
+        for key in ('orders.id', 'orders.client_id', 'order_products.order_id', 'order_products.product_id',
+                    'order_products.quantity'):
+            arrays[key] = arrays[key][:0]
+        arrays['orders.date'] = arrays['orders.date'][:0]
+        np.savez(snapshot, **arrays)
+        import_snapshot(snapshot)
+        self.assertEqual(get_related_products([self.bread.id]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import datetime
+import sqlite3
+import threading
+import db
+from report_snapshot import SNAPSHOT_MMAP_SIZE, is_stale, reading_snapshot, refresh_snapshot
+from runner import AnalysisRunner
+from test_db import DbTestCase
+
+class TestReportSnapshot(DbTestCase):
+    IN_MEMORY = False  # Снимок снимается в файл рядом с рабочей базой
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.make_client()
+        self.tea = self.make_product("Tea", 5.0)
+        self.make_order(self.client, [(self.tea, 2)], datetime.date(2025, 1, 1))
+
+    def test_snapshot_is_point_in_time_and_read_only(self):
+        self.assertTrue(is_stale())
+        self.assertIsNotNone(refresh_snapshot())
+        self.assertIsNone(refresh_snapshot())  # Данные не менялись
+        self.make_order(self.client, [(self.tea, 1)], datetime.date(2025, 1, 2))
+        with reading_snapshot() as context:
+            self.assertIn('immutable=1', context.target)
+            self.assertEqual(len(db.get_order_summaries()), 1)
+            conn = db.connect()
+            self.assertEqual(conn.execute('PRAGMA mmap_size').fetchone()[0], SNAPSHOT_MMAP_SIZE)
+            conn.close()
+            with self.assertRaises(sqlite3.OperationalError):
+                self.make_client("Other", "other@example.com")
+            seen = []
+            thread = threading.Thread(target=lambda: seen.append(len(db.get_order_summaries())))
+            thread.start()
+            thread.join()
+            self.assertEqual(seen, [2])  # Другие потоки работают с рабочей базой
+        self.assertEqual(len(db.get_order_summaries()), 2)
+        self.assertTrue(is_stale())
+        refresh_snapshot()
+        with reading_snapshot():
+            self.assertEqual(len(db.get_order_summaries()), 2)
+
+    def test_export_and_workers_read_snapshot(self):
+        refresh_snapshot()
+        self.make_order(self.client, [(self.tea, 1)], datetime.date(2025, 1, 2))
+        runner = AnalysisRunner(workers=1)
+        self.addCleanup(runner.cancel_all)
+        filename = self.temp_path('orders.csv')
+        with reading_snapshot():
+            db.export_orders_to_csv(filename)
+            job = runner.submit(db.get_order_summaries)
+        self.assertTrue(runner.wait(30))
+        self.assertEqual(len(job.result), 1)
+        with open(filename, encoding='utf-8') as f:
+            self.assertEqual(len(f.read().splitlines()), 2)  # Заголовок и заказ из снимка
+
+class TestReportSnapshotMemory(DbTestCase):
+    def test_memory_database_needs_path(self):
+        with self.assertRaises(ValueError):
+            refresh_snapshot()
+        self.make_client()
+        with reading_snapshot(self.temp_path('snapshot.db')):
+            self.assertEqual(len(db.get_all_clients()), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import datetime
+import time
+import charts
+from runner import AnalysisRunner
+from test_db import DbTestCase
+
+class TestRunner(DbTestCase):
+    IN_MEMORY = False  # Рабочие процессы читают файл базы
+
+    def setUp(self):
+        super().setUp()
+        self.runner = AnalysisRunner(workers=2)
+        self.addCleanup(self.runner.cancel_all)
+
+    def test_reports_computed_in_workers(self):
+        client = self.make_client()
+        self.make_order(client, [(self.make_product("Tea", 5.0), 2)], datetime.date(2025, 1, 1))
+        results = {}
+        for name in ('top_clients', 'revenue_by_product', 'order_dynamics'):
+            self.runner.submit(charts.chart_data, name, on_done=lambda result, name=name: results.update({name: result}))
+        self.assertTrue(self.runner.wait(30))
+        self.assertEqual(set(results), {'top_clients', 'revenue_by_product', 'order_dynamics'})
+        version, data = results['revenue_by_product']
+        self.assertEqual(list(data['revenue']), [10.0])
+        chart = charts.chart_from_data('revenue_by_product', results['revenue_by_product'])
+        self.assertIs(charts.render_chart('revenue_by_product'), chart)  # Результат процесса попал в кэш
+
+    def test_timeout_and_cancel_stop_process(self):
+        errors = []
+        slow = self.runner.submit(time.sleep, 30, timeout=0.5, on_error=errors.append)
+        cancelled = self.runner.submit(time.sleep, 30, on_done=errors.append)
+        queued = self.runner.submit(time.sleep, 30)  # Оба места заняты: ждет в очереди
+        self.assertEqual(queued.state, 'pending')
+        self.assertTrue(self.runner.cancel(queued))
+        self.assertTrue(self.runner.cancel(cancelled))
+        self.assertFalse(cancelled.process.is_alive())
+        start = time.monotonic()
+        self.assertTrue(self.runner.wait(10))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual((slow.state, cancelled.state, queued.state), ('timeout', 'cancelled', 'cancelled'))
+        self.assertIsInstance(errors[0], TimeoutError)
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(self.runner.cancel(slow))
+
+    def test_errors_are_returned(self):
+        job = self.runner.submit(charts.chart_data, 'unknown')
+        self.runner.wait(30)
+        self.assertEqual(job.state, 'failed')
+        self.assertIsInstance(job.error, ValueError)
+
+class TestRunnerMemory(DbTestCase):
+    def test_memory_database_is_rejected(self):
+        with self.assertRaises(ValueError):
+            AnalysisRunner().submit(time.sleep, 0)
+
+if __name__ == '__main__':
+    unittest.main()
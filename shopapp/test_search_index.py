@@ -0,0 +1,74 @@
+import unittest
+from models import Client
+from search_index import PrefixIndex, LiveIndex, text_keys
+from db import get_all_clients, get_client_by_id, update_client, delete_client, reindex_clients
+from test_db import DbTestCase
+
+def make(client_id, name, email):
+    client = Client(name, email, "+1234567890")
+    client.id = client_id
+    return client
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex(lambda c: text_keys(c.name, c.email))
+        self.index.rebuild([make(1, "Анна Петрова", "anna@mail.ru"), make(2, "Петр Иванов", "petr@mail.ru"),
+                            make(3, "Иван Сидоров", "ivan@example.com")])
+
+    def names(self, prefix):
+        return [c.name for c in self.index.search(prefix)]
+
+    def test_search_by_word_and_email_prefix(self):
+        self.assertEqual(self.names("пет"), ["Анна Петрова", "Петр Иванов"])
+        self.assertEqual(self.names("ИВАН"), ["Петр Иванов", "Иван Сидоров"])
+        self.assertEqual(self.names("ivan@"), ["Иван Сидоров"])
+        self.assertEqual(self.names("mail"), ["Анна Петрова", "Петр Иванов"])
+        self.assertEqual(self.names("zzz"), [])
+        self.assertEqual(len(self.index.search("")), 3)
+
+    def test_incremental_updates(self):
+        self.index.add(make(2, "Павел Иванов", "pavel@mail.ru"))
+        self.assertEqual(self.names("пет"), ["Анна Петрова"])
+        self.assertEqual([c.id for c in self.index.search("")], [1, 2, 3])  # Обновление не меняет порядок
+        self.index.discard(1)
+        self.assertEqual(self.names("пет"), [])
+        self.index.add(make(4, "Петр Новый", "new@mail.ru"))
+        self.assertEqual(self.names("петр"), ["Петр Новый"])
+
+    def test_search_reads_only_matching_range(self):
+        class CountingList(list):
+            reads = 0
+
+            def __getitem__(self, position):
+                CountingList.reads += 1
+                return super().__getitem__(position)
+
+        index = PrefixIndex(lambda c: text_keys(c.name, c.email))
+        index.rebuild(make(i, f"Клиент {i}", f"client{i}@example.com") for i in range(50_000))
+        index._entries = CountingList(index._entries)
+        self.assertEqual([c.id for c in index.search("client12345@")], [12345])
+        self.assertLess(CountingList.reads, 50)  # Двоичный поиск и одно совпадение, не просмотр ~150 тыс. ключей
+        CountingList.reads = 0
+        self.assertEqual([c.id for c in index.search("client1234")], list(range(1234, 1235)) + list(range(12340, 12350)))
+        self.assertLess(CountingList.reads, 60)
+
+class TestLiveIndex(DbTestCase):
+    def test_follows_data_layer_events(self):
+        anna = self.make_client("Anna")
+        index = LiveIndex('clients', get_all_clients, get_client_by_id, lambda c: text_keys(c.name, c.email))
+        try:
+            self.assertEqual([c.name for c in index.search("an")], ["Anna"])
+            boris = self.make_client("Boris")
+            self.assertEqual([c.id for c in index.search("bor")], [boris.id])
+            anna.name, anna.email = "Alla", "alla@email.com"
+            update_client(anna)
+            self.assertEqual(index.search("anna"), [])
+            self.assertEqual([c.name for c in index.search("al")], ["Alla"])
+            delete_client(anna.id)
+            reindex_clients()
+            self.assertEqual([(c.id, c.name) for c in index.search("")], [(1, "Boris")])
+        finally:
+            index.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import datetime
+import numpy as np
+import db
+from segmentation import compute_rfm, get_segment_client_ids, export_rfm_to_csv, NO_ORDERS
+from test_db import DbTestCase
+
+TODAY = datetime.date(2025, 3, 1)
+
+class TestRfm(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = self.make_product("Item", 10.0)
+        self.clients = [self.make_client(f"Client{i}") for i in range(6)]
+        # Клиент i делает i + 1 заказ, последний за (5 - i) * 10 дней до TODAY; Client5 без заказов
+        for i, client in enumerate(self.clients[:5]):
+            for n in range(i + 1):
+                self.make_order(client, [(self.item, 1)], TODAY - datetime.timedelta(days=(5 - i) * 10 + n))
+
+    def test_scores_and_segments(self):
+        rfm = compute_rfm(TODAY).set_index('name')
+        self.assertEqual(list(rfm['frequency']), [1, 2, 3, 4, 5, 0])
+        self.assertEqual(list(rfm['recency'][:5]), [50, 40, 30, 20, 10])
+        self.assertTrue(np.isnan(rfm.loc["Client5", 'recency']))
+        self.assertEqual(list(rfm['r']), [1, 2, 3, 4, 5, 0])
+        self.assertEqual(list(rfm['f']), [1, 2, 3, 4, 5, 0])
+        self.assertEqual(rfm.loc["Client4", 'rfm'], '555')
+        self.assertEqual(rfm.loc["Client4", 'segment'], 'Чемпионы')
+        self.assertEqual(rfm.loc["Client0", 'segment'], 'Спящие')
+        self.assertEqual(rfm.loc["Client5", 'segment'], NO_ORDERS)
+        self.assertEqual(get_segment_client_ids(NO_ORDERS), {self.clients[5].id})
+
+    def test_chunked_read_matches(self):
+        whole = compute_rfm(TODAY, chunk_size=100)
+        db.update_product(self.item)  # Смена версии сбрасывает кэш
+        chunked = compute_rfm(TODAY, chunk_size=2)
+        self.assertTrue(whole.equals(chunked))
+
+    def test_cache_invalidated_by_new_order(self):
+        self.assertEqual(compute_rfm(TODAY).loc[5, 'segment'], NO_ORDERS)
+        version = db.get_data_version('orders')
+        self.make_order(self.clients[5], [(self.item, 1)], TODAY)
+        self.assertGreater(db.get_data_version('orders'), version)
+        self.assertNotEqual(compute_rfm(TODAY).loc[5, 'segment'], NO_ORDERS)
+
+    def test_export_csv(self):
+        path = self.temp_path('rfm.csv')
+        export_rfm_to_csv(path)
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[0].startswith('client_id,name,last_order'))
+        self.assertEqual(len(lines), 7)
+
+if __name__ == '__main__':
+    unittest.main()
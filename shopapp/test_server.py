@@ -0,0 +1,135 @@
+import unittest
+from unittest.mock import patch
+import http.client
+import json
+import threading
+import db
+from models import Product
+from server import create_server
+from test_db import DbTestCase
+
+class TestServer(DbTestCase):
+    IN_MEMORY = False  # Сервер открывает свои соединения из рабочих потоков
+
+    def setUp(self):
+        super().setUp()
+        self.make_client()
+        for i in range(5):
+            db.add_product(Product(f"Item{i}", 10.0 + i, "Cat", 3))
+        self.server = create_server(port=0, workers=2)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def request(self, method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        conn.close()
+        return response, json.loads(data) if data else None
+
+    def test_products_pagination(self):
+        response, data = self.request('GET', '/products?limit=2&offset=2')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data['total'], 5)
+        self.assertEqual([p['name'] for p in data['items']], ["Item2", "Item3"])
+        self.assertEqual(data['items'][0]['reorder_threshold'], 0)
+
+    def test_products_sorting(self):
+        response, data = self.request('GET', '/products?sort=-price&limit=2')
+        self.assertEqual([p['name'] for p in data['items']], ["Item4", "Item3"])
+        response, _ = self.request('GET', '/products?sort=phone')
+        self.assertEqual(response.status, 400)
+
+    def test_bad_pagination(self):
+        response, _ = self.request('GET', '/products?limit=0')
+        self.assertEqual(response.status, 400)
+
+    def test_etag_not_modified(self):
+        response, _ = self.request('GET', '/products')
+        etag = response.getheader('ETag')
+        self.assertIsNotNone(etag)
+        response, data = self.request('GET', '/products', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertIsNone(data)
+
+    def test_place_order(self):
+        response, data = self.request('POST', '/orders', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 2}]})
+        self.assertEqual(response.status, 201)
+        self.assertEqual(db.get_product_by_id(1).quantity, 1)
+        response, order = self.request('GET', f"/orders/{data['id']}")
+        self.assertEqual(order['items'], [{'product_id': 1, 'quantity': 2}])
+
+    def test_order_changes_etag(self):
+        response, _ = self.request('GET', '/products/1')
+        etag = response.getheader('ETag')
+        self.request('POST', '/orders', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 1}]})
+        response, data = self.request('GET', '/products/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data['quantity'], 2)
+
+    def test_insufficient_stock(self):
+        response, _ = self.request('POST', '/orders', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 10}]})
+        self.assertEqual(response.status, 409)
+        self.assertEqual(db.get_product_by_id(1).quantity, 3)
+
+    def test_unknown_client(self):
+        response, _ = self.request('POST', '/orders', {'client_id': 99, 'items': [{'product_id': 1, 'quantity': 1}]})
+        self.assertEqual(response.status, 404)
+
+    def test_bad_content_length(self):
+        for value in ('abc', '-5'):
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+            conn.putrequest('POST', '/orders')
+            conn.putheader('Content-Length', value)
+            conn.endheaders()
+            response = conn.getresponse()
+            self.assertEqual(response.status, 400)
+            self.assertIn('Content-Length', json.loads(response.read())['error'])
+            conn.close()
+
+    def hold_write_lock(self):
+        conn = db.sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    def test_busy_database_is_retried(self):
+        self.server.writer._conn.execute('PRAGMA busy_timeout = 50')
+        holder = self.hold_write_lock()
+        threading.Timer(0.2, lambda: (holder.execute('ROLLBACK'), holder.close())).start()
+        with patch('db.RETRY_ATTEMPTS', 10), patch('db.RETRY_BASE_DELAY', 0.05):
+            response, _ = self.request('POST', '/orders', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 1}]})
+        self.assertEqual(response.status, 201)
+
+    def test_busy_database_returns_503(self):
+        self.server.writer._conn.execute('PRAGMA busy_timeout = 50')
+        holder = self.hold_write_lock()
+        self.addCleanup(holder.close)
+        with patch('db.RETRY_ATTEMPTS', 1), patch('db.RETRY_BASE_DELAY', 0.01):
+            response, data = self.request('POST', '/orders', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 1}]})
+        self.assertEqual(response.status, 503)
+        self.assertIn('locked', data['error'])
+        holder.execute('ROLLBACK')
+        response, _ = self.request('POST', '/orders', {'client_id': 1, 'items': [{'product_id': 1, 'quantity': 1}]})
+        self.assertEqual(response.status, 201)
+
+    def test_read_errors_are_answered(self):
+        for error, status in ((db.sqlite3.OperationalError('database is locked'), 503),
+                              (db.sqlite3.DatabaseError('disk I/O error'), 500)):
+            def fail(conn, *args):
+                raise error
+            for path in ('/products', '/orders'):
+                with self.subTest(path=path, status=status), \
+                        patch.dict('server.ROUTES', {path[1:]: (fail, fail, path == '/products')}):
+                    response, data = self.request('GET', path)
+                    self.assertEqual(response.status, status)
+                    self.assertIn(str(error), data['error'])
+                    self.assertEqual(response.getheader('Retry-After') is not None, status == 503)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import db
+from models import Product
+from stock_alerts import LowStockWatch
+from test_db import DbTestCase
+
+class TestLowStock(DbTestCase):
+    def add(self, name, quantity, threshold):
+        product = Product(name, 10.0, "Cat", quantity, threshold)
+        db.add_product(product)
+        return product
+
+    def test_query_uses_partial_index(self):
+        self.add("Tea", 3, 5)
+        self.add("Coffee", 50, 5)
+        self.add("Sugar", 0, 0)  # Закончившийся товар на пороге и при нулевом пороге
+        self.assertEqual([p.name for p in db.get_low_stock_products()], ["Sugar", "Tea"])
+        self.assertEqual([p.name for p in db.get_low_stock_products([1, 2])], ["Tea"])
+        conn = db.connect()
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT id FROM products WHERE quantity <= reorder_threshold '
+                            'ORDER BY quantity, id').fetchall()
+        conn.close()
+        self.assertIn('idx_products_low_stock', plan[0][-1])
+
+    def test_watch_follows_stock_changes(self):
+        tea = self.add("Tea", 10, 5)
+        coffee = self.add("Coffee", 2, 5)
+        on_change = MagicMock()
+        watch = LowStockWatch(on_change)
+        self.addCleanup(watch.close)
+        self.assertEqual([p.name for p in watch.products()], ["Coffee"])
+
+        with patch('db.get_all_products', side_effect=AssertionError("полный просмотр каталога")):
+            tea.quantity = 4  # Заказ списал остаток ниже порога
+            db.update_product(tea)
+            self.assertEqual([(p.name, p.quantity) for p in watch.products()], [("Coffee", 2), ("Tea", 4)])
+            coffee.quantity = 100  # Поставка
+            db.update_product(coffee)
+            self.assertEqual([p.name for p in watch.products()], ["Tea"])
+            self.assertEqual(on_change.call_count, 2)
+            self.add("Milk", 100, 5)  # Не на пороге: список не изменился
+            self.assertEqual(on_change.call_count, 2)
+        db.delete_product(tea.id)
+        self.assertEqual(len(watch), 0)
+
+if __name__ == '__main__':
+    unittest.main()
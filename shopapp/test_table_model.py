@@ -0,0 +1,65 @@
+import unittest
+import datetime
+from unittest.mock import MagicMock
+from table_model import TableModel
+
+COLUMNS = [('ID', 'int'), ('Имя', 'text'), ('Дата', 'date'), ('Сумма', 'float')]
+ROWS = [
+    (10, "борис", datetime.date(2025, 1, 2), 5.0),
+    (2, "Анна", datetime.date(2024, 12, 31), 100.0),
+    (3, "анна", "2025-01-02", 20.5),
+    (4, None, datetime.date(2025, 1, 1), 5.0),
+]
+
+class TestTableModel(unittest.TestCase):
+    def setUp(self):
+        self.model = TableModel(COLUMNS)
+        self.model.set_rows(ROWS)
+
+    def ids(self):
+        return [row[0] for row in self.model.sorted_rows()]
+
+    def test_typed_sort(self):
+        self.model.toggle_sort('ID')
+        self.assertEqual(self.ids(), [2, 3, 4, 10])  # Числа, а не строки ("10" < "2")
+        self.model.toggle_sort('ID')
+        self.assertEqual(self.ids(), [10, 4, 3, 2])
+        self.model.toggle_sort('Дата')
+        self.assertEqual(self.ids(), [2, 4, 10, 3])
+        self.model.toggle_sort('Имя')
+        self.assertEqual(self.ids(), [2, 3, 10, 4])  # Без учета регистра, пустые в конце
+        self.model.toggle_sort('Имя')
+        self.assertEqual(self.ids(), [10, 2, 3, 4])  # По убыванию пустые тоже в конце
+
+    def test_descending_keeps_blanks_last(self):
+        self.model.set_rows(ROWS + [(5, '', datetime.date(2025, 1, 3), None)])
+        self.model.toggle_sort('Сумма')
+        self.model.toggle_sort('Сумма')
+        self.assertEqual(self.ids(), [2, 3, 10, 4, 5])
+        self.model.toggle_sort('Имя')
+        self.model.toggle_sort('ID', add=True)
+        self.model.toggle_sort('Имя', add=True)
+        self.assertEqual(self.model.sort_order, [('Имя', True), ('ID', False)])
+        self.assertEqual(self.ids(), [10, 2, 3, 4, 5])  # Пустые имена в конце, между собой по ID
+
+    def test_multi_column_sort(self):
+        self.model.toggle_sort('Сумма')
+        self.model.toggle_sort('ID', add=True)
+        self.model.toggle_sort('ID', add=True)
+        self.assertEqual(self.model.sort_order, [('Сумма', False), ('ID', True)])
+        self.assertEqual(self.ids(), [10, 4, 3, 2])
+        self.assertEqual(self.model.heading_text('ID'), "ID ▼2")
+        self.model.toggle_sort('Имя')
+        self.assertEqual(self.model.sort_order, [('Имя', False)])
+
+    def test_populate_single_pass(self):
+        tree = MagicMock()
+        tree.get_children.return_value = ('a', 'b')
+        self.model.toggle_sort('ID')
+        self.model.populate(tree)
+        tree.delete.assert_called_once_with('a', 'b')
+        self.assertEqual([call.kwargs['values'][0] for call in tree.insert.call_args_list], [2, 3, 4, 10])
+        tree.move.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
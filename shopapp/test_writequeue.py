@@ -0,0 +1,117 @@
+import unittest
+import sqlite3
+import threading
+import db
+from models import Client, Product, Order, OrderItem
+from events import subscribe, unsubscribe
+from writequeue import WriteQueue
+from test_db import DbTestCase
+
+class TestWriteQueue(DbTestCase):
+    def tearDown(self):
+        db.disable_write_queue()
+        super().tearDown()
+
+    def test_batches_writes_from_many_threads(self):
+        queue = db.enable_write_queue(max_batch=50, max_delay=0.05)
+        futures = []
+        lock = threading.Lock()
+
+        def produce(start):
+            for i in range(start, start + 50):
+                future = db.add_client(Client(f"Client{i}", f"c{i}@email.com", "+1234567890"))
+                with lock:
+                    futures.append(future)
+
+        threads = [threading.Thread(target=produce, args=(n * 50,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = [future.result(timeout=5) for future in futures]
+        self.assertEqual(sorted(ids), list(range(1, 201)))
+        self.assertEqual(queue.writes, 200)
+        self.assertLess(queue.batches, 200)
+        db.disable_write_queue()
+        self.assertEqual(len(db.get_all_clients()), 200)
+
+    def test_ids_assigned_and_order_uses_them(self):
+        db.enable_write_queue()
+        client = Client("Client", "client@email.com", "+1234567890")
+        product = Product("Item", 10.0, "Cat", 5)
+        db.add_client(client)
+        self.assertEqual(db.add_product(product).result(timeout=5), product.id)
+        product.quantity = 3
+        db.update_product(product).result(timeout=5)
+        self.make_order(client, [(product, 2)])
+        db.disable_write_queue()
+        self.assertEqual(db.get_product_by_id(product.id).quantity, 3)
+        [order] = db.get_all_orders()
+        self.assertEqual((order.client.id, order.calculate_total()), (client.id, 20.0))
+
+    def test_failed_write_does_not_abort_batch(self):
+        queue = db.enable_write_queue(max_delay=0.05)
+        first = db.add_client(Client("A", "same@email.com", "+1234567890"))
+        duplicate = db.add_client(Client("B", "same@email.com", "+1234567890"))
+        last = db.add_client(Client("C", "other@email.com", "+1234567890"))
+        self.assertEqual(first.result(timeout=5), 1)
+        with self.assertRaises(sqlite3.IntegrityError):
+            duplicate.result(timeout=5)
+        self.assertIsNotNone(last.result(timeout=5))
+        queue.flush()
+        self.assertEqual([c.name for c in db.get_all_clients()], ["A", "C"])
+
+    def test_events_coalesced_per_batch(self):
+        events = []
+        token = subscribe(events.append, 'products')
+        try:
+            queue = db.enable_write_queue(max_delay=0.05)
+            for i in range(3):
+                db.add_product(Product(f"Item{i}", 1.0, "Cat", 1))
+            queue.flush()
+        finally:
+            unsubscribe(token)
+        self.assertEqual(sum(len(e.ids) for e in events), 3)
+        self.assertLessEqual(len(events), queue.batches)
+
+    def test_same_return_type_with_and_without_queue(self):
+        direct = db.add_client(Client("A", "a@email.com", "+1"))
+        self.assertTrue(direct.done())
+        self.assertEqual(direct.result(), 1)
+        queue = db.enable_write_queue()
+        self.assertEqual(queue.durability, 'full')
+        self.assertEqual(db.add_client(Client("B", "b@email.com", "+1")).result(timeout=5), 2)
+
+    def test_queue_follows_use_database(self):
+        db.use_database(self.temp_path('first.db'))
+        db.enable_write_queue(max_batch=10)
+        db.add_client(Client("A", "a@email.com", "+1"))
+        db.use_database(self.temp_path('second.db'))  # Очередь прежней базы дописывается
+        self.assertEqual(db._write_queue.max_batch, 10)
+        db.add_client(Client("B", "b@email.com", "+1")).result(timeout=5)
+        self.assertEqual([c.name for c in db.get_all_clients()], ["B"])
+        conn = sqlite3.connect(self.temp_path('first.db'))
+        self.assertEqual(conn.execute('SELECT name FROM clients').fetchall(), [("A",)])
+        conn.close()
+
+    def test_order_of_failed_client_reports_it(self):
+        db.enable_write_queue(max_delay=0.05)
+        db.add_client(Client("A", "same@email.com", "+1"))
+        client = Client("B", "same@email.com", "+1")
+        product = Product("Item", 10.0, "Cat", 5)
+        db.add_client(client)
+        db.add_product(product)
+        order = db.add_order(Order(client, [OrderItem(product, 1)]))
+        with self.assertRaisesRegex(ValueError, "не сохранен"):
+            order.result(timeout=5)
+
+    def test_rejects_unknown_durability_and_closed_queue(self):
+        with self.assertRaises(ValueError):
+            WriteQueue(db.DB_NAME, durability='maybe')
+        queue = WriteQueue(db.DB_NAME, durability='full')
+        queue.close()
+        with self.assertRaises(RuntimeError):
+            queue.submit(db._insert_client, Client("X", "x@email.com", "+1"), 'clients', 'insert')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Модуль очереди записи с групповым коммитом.
+Производители ставят изменения в очередь и получают Future, один поток-писатель
+применяет их пакетами в общих транзакциях: один fsync на пакет вместо одного на вызов.
+Включается через db.enable_write_queue().
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Callable, Optional
+import db
+from events import publish
+
+# Уровень надежности -> PRAGMA synchronous соединения писателя.
+# Future в любом режиме выполняется только после COMMIT пакета; режимы различаются
+# тем, переживет ли подтвержденная запись сбой питания или ОС:
+#   'full'   — fsync при каждом коммите, запись не теряется (значение SQLite по умолчанию);
+#   'normal' — в режиме WAL fsync только при контрольной точке: база останется целой,
+#              но последние подтвержденные пакеты могут пропасть; быстрее на медленных дисках;
+#   'off'    — без fsync: переживает падение приложения, но не ОС.
+DURABILITY = {'full': 'FULL', 'normal': 'NORMAL', 'off': 'OFF'}
+
+class _Write:
+    """Изменение в очереди: функция apply(cursor, obj) -> ID, объект и событие для публикации."""
+
+    def __init__(self, apply: Optional[Callable], obj, entity: Optional[str], operation: Optional[str]):
+        self.apply = apply
+        self.obj = obj
+        self.entity = entity
+        self.operation = operation
+        self.future = Future()
+
+_STOP = object()  # Сигнал остановки потока-писателя
+
+class WriteQueue:
+    """
+    Очередь записи с групповым коммитом.
+
+    Параметры
+    ----------
+    db_name : str
+        Файл или URI базы данных (для базы в памяти — Database.target).
+    max_batch : int
+        Максимум изменений в одной транзакции.
+    max_delay : float
+        Сколько секунд ждать добора пакета после первого изменения.
+    durability : str
+        Уровень надежности: 'full' (по умолчанию), 'normal' или 'off' (см. DURABILITY).
+
+    Ошибка одного изменения (например, нарушение ограничения) откатывается до его точки
+    сохранения и передается только в его Future, остальные изменения пакета фиксируются.
+    События шины публикуются из потока-писателя после коммита, по одному на сущность и операцию.
+    """
+
+    def __init__(self, db_name: str, max_batch: int = 256, max_delay: float = 0.005, durability: str = 'full'):
+        if durability not in DURABILITY:
+            raise ValueError(f"Неизвестный уровень надежности: {durability}")
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.durability = durability
+        self.batches = 0  # Зафиксировано транзакций
+        self.writes = 0   # Применено изменений
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, apply: Callable, obj, entity: str, operation: str) -> Future:
+        """Поставить изменение в очередь; Future получит результат apply (ID записи)."""
+        write = _Write(apply, obj, entity, operation)
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("Очередь записи закрыта")
+            self._queue.put(write)
+        return write.future
+
+    def flush(self, timeout: Optional[float] = None):
+        """Дождаться фиксации всех изменений, поставленных до вызова."""
+        barrier = _Write(None, None, None, None)
+        self._queue.put(barrier)
+        barrier.future.result(timeout)
+
+    def close(self):
+        """Дописать очередь и остановить поток-писатель."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _next_batch(self, first) -> tuple:
+        """Добрать пакет до max_batch изменений или до истечения max_delay. Возвращает (пакет, остановиться)."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = db.connect(self.db_name, isolation_level=None)
+        conn.execute(f'PRAGMA synchronous = {DURABILITY[self.durability]}')
+        try:
+            stop = False
+            while not stop:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                batch, stop = self._next_batch(first)
+                self._apply(conn.cursor(), batch)
+        finally:
+            conn.close()
+
+    def _apply(self, cursor, batch: list):
+        """Применить пакет одной транзакцией и выполнить Future."""
+        results = []
+        try:
+            db.retry_on_busy(cursor.execute)('BEGIN IMMEDIATE')  # Другие процессы могут держать блокировку
+            for write in batch:
+                if write.apply is None:
+                    results.append((write, None, None))
+                    continue
+                cursor.execute('SAVEPOINT write_op')
+                try:
+                    value = write.apply(cursor, write.obj)
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_op')
+                    results.append((write, None, e))
+                else:
+                    results.append((write, value, None))
+                cursor.execute('RELEASE write_op')
+            cursor.execute('COMMIT')
+        except Exception as e:
+            if cursor.connection.in_transaction:
+                cursor.execute('ROLLBACK')
+            for write in batch:
+                write.future.set_exception(e)
+            return
+        self.batches += 1
+        changed = defaultdict(list)
+        for write, value, error in results:
+            if write.apply is not None and error is None:
+                self.writes += 1
+                changed[(write.entity, write.operation)].append(value)
+        for (entity, operation), ids in changed.items():
+            publish(entity, operation, ids)
+        for write, value, error in results:
+            if error is None:
+                write.future.set_result(value)
+            else:
+                write.future.set_exception(error)